@@ -1,7 +1,7 @@
 import os
 from fastapi import Depends, HTTPException, Header
 from sqlalchemy.orm import Session
-from ..database import SessionLocal
+from ..database import SessionLocal, get_async_sessionmaker
 
 API_KEY = os.getenv("API_KEY", "changeme")
 
@@ -14,6 +14,11 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
 def verify_token(authorization: str = Header(default="")):
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Invalid or missing token")
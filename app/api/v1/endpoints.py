@@ -1,12 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Annotated, List, Literal, Optional
 from datetime import date
-from .. import schemas, crud
-from ..database import Base, engine
-from .deps import get_db, verify_token
+from ... import export, schemas, crud, whatif
+from ...cache import query_cache
+from ...responses import RowsJSONResponse
+from ...database import Base, SessionLocal, engine
+from ...rollups import ensure_rollups
+from ..deps import get_db, verify_token
 from sqlalchemy.orm import Session
 
 Base.metadata.create_all(bind=engine)
+crud.ensure_indexes(engine)
+crud.ensure_columns(engine)
+with SessionLocal() as session:
+    ensure_rollups(session)
+
+PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+# Values of agrupacion in /metricas/grupos and the column they group by
+GROUPINGS = {"categoria": "cat", "division": "division", "departamento": "departamento"}
 
 router = APIRouter(prefix="/api/v1", dependencies=[Depends(verify_token)])
 
@@ -16,20 +29,193 @@ def list_employees(db: Session = Depends(get_db)):
     return crud.get_employees(db)
 
 
-@router.get("/empleado/{email}", response_model=List[schemas.Productivity])
-def employee_summary(email: str, db: Session = Depends(get_db)):
-    records = crud.get_employee_summary(db, email)
-    if not records:
+def parse_cursor(cursor: Optional[str]):
+    if not cursor:
+        return None
+    try:
+        return crud.decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def page_limit(limite: Optional[int], cursor: Optional[str]) -> Optional[int]:
+    """Rows of the page: every row when neither limite nor cursor is given, as before pagination."""
+    if limite is None and cursor:
+        return PAGE_SIZE
+    return limite
+
+
+def page_response(records: list, limite: Optional[int]) -> RowsJSONResponse:
+    """A page of rows as JSON, with the cursor of the next page when there may be one."""
+    # A full page means there may be more rows after its last one
+    headers = {"X-Next-Cursor": crud.encode_cursor(records[-1])} if limite and len(records) == limite else None
+    return RowsJSONResponse(records, headers=headers)
+
+
+def export_encoder(media_type: str):
+    try:
+        return export.encoder(media_type, crud.METRIC_COLUMNS)
+    except ImportError:
+        raise HTTPException(status_code=406, detail=f"Formato no disponible: {media_type}")
+
+
+def export_response(media_type: str, db: Session, **filters) -> StreamingResponse:
+    """Every record matching filters in a bulk format, regardless of limite and cursor."""
+    body = export_encoder(media_type)
+    pages = crud.iter_metric_pages(db, **filters)
+    return StreamingResponse(export.encode_pages(body, pages), media_type=media_type)
+
+
+@router.get("/empleado/{email}", response_model=List[schemas.Productivity], responses=export.EXPORT_RESPONSES)
+def employee_summary(
+    email: str,
+    limite: Annotated[Optional[int], Query(ge=1, le=MAX_PAGE_SIZE)] = None,
+    cursor: Optional[str] = None,
+    accept: Annotated[Optional[str], Header()] = None,
+    db: Session = Depends(get_db),
+):
+    media_type = export.negotiate(accept)
+    if media_type:
+        if not crud.get_employee_summary(db, email, limit=1):
+            raise HTTPException(status_code=404, detail="Empleado no encontrado")
+        return export_response(media_type, db, email=email)
+    limite = page_limit(limite, cursor)
+    records = crud.get_employee_summary(db, email, limit=limite, after=parse_cursor(cursor))
+    if not records and not cursor:
         raise HTTPException(status_code=404, detail="Empleado no encontrado")
-    return records
+    return page_response(records, limite)
 
 
-@router.get("/metricas", response_model=List[schemas.Productivity])
+@router.get("/metricas", response_model=List[schemas.Productivity], responses=export.EXPORT_RESPONSES)
 def metrics(
     email: Optional[str] = None,
     categoria: Optional[str] = None,
     fecha_inicio: Optional[date] = None,
     fecha_fin: Optional[date] = None,
+    limite: Annotated[Optional[int], Query(ge=1, le=MAX_PAGE_SIZE)] = None,
+    cursor: Optional[str] = None,
+    accept: Annotated[Optional[str], Header()] = None,
+    db: Session = Depends(get_db),
+):
+    media_type = export.negotiate(accept)
+    if media_type:
+        return export_response(media_type, db, email=email, categoria=categoria,
+                               fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+    limite = page_limit(limite, cursor)
+    records = crud.get_metrics(db, email=email, categoria=categoria, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin,
+                               limit=limite, after=parse_cursor(cursor))
+    return page_response(records, limite)
+
+
+@router.get("/metricas/exportar", responses=export.EXPORT_RESPONSES)
+def export_metrics(
+    email: Optional[str] = None,
+    categoria: Optional[str] = None,
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None,
+    accept: Annotated[Optional[str], Header()] = None,
+    db: Session = Depends(get_db),
+):
+    """Every matching record streamed page by page, as newline-delimited JSON by default."""
+    media_type = export.negotiate(accept) or export.NDJSON
+    return export_response(media_type, db, email=email, categoria=categoria,
+                           fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+
+
+def aggregate_filters(
+    categoria: Optional[str] = None,
+    division: Optional[str] = None,
+    departamento: Optional[str] = None,
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None,
+) -> dict:
+    return dict(categoria=categoria, division=division, departamento=departamento,
+                fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+
+
+@router.get("/metricas/diarias", response_model=List[schemas.DailyAverage])
+def daily_averages(filters: dict = Depends(aggregate_filters), db: Session = Depends(get_db)):
+    return crud.get_daily_averages(db, **filters)
+
+
+@router.get("/metricas/grupos", response_model=List[schemas.GroupAverage])
+def group_averages(
+    agrupacion: Literal["categoria", "division", "departamento"] = "categoria",
+    filters: dict = Depends(aggregate_filters),
+    db: Session = Depends(get_db),
+):
+    return crud.get_group_averages(db, GROUPINGS[agrupacion], **filters)
+
+
+@router.get("/metricas/distribucion", response_model=List[schemas.DistributionBucket])
+def distribution(filters: dict = Depends(aggregate_filters), db: Session = Depends(get_db)):
+    return crud.get_distribution(db, **filters)
+
+
+@router.get("/metricas/top", response_model=List[schemas.EmployeeAverage])
+def top_employees(
+    limite: int = Query(10, ge=1, le=100),
+    filters: dict = Depends(aggregate_filters),
+    db: Session = Depends(get_db),
+):
+    return crud.get_top_employees(db, limit=limite, **filters)
+
+
+@router.get("/metricas/baja-conectividad", response_model=List[schemas.EmployeeAverage])
+def low_connectivity(
+    umbral: float = Query(0.3, ge=0, le=1),
+    filters: dict = Depends(aggregate_filters),
     db: Session = Depends(get_db),
 ):
-    return crud.get_metrics(db, email=email, categoria=categoria, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+    return crud.get_low_connectivity(db, threshold=umbral, **filters)
+
+
+def signal_filters(
+    mes: Annotated[str, Query(pattern=r"^\d{4}-\d{2}$")],
+    email: Optional[str] = None,
+    categoria: Optional[str] = None,
+    division: Optional[str] = None,
+    departamento: Optional[str] = None,
+) -> dict:
+    try:
+        first_day = date.fromisoformat(f"{mes}-01")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Mes inválido: {mes}")
+    return dict(mes=first_day, email=email, categoria=categoria, division=division, departamento=departamento)
+
+
+def signal_response(rates: Optional[dict], filters: dict) -> dict:
+    mes = filters["mes"].strftime("%Y-%m")
+    if rates is None:
+        raise HTTPException(status_code=404, detail=f"No hay señales para {mes}")
+    return {"mes": mes, "email": filters["email"], **rates}
+
+
+@router.get("/metricas/senales", response_model=schemas.SignalRates)
+def signal_rates(filters: dict = Depends(signal_filters), db: Session = Depends(get_db)):
+    """Share of the days of the month each signal was active, for the radar chart."""
+    return signal_response(crud.get_signal_rates(db, **filters), filters)
+
+
+@router.post("/metricas/simulacion", response_model=schemas.WhatIfResult)
+def simulate_coefficients(request: schemas.WhatIfRequest):
+    try:
+        matrix = whatif.load_matrix(request.mes)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"No hay matriz de señales para {request.mes}")
+    try:
+        result = whatif.simulate(matrix, request.coeficientes, request.detalle)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    return {"mes": request.mes, **result}
+
+
+@router.get("/cache/estadisticas", response_model=schemas.CacheStats)
+def cache_stats():
+    return query_cache.stats()
+
+
+@router.post("/registros/bulk", response_model=schemas.BulkResult)
+def bulk_ingest(records: List[schemas.ProductivityCreate], db: Session = Depends(get_db)):
+    count = crud.bulk_upsert_records(db, (record.model_dump() for record in records))
+    return schemas.BulkResult(registros=count)
@@ -0,0 +1,109 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Annotated, List, Literal, Optional
+from datetime import date
+from ... import crud_async, export, schemas
+from ..deps import get_async_db, verify_token
+from .endpoints import (GROUPINGS, MAX_PAGE_SIZE, aggregate_filters, export_encoder, page_limit, page_response,
+                        parse_cursor, signal_filters, signal_response)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Async versions of the read endpoints. When enabled, app.main includes this
+# router before the sync one, so it answers these paths and the sync router
+# keeps serving the rest (exports and writes).
+
+router = APIRouter(prefix="/api/v1", dependencies=[Depends(verify_token)])
+
+
+@router.get("/empleados", response_model=List[str])
+async def list_employees(db: AsyncSession = Depends(get_async_db)):
+    return await crud_async.get_employees(db)
+
+
+def export_response(media_type: str, db: AsyncSession, **filters) -> StreamingResponse:
+    body = export_encoder(media_type)
+    pages = crud_async.iter_metric_pages(db, **filters)
+    return StreamingResponse(export.encode_pages_async(body, pages), media_type=media_type)
+
+
+@router.get("/empleado/{email}", response_model=List[schemas.Productivity], responses=export.EXPORT_RESPONSES)
+async def employee_summary(
+    email: str,
+    limite: Annotated[Optional[int], Query(ge=1, le=MAX_PAGE_SIZE)] = None,
+    cursor: Optional[str] = None,
+    accept: Annotated[Optional[str], Header()] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    media_type = export.negotiate(accept)
+    if media_type:
+        if not await crud_async.get_employee_summary(db, email, limit=1):
+            raise HTTPException(status_code=404, detail="Empleado no encontrado")
+        return export_response(media_type, db, email=email)
+    limite = page_limit(limite, cursor)
+    records = await crud_async.get_employee_summary(db, email, limit=limite, after=parse_cursor(cursor))
+    if not records and not cursor:
+        raise HTTPException(status_code=404, detail="Empleado no encontrado")
+    return page_response(records, limite)
+
+
+@router.get("/metricas", response_model=List[schemas.Productivity], responses=export.EXPORT_RESPONSES)
+async def metrics(
+    email: Optional[str] = None,
+    categoria: Optional[str] = None,
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None,
+    limite: Annotated[Optional[int], Query(ge=1, le=MAX_PAGE_SIZE)] = None,
+    cursor: Optional[str] = None,
+    accept: Annotated[Optional[str], Header()] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    media_type = export.negotiate(accept)
+    if media_type:
+        return export_response(media_type, db, email=email, categoria=categoria,
+                               fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+    limite = page_limit(limite, cursor)
+    records = await crud_async.get_metrics(db, email=email, categoria=categoria, fecha_inicio=fecha_inicio,
+                                           fecha_fin=fecha_fin, limit=limite, after=parse_cursor(cursor))
+    return page_response(records, limite)
+
+
+@router.get("/metricas/diarias", response_model=List[schemas.DailyAverage])
+async def daily_averages(filters: dict = Depends(aggregate_filters), db: AsyncSession = Depends(get_async_db)):
+    return await crud_async.get_daily_averages(db, **filters)
+
+
+@router.get("/metricas/grupos", response_model=List[schemas.GroupAverage])
+async def group_averages(
+    agrupacion: Literal["categoria", "division", "departamento"] = "categoria",
+    filters: dict = Depends(aggregate_filters),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await crud_async.get_group_averages(db, GROUPINGS[agrupacion], **filters)
+
+
+@router.get("/metricas/distribucion", response_model=List[schemas.DistributionBucket])
+async def distribution(filters: dict = Depends(aggregate_filters), db: AsyncSession = Depends(get_async_db)):
+    return await crud_async.get_distribution(db, **filters)
+
+
+@router.get("/metricas/top", response_model=List[schemas.EmployeeAverage])
+async def top_employees(
+    limite: int = Query(10, ge=1, le=100),
+    filters: dict = Depends(aggregate_filters),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await crud_async.get_top_employees(db, limit=limite, **filters)
+
+
+@router.get("/metricas/baja-conectividad", response_model=List[schemas.EmployeeAverage])
+async def low_connectivity(
+    umbral: float = Query(0.3, ge=0, le=1),
+    filters: dict = Depends(aggregate_filters),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await crud_async.get_low_connectivity(db, threshold=umbral, **filters)
+
+
+@router.get("/metricas/senales", response_model=schemas.SignalRates)
+async def signal_rates(filters: dict = Depends(signal_filters), db: AsyncSession = Depends(get_async_db)):
+    return signal_response(await crud_async.get_signal_rates(db, **filters), filters)
@@ -0,0 +1,137 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+from sqlalchemy import select
+
+from . import models
+
+# Bounded cache for the results of the read queries in crud.py.
+# Entries expire after a TTL and are all dropped when the data version goes up.
+# The version is a row of the database that every write through crud
+# increments in its transaction, so writes of other processes (the pipeline
+# loader, other API workers) are seen by the next read.
+
+DATA_VERSION_STATEMENT = select(models.DataVersion.version).where(models.DataVersion.id == 1)
+
+
+class QueryCache:
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: Hashable):
+        """(True, value) on a hit, else (False, data version the result must be stored with)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            self.misses += 1
+            return False, self.version
+
+    def _store(self, key: Hashable, value: Any, version: int) -> None:
+        with self._lock:
+            # A write during the query may have made its result stale already
+            if version == self.version and self.maxsize > 0:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        hit, found = self._lookup(key)
+        if hit:
+            return found
+        value = loader()
+        self._store(key, value, found)
+        return value
+
+    async def get_or_load_async(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        hit, found = self._lookup(key)
+        if hit:
+            return found
+        value = await loader()
+        self._store(key, value, found)
+        return value
+
+    def observe(self, version: int) -> None:
+        """Drop every entry when the data version read from the database moved."""
+        with self._lock:
+            if version != self.version:
+                self.version = version
+                self._entries.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entradas": len(self._entries),
+                "max_entradas": self.maxsize,
+                "ttl": self.ttl,
+                "version": self.version,
+            }
+
+
+query_cache = QueryCache(
+    maxsize=int(os.getenv("CACHE_MAXSIZE", "256")),
+    ttl=float(os.getenv("CACHE_TTL", "300")),
+)
+
+
+def _cache_key(func: Callable, signature: inspect.Signature, args: tuple, kwargs: dict) -> tuple:
+    """Key of the call and the session it runs on."""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = dict(bound.arguments)
+    arguments.update(arguments.pop("filters", {}))
+    db = arguments.pop("db")
+    return (func.__name__,) + tuple(sorted((k, v) for k, v in arguments.items() if v is not None)), db
+
+
+def cached(func: Callable) -> Callable:
+    """Cache a crud read function by its arguments other than the session.
+
+    Every call first reads the data version through the session, a primary
+    key lookup, and drops the cached entries when it changed.
+
+    Arguments left to None are dropped from the key, so equivalent filter sets
+    share one entry whatever the order or the way they were passed. Coroutine
+    functions (crud_async) share the entries of their sync counterparts.
+    """
+    signature = inspect.signature(func)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            key, db = _cache_key(func, signature, args, kwargs)
+            query_cache.observe((await db.scalar(DATA_VERSION_STATEMENT)) or 0)
+            return await query_cache.get_or_load_async(key, lambda: func(*args, **kwargs))
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key, db = _cache_key(func, signature, args, kwargs)
+        query_cache.observe(db.scalar(DATA_VERSION_STATEMENT) or 0)
+        return query_cache.get_or_load(key, lambda: func(*args, **kwargs))
+
+    return wrapper
@@ -1,42 +1,413 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import Float, and_, case, cast, func, insert, inspect, or_, select, text, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
 from . import models, schemas
-from typing import List, Optional
+from .cache import cached
+from .rollups import month_end, refresh_rollups
+from typing import Iterable, Iterator, List, Optional, Tuple
 from datetime import date
 
+BULK_BATCH_SIZE = 5000
+# Rows read per query when streaming an export
+STREAM_PAGE_SIZE = 5000
+
+# Ranges of the productivity distribution chart, the last one includes 1.0
+DISTRIBUTION_BUCKETS = ((0.0, 0.3), (0.3, 0.6), (0.6, 0.8), (0.8, 1.0))
+
+def ensure_indexes(bind) -> None:
+    """Create the indexes missing from a productivity table made by an older version.
+
+    Before a unique index is added, the rows that repeat its columns are
+    collapsed into the newest one (the highest id).
+    """
+    table = models.ProductivityRecord.__table__
+    inspector = inspect(bind)
+    existing = {index["name"] for index in inspector.get_indexes(table.name)}
+    existing |= {constraint["name"] for constraint in inspector.get_unique_constraints(table.name)}
+    with bind.begin() as connection:
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if index.unique:
+                newest = select(func.max(table.c.id)).group_by(*index.columns)
+                connection.execute(table.delete().where(table.c.id.not_in(newest)))
+            index.create(bind=connection)
+
+
+def ensure_columns(bind) -> None:
+    """Add the columns missing from tables made by an older version. They are all nullable."""
+    inspector = inspect(bind)
+    with bind.begin() as connection:
+        for table in (models.ProductivityRecord.__table__, models.MonthlyRollup.__table__):
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=bind.dialect)
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+
+# Statements of the read queries, shared by these functions and by crud_async.
+
+def employees_statement():
+    return select(models.ProductivityRecord.email).distinct()
+
+
+def employee_summary_statement(email: str, limit: Optional[int] = None, after: Optional[Tuple[date, int]] = None):
+    return metric_rows_statement(limit, after, email=email)
+
+
+# Keyset pagination: rows are sorted by (fecha, id) and a page starts after
+# the (fecha, id) of the last row of the previous one, given as a cursor.
+
+def encode_cursor(record) -> str:
+    return f"{record.fecha.isoformat()}_{record.id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[date, int]:
+    """Parse a cursor made by encode_cursor. Raises ValueError if malformed."""
+    fecha, _, record_id = cursor.partition("_")
+    return date.fromisoformat(fecha), int(record_id)
+
+
+def _keyset_page(statement, limit: Optional[int] = None, after: Optional[Tuple[date, int]] = None):
+    record = models.ProductivityRecord
+    if after:
+        fecha, record_id = after
+        statement = statement.where(or_(record.fecha > fecha, and_(record.fecha == fecha, record.id > record_id)))
+    statement = statement.order_by(record.fecha, record.id)
+    if limit:
+        statement = statement.limit(limit)
+    return statement
+
+
+def _apply_filters(
+    statement,
+    email: Optional[str] = None,
+    categoria: Optional[str] = None,
+    division: Optional[str] = None,
+    departamento: Optional[str] = None,
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None,
+):
+    record = models.ProductivityRecord
+    if email:
+        statement = statement.where(record.email == email)
+    if categoria:
+        statement = statement.where(record.cat == categoria)
+    if division:
+        statement = statement.where(record.division == division)
+    if departamento:
+        statement = statement.where(record.departamento == departamento)
+    if fecha_inicio:
+        statement = statement.where(record.fecha >= fecha_inicio)
+    if fecha_fin:
+        statement = statement.where(record.fecha <= fecha_fin)
+    return statement
+
+
+# Columns of the read-only row queries, in the order of schemas.Productivity
+METRIC_COLUMNS = ["email", "username", "cat", "division", "departamento", "productividad", "fecha", "id"]
+
+
+def metric_rows_statement(limit: Optional[int] = None, after: Optional[Tuple[date, int]] = None, **filters):
+    """Rows of METRIC_COLUMNS (named tuples, no ORM objects) matching the filters, by (fecha, id)."""
+    record = models.ProductivityRecord
+    columns = [getattr(record, column) for column in METRIC_COLUMNS]
+    return _keyset_page(_apply_filters(select(*columns), **filters), limit, after)
+
+
+# Aggregates for the dashboard charts. Filters are the keyword arguments of _apply_filters.
+
+# The aggregates read the rollup tables when the filters allow it: any filter
+# but email for the daily rollup, and only whole months for the monthly one.
+
+def _rollup_filters(statement, rollup, categoria=None, division=None, departamento=None):
+    if categoria:
+        statement = statement.where(rollup.cat == categoria)
+    if division:
+        statement = statement.where(rollup.division == division)
+    if departamento:
+        statement = statement.where(rollup.departamento == departamento)
+    return statement
+
+
+def _daily_rollup_filters(statement, fecha_inicio=None, fecha_fin=None, **filters):
+    rollup = models.DailyRollup
+    statement = _rollup_filters(statement, rollup, **filters)
+    if fecha_inicio:
+        statement = statement.where(rollup.fecha >= fecha_inicio)
+    if fecha_fin:
+        statement = statement.where(rollup.fecha <= fecha_fin)
+    return statement
+
+
+def _monthly_rollup_filters(statement, email=None, fecha_inicio=None, fecha_fin=None, **filters):
+    rollup = models.MonthlyRollup
+    statement = _rollup_filters(statement, rollup, **filters)
+    if fecha_inicio:
+        statement = statement.where(rollup.mes >= fecha_inicio)
+    if fecha_fin:
+        statement = statement.where(rollup.mes <= fecha_fin)
+    return statement
+
+
+def _whole_months(fecha_inicio: Optional[date] = None, fecha_fin: Optional[date] = None) -> bool:
+    return (fecha_inicio is None or fecha_inicio.day == 1) and (fecha_fin is None or fecha_fin == month_end(fecha_fin))
+
+
+def daily_averages_statement(**filters):
+    if filters.get("email"):
+        record = models.ProductivityRecord
+        statement = select(
+            record.fecha,
+            func.avg(record.productividad).label("promedio"),
+            func.count(record.id).label("empleados"),
+        )
+        return _apply_filters(statement, **filters).group_by(record.fecha).order_by(record.fecha)
+
+    rollup = models.DailyRollup
+    statement = select(
+        rollup.fecha,
+        (func.sum(rollup.suma) / func.sum(rollup.registros)).label("promedio"),
+        func.sum(rollup.registros).label("empleados"),
+    )
+    return _daily_rollup_filters(statement, **filters).group_by(rollup.fecha).order_by(rollup.fecha)
+
+
+GROUP_COLUMNS = ("cat", "division", "departamento")
+
+
+def group_averages_statement(group: str, **filters):
+    """Average productivity by cat, division or departamento."""
+    if filters.get("email"):
+        source, apply_filters = models.ProductivityRecord, _apply_filters
+        total, count = func.sum(source.productividad), func.count(source.id)
+    else:
+        source, apply_filters = models.DailyRollup, _daily_rollup_filters
+        total, count = func.sum(source.suma), func.sum(source.registros)
+    column = getattr(source, group)
+    statement = select(column.label("grupo"), (total / count).label("promedio"), count.label("registros"))
+    return apply_filters(statement, **filters).group_by(column).order_by(column)
+
+
+def _employee_averages(**filters):
+    """Subquery with the average productivity of each employee over the filtered days."""
+    if not filters.get("email") and _whole_months(filters.get("fecha_inicio"), filters.get("fecha_fin")):
+        rollup = models.MonthlyRollup
+        statement = select(
+            rollup.email,
+            func.max(rollup.username).label("username"),
+            func.max(rollup.cat).label("cat"),
+            func.max(rollup.division).label("division"),
+            func.max(rollup.departamento).label("departamento"),
+            (func.sum(rollup.suma) / func.sum(rollup.dias)).label("promedio"),
+        )
+        return _monthly_rollup_filters(statement, **filters).group_by(rollup.email).subquery()
+
+    record = models.ProductivityRecord
+    statement = select(
+        record.email,
+        func.max(record.username).label("username"),
+        func.max(record.cat).label("cat"),
+        func.max(record.division).label("division"),
+        func.max(record.departamento).label("departamento"),
+        func.avg(record.productividad).label("promedio"),
+    )
+    return _apply_filters(statement, **filters).group_by(record.email).subquery()
+
+
+def signal_rates_statement(mes: date, email: Optional[str] = None, **filters):
+    """Share of the days of a month each signal was active, for one employee or a group.
+
+    A single aggregate over the monthly rollup rows of the month (and email),
+    only of the employees whose records carry the signal bitmask.
+    """
+    rollup = models.MonthlyRollup
+    days = func.sum(rollup.dias_senales)
+    statement = select(
+        func.count(func.distinct(rollup.email)).label("empleados"),
+        days.label("dias"),
+        *[(cast(func.sum(getattr(rollup, field)), Float) / days).label(field)
+          for field in models.SIGNAL_FIELDS.values()],
+    ).where(rollup.mes == mes, rollup.dias_senales > 0)
+    if email:
+        statement = statement.where(rollup.email == email)
+    return _rollup_filters(statement, rollup, **filters)
+
+
+def signal_rates(row) -> Optional[dict]:
+    """The row of signal_rates_statement by signal name, None when no day has signals."""
+    if not row.dias:
+        return None
+    return {
+        "empleados": row.empleados,
+        "dias": row.dias,
+        "senales": [{"senal": name, "tasa": getattr(row, field)} for name, field in models.SIGNAL_FIELDS.items()],
+    }
+
+
+def distribution_statement(**filters):
+    averages = _employee_averages(**filters)
+    bucket = case(
+        *[(averages.c.promedio < upper, index) for index, (_, upper) in enumerate(DISTRIBUTION_BUCKETS[:-1])],
+        else_=len(DISTRIBUTION_BUCKETS) - 1,
+    ).label("bucket")
+    return select(bucket, func.count()).group_by(bucket)
+
+
+def distribution_buckets(counts: dict) -> List[dict]:
+    """One entry per DISTRIBUTION_BUCKETS range from the bucket counts of distribution_statement."""
+    return [
+        {"rango": f"{lower:.1f}-{upper:.1f}", "minimo": lower, "maximo": upper, "empleados": counts.get(index, 0)}
+        for index, (lower, upper) in enumerate(DISTRIBUTION_BUCKETS)
+    ]
+
+
+def top_employees_statement(limit: int = 10, **filters):
+    averages = _employee_averages(**filters)
+    return select(averages).order_by(averages.c.promedio.desc(), averages.c.email).limit(limit)
+
+
+def low_connectivity_statement(threshold: float = 0.3, **filters):
+    averages = _employee_averages(**filters)
+    return select(averages).where(averages.c.promedio < threshold).order_by(averages.c.promedio, averages.c.email)
+
+
 # CRUD helper functions
 
+@cached
 def get_employees(db: Session) -> List[str]:
-    return [email for (email,) in db.query(models.ProductivityRecord.email).distinct()] 
+    return list(db.scalars(employees_statement()))
 
 
-def get_employee_summary(db: Session, email: str):
-    records = db.query(models.ProductivityRecord).filter(models.ProductivityRecord.email == email).all()
+@cached
+def get_employee_summary(db: Session, email: str, limit: Optional[int] = None, after: Optional[Tuple[date, int]] = None):
+    records = db.execute(employee_summary_statement(email, limit, after)).all()
     return records
 
 
+@cached
 def get_metrics(
     db: Session,
     email: Optional[str] = None,
     categoria: Optional[str] = None,
     fecha_inicio: Optional[date] = None,
     fecha_fin: Optional[date] = None,
+    limit: Optional[int] = None,
+    after: Optional[Tuple[date, int]] = None,
 ):
-    query = db.query(models.ProductivityRecord)
-    if email:
-        query = query.filter(models.ProductivityRecord.email == email)
-    if categoria:
-        query = query.filter(models.ProductivityRecord.cat == categoria)
-    if fecha_inicio:
-        query = query.filter(models.ProductivityRecord.fecha >= fecha_inicio)
-    if fecha_fin:
-        query = query.filter(models.ProductivityRecord.fecha <= fecha_fin)
-    return query.all()
+    statement = metric_rows_statement(limit, after, email=email, categoria=categoria,
+                                      fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+    return db.execute(statement).all()
+
+
+def iter_metric_pages(db: Session, page_size: int = STREAM_PAGE_SIZE, **filters) -> Iterator[List[tuple]]:
+    """Every row matching the get_metrics filters, as pages of METRIC_COLUMNS tuples (not cached)."""
+    after = None
+    while True:
+        page = db.execute(metric_rows_statement(page_size, after, **filters)).all()
+        yield page
+        if len(page) < page_size:
+            return
+        after = (page[-1].fecha, page[-1].id)
+
+
+@cached
+def get_daily_averages(db: Session, **filters):
+    """Average productivity and number of employees of each day."""
+    return db.execute(daily_averages_statement(**filters)).all()
+
+
+@cached
+def get_group_averages(db: Session, group: str, **filters):
+    """Average productivity of each value of group (one of GROUP_COLUMNS)."""
+    return db.execute(group_averages_statement(group, **filters)).all()
+
+
+@cached
+def get_distribution(db: Session, **filters) -> List[dict]:
+    """Number of employees whose average falls in each of DISTRIBUTION_BUCKETS."""
+    return distribution_buckets(dict(db.execute(distribution_statement(**filters)).all()))
+
+
+@cached
+def get_signal_rates(db: Session, mes: date, **filters) -> Optional[dict]:
+    """Monthly rate of each signal for the radar chart of an employee or a group."""
+    return signal_rates(db.execute(signal_rates_statement(mes, **filters)).one())
+
+
+@cached
+def get_top_employees(db: Session, limit: int = 10, **filters):
+    """The limit employees with the highest average productivity."""
+    return db.execute(top_employees_statement(limit, **filters)).all()
+
+
+@cached
+def get_low_connectivity(db: Session, threshold: float = 0.3, **filters):
+    """Employees whose average productivity is below threshold, lowest first."""
+    return db.execute(low_connectivity_statement(threshold, **filters)).all()
+
+
+def bump_data_version(db: Session) -> None:
+    """Count a write in the caller's transaction, so the query cache of every process drops its entries."""
+    table = models.DataVersion.__table__
+    if not db.execute(update(table).where(table.c.id == 1).values(version=table.c.version + 1)).rowcount:
+        db.execute(insert(table).values(id=1, version=1))
 
 
 def create_record(db: Session, record: schemas.ProductivityCreate) -> models.ProductivityRecord:
     db_record = models.ProductivityRecord(**record.dict())
     db.add(db_record)
+    db.flush()
+    refresh_rollups(db, [db_record.fecha], emails=[db_record.email])
+    bump_data_version(db)
     db.commit()
     db.refresh(db_record)
     return db_record
+
+
+def _upsert_statement(db: Session):
+    """INSERT ... ON CONFLICT (email, fecha) DO UPDATE for the current dialect, if supported."""
+    table = models.ProductivityRecord.__table__
+    dialect_insert = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}.get(db.get_bind().dialect.name)
+    if dialect_insert is None:
+        return None
+    stmt = dialect_insert(table)
+    updated = {column: stmt.excluded[column] for column in ("username", "cat", "division", "departamento", "productividad")}
+    # A record sent without its signals keeps the ones it had, as the unchanged days of an incremental run
+    updated["senales"] = func.coalesce(stmt.excluded["senales"], table.c.senales)
+    return stmt.on_conflict_do_update(index_elements=["email", "fecha"], set_=updated)
+
+
+def bulk_upsert_records(db: Session, records: Iterable[dict], batch_size: int = BULK_BATCH_SIZE) -> int:
+    """Insert or update many records by (email, fecha) in a single transaction.
+
+    records are plain dicts with the ProductivityCreate fields. They are sent
+    in batches of batch_size rows; on error nothing is written.
+    """
+    records = list(records)
+    stmt = _upsert_statement(db)
+    table = models.ProductivityRecord.__table__
+    try:
+        for start in range(0, len(records), batch_size):
+            batch = records[start:start + batch_size]
+            if stmt is None:
+                # Generic fallback: replace the existing rows of the batch, keeping
+                # the stored signals of the records sent without them, like the upsert
+                keys = [(record["email"], record["fecha"]) for record in batch]
+                existing = tuple_(table.c.email, table.c.fecha).in_(keys)
+                stored = {(email, fecha): senales for email, fecha, senales in db.execute(
+                    select(table.c.email, table.c.fecha, table.c.senales).where(existing, table.c.senales.is_not(None)))}
+                batch = [{**record, "senales": record["senales"] if record.get("senales") is not None else stored.get(key)}
+                         for key, record in zip(keys, batch)]
+                db.execute(table.delete().where(existing))
+                db.execute(insert(table), batch)
+            else:
+                db.execute(stmt, batch)
+        refresh_rollups(db, {record["fecha"] for record in records})
+        bump_data_version(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(records)
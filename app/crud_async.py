@@ -0,0 +1,76 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple
+from datetime import date
+from . import crud
+from .cache import cached
+
+# Async versions of the read functions of crud.py, running the same statements
+# through an AsyncSession. Writes stay in crud.py.
+
+
+@cached
+async def get_employees(db: AsyncSession) -> List[str]:
+    return list(await db.scalars(crud.employees_statement()))
+
+
+@cached
+async def get_employee_summary(db: AsyncSession, email: str, limit: Optional[int] = None,
+                               after: Optional[Tuple[date, int]] = None):
+    return (await db.execute(crud.employee_summary_statement(email, limit, after))).all()
+
+
+@cached
+async def get_metrics(
+    db: AsyncSession,
+    email: Optional[str] = None,
+    categoria: Optional[str] = None,
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None,
+    limit: Optional[int] = None,
+    after: Optional[Tuple[date, int]] = None,
+):
+    statement = crud.metric_rows_statement(limit, after, email=email, categoria=categoria,
+                                           fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+    return (await db.execute(statement)).all()
+
+
+async def iter_metric_pages(db: AsyncSession, page_size: int = crud.STREAM_PAGE_SIZE, **filters):
+    after = None
+    while True:
+        result = await db.execute(crud.metric_rows_statement(page_size, after, **filters))
+        page = result.all()
+        yield page
+        if len(page) < page_size:
+            return
+        after = (page[-1].fecha, page[-1].id)
+
+
+@cached
+async def get_daily_averages(db: AsyncSession, **filters):
+    return (await db.execute(crud.daily_averages_statement(**filters))).all()
+
+
+@cached
+async def get_group_averages(db: AsyncSession, group: str, **filters):
+    return (await db.execute(crud.group_averages_statement(group, **filters))).all()
+
+
+@cached
+async def get_distribution(db: AsyncSession, **filters) -> List[dict]:
+    counts = (await db.execute(crud.distribution_statement(**filters))).all()
+    return crud.distribution_buckets(dict(counts))
+
+
+@cached
+async def get_signal_rates(db: AsyncSession, mes: date, **filters) -> Optional[dict]:
+    return crud.signal_rates((await db.execute(crud.signal_rates_statement(mes, **filters))).one())
+
+
+@cached
+async def get_top_employees(db: AsyncSession, limit: int = 10, **filters):
+    return (await db.execute(crud.top_employees_statement(limit, **filters))).all()
+
+
+@cached
+async def get_low_connectivity(db: AsyncSession, threshold: float = 0.3, **filters):
+    return (await db.execute(crud.low_connectivity_statement(threshold, **filters))).all()
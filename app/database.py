@@ -7,11 +7,53 @@ from dotenv import load_dotenv
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+# Async drivers for the URLs of DATABASE_URL, used when ASYNC_DATABASE_URL is not set
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def pool_options() -> dict:
+    """Connection pool settings from the DB_POOL_* environment variables that are set."""
+    options = {}
+    for option, variable, cast in (
+        ("pool_size", "DB_POOL_SIZE", int),
+        ("max_overflow", "DB_POOL_MAX_OVERFLOW", int),
+        ("pool_recycle", "DB_POOL_RECYCLE", int),
+        ("pool_timeout", "DB_POOL_TIMEOUT", float),
+    ):
+        value = os.getenv(variable)
+        if value:
+            options[option] = cast(value)
+    if os.getenv("DB_POOL_PRE_PING", "0") == "1":
+        options["pool_pre_ping"] = True
+    return options
+
+
+def async_database_url() -> str:
+    url = os.getenv("ASYNC_DATABASE_URL")
+    if url:
+        return url
+    scheme, _, rest = DATABASE_URL.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)}://{rest}"
+
 
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
+    **pool_options(),
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+_async_sessionmaker = None
+
+
+def get_async_sessionmaker():
+    """Session factory of the async engine, created on first use (needs aiosqlite or asyncpg)."""
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        async_engine = create_async_engine(async_database_url(), **pool_options())
+        _async_sessionmaker = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    return _async_sessionmaker
+
 Base = declarative_base()
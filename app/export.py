@@ -0,0 +1,177 @@
+import csv
+import io
+from typing import Iterable, List, Optional
+
+from .responses import dumps
+
+# Bulk representations of the productivity records, chosen through the Accept
+# header of /metricas, /empleado/{email} and /metricas/exportar (NDJSON by default). They are built
+# from the plain tuples of crud.METRIC_COLUMNS, one page at a time, so no
+# ORM object or Pydantic model is created per row.
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+PARQUET = "application/vnd.apache.parquet"
+CSV = "text/csv"
+NDJSON = "application/x-ndjson"
+JSON = "application/json"
+MEDIA_TYPES = (ARROW_STREAM, PARQUET, CSV, NDJSON)
+
+# OpenAPI description of the alternative representations
+EXPORT_RESPONSES = {200: {"content": {media_type: {} for media_type in MEDIA_TYPES}}}
+
+
+def _quality(params) -> float:
+    """The q parameter of an Accept entry, 1 when absent or malformed."""
+    for param in params:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 1.0
+    return 1.0
+
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """The bulk media type an Accept header prefers most, or None for JSON.
+
+    Entries are ranked by their q value, ties going to the first one listed;
+    application/json competes with the bulk types and q=0 rules a type out.
+    """
+    if not accept:
+        return None
+    best, best_quality = None, 0.0
+    for part in accept.split(","):
+        media_type, *params = part.split(";")
+        media_type = media_type.strip().lower()
+        if media_type not in MEDIA_TYPES and media_type != JSON:
+            continue
+        quality = _quality(params)
+        if quality > best_quality:
+            best, best_quality = media_type, quality
+    return None if best == JSON else best
+
+
+ARROW_TYPES = {
+    "id": lambda pa: pa.int64(),
+    "email": lambda pa: pa.string(),
+    "username": lambda pa: pa.string(),
+    "cat": lambda pa: pa.string(),
+    "division": lambda pa: pa.string(),
+    "departamento": lambda pa: pa.string(),
+    "productividad": lambda pa: pa.float64(),
+    "fecha": lambda pa: pa.date32(),
+}
+
+
+class _ByteSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last take()."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class CsvEncoder:
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+
+    def start(self) -> bytes:
+        return self.write([self.columns])
+
+    def write(self, rows: Iterable[tuple]) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class NdjsonEncoder:
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+
+    def start(self) -> bytes:
+        return b""
+
+    def write(self, rows: Iterable[tuple]) -> bytes:
+        return b"".join(dumps(dict(zip(self.columns, row))) + b"\n" for row in rows)
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class ArrowEncoder:
+    """Arrow IPC stream or Parquet file, one record batch or row group per page."""
+
+    def __init__(self, columns: List[str], media_type: str):
+        import pyarrow as pa
+
+        self.pa = pa
+        self.columns = columns
+        self.media_type = media_type
+        self.schema = pa.schema([(name, ARROW_TYPES[name](pa)) for name in columns])
+        self.sink = _ByteSink()
+        self.writer = None
+
+    def start(self) -> bytes:
+        if self.media_type == PARQUET:
+            import pyarrow.parquet as pq
+
+            self.writer = pq.ParquetWriter(self.sink, self.schema)
+        else:
+            self.writer = self.pa.ipc.new_stream(self.sink, self.schema)
+        return self.sink.take()
+
+    def write(self, rows: List[tuple]) -> bytes:
+        values = list(zip(*rows)) if rows else [[] for _ in self.columns]
+        arrays = [self.pa.array(column, type=field.type) for column, field in zip(values, self.schema)]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+        return self.sink.take()
+
+    def finish(self) -> bytes:
+        self.writer.close()
+        return self.sink.take()
+
+
+def encoder(media_type: str, columns: List[str]):
+    """Encoder of media_type. Raises ImportError when it needs pyarrow and it is missing."""
+    if media_type == CSV:
+        return CsvEncoder(columns)
+    if media_type == NDJSON:
+        return NdjsonEncoder(columns)
+    return ArrowEncoder(columns, media_type)
+
+
+def encode_pages(body, pages: Iterable[List[tuple]]):
+    """Bytes of the pages of rows through the encoder body, as a generator for a StreamingResponse."""
+    yield body.start()
+    for rows in pages:
+        yield body.write(rows)
+    yield body.finish()
+
+
+async def encode_pages_async(body, pages):
+    """encode_pages for an async iterable of pages."""
+    yield body.start()
+    async for rows in pages:
+        yield body.write(rows)
+    yield body.finish()
@@ -8,6 +8,7 @@ import os
 class Settings(BaseSettings):
     app_name: str = "Productividad API"
     frontend_url: str
+    async_db: bool = False
 
 settings = Settings()
 app = FastAPI(title=settings.app_name)
@@ -21,4 +22,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.async_db:
+    # The async read endpoints answer first, the sync router serves the rest
+    from .api.v1.endpoints_async import router as async_api_router
+    app.include_router(async_api_router)
 app.include_router(api_router)
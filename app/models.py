@@ -1,6 +1,22 @@
-from sqlalchemy import Column, Integer, String, Float, Date
+from sqlalchemy import Column, Integer, String, Float, Date, Index
 from .database import Base
 
+# Signals of the productivity score, in the order of their bits in
+# ProductivityRecord.senales (scoring_engine.SIGNAL_COLUMNS), and the
+# MonthlyRollup column counting the days each one was active
+SIGNAL_FIELDS = {
+    "Sent emails": "correos_enviados",
+    "Email last use": "uso_correo",
+    "Edited files": "archivos_editados",
+    "Viewed files": "archivos_vistos",
+    "Drive last use": "uso_drive",
+    "Add files": "archivos_agregados",
+    "Chat": "chat",
+    "Meetings": "reuniones",
+    "Autodesk": "autodesk",
+    "VPN": "vpn",
+}
+
 class ProductivityRecord(Base):
     __tablename__ = "productivity"
 
@@ -12,3 +28,68 @@ class ProductivityRecord(Base):
     departamento = Column(String, nullable=True)
     productividad = Column(Float, nullable=False)
     fecha = Column(Date, nullable=False)
+    # Bitmask of the signals active that day, bit i for the i-th of SIGNAL_FIELDS
+    senales = Column(Integer, nullable=True)
+
+    # One score per employee and day, the key used by bulk upserts. Its index
+    # also serves the (email, fecha) lookups of /empleado and /metricas. It is
+    # a unique index so that crud.ensure_indexes can add it to older tables.
+    __table_args__ = (
+        Index("uq_productivity_email_fecha", "email", "fecha", unique=True),
+        Index("ix_productivity_cat_fecha", "cat", "fecha"),
+        Index("ix_productivity_fecha_id", "fecha", "id"),
+    )
+
+
+
+# Rollups of ProductivityRecord kept up to date by crud on every write. They
+# store sums and counts so averages over any set of their rows stay exact.
+
+class DailyRollup(Base):
+    __tablename__ = "productivity_daily"
+
+    id = Column(Integer, primary_key=True)
+    fecha = Column(Date, nullable=False)
+    cat = Column(String, nullable=False)
+    division = Column(String, nullable=True)
+    departamento = Column(String, nullable=True)
+    suma = Column(Float, nullable=False)
+    registros = Column(Integer, nullable=False)
+
+    __table_args__ = (Index("ix_productivity_daily_fecha_cat", "fecha", "cat"),)
+
+
+class MonthlyRollup(Base):
+    __tablename__ = "productivity_monthly"
+
+    id = Column(Integer, primary_key=True)
+    mes = Column(Date, nullable=False)  # First day of the month
+    email = Column(String, nullable=False)
+    username = Column(String, nullable=False)
+    cat = Column(String, nullable=False)
+    division = Column(String, nullable=True)
+    departamento = Column(String, nullable=True)
+    suma = Column(Float, nullable=False)
+    dias = Column(Integer, nullable=False)
+    # Days with a signal bitmask and, of those, the days each signal was active
+    dias_senales = Column(Integer, nullable=True)
+    correos_enviados = Column(Integer, nullable=True)
+    uso_correo = Column(Integer, nullable=True)
+    archivos_editados = Column(Integer, nullable=True)
+    archivos_vistos = Column(Integer, nullable=True)
+    uso_drive = Column(Integer, nullable=True)
+    archivos_agregados = Column(Integer, nullable=True)
+    chat = Column(Integer, nullable=True)
+    reuniones = Column(Integer, nullable=True)
+    autodesk = Column(Integer, nullable=True)
+    vpn = Column(Integer, nullable=True)
+
+    __table_args__ = (Index("ix_productivity_monthly_mes_email", "mes", "email"),)
+
+
+class DataVersion(Base):
+    """Single row counting the writes to the records, read by the query cache of every process."""
+    __tablename__ = "data_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
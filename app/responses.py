@@ -0,0 +1,42 @@
+import json
+from datetime import date
+from typing import Iterable, List, Optional
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional, json is the fallback
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+class RowsJSONResponse(Response):
+    """JSON array of query rows (named tuples from Core selects), encoded with orjson.
+
+    Used by the read endpoints instead of validating one Pydantic model per
+    row; their response_model stays as the documented shape of each row.
+    """
+
+    media_type = "application/json"
+
+    def __init__(self, rows: Iterable, headers: Optional[dict] = None, **kwargs):
+        super().__init__(content=rows_to_dicts(rows), headers=headers, **kwargs)
+
+    def render(self, content: List[dict]) -> bytes:
+        return dumps(content)
+
+
+def rows_to_dicts(rows: Iterable) -> List[dict]:
+    return [row._asdict() for row in rows]
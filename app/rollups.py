@@ -0,0 +1,87 @@
+import calendar
+from datetime import date
+from typing import Iterable, Optional
+
+from sqlalchemy import Date, case, delete, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+def month_end(month: date) -> date:
+    return month.replace(day=calendar.monthrange(month.year, month.month)[1])
+
+
+def refresh_rollups(db: Session, dates: Iterable[date], emails: Optional[Iterable[str]] = None) -> None:
+    """Recompute the rollup rows of the given days from ProductivityRecord.
+
+    Runs in the caller's transaction. The monthly rollup is recomputed for
+    the months of those days, only for emails when they are given.
+    """
+    dates = sorted(set(dates))
+    if not dates:
+        return
+    record = models.ProductivityRecord
+    daily = models.DailyRollup
+    monthly = models.MonthlyRollup
+
+    db.execute(delete(daily).where(daily.fecha.in_(dates)))
+    groups = (record.fecha, record.cat, record.division, record.departamento)
+    db.execute(insert(daily).from_select(
+        ["fecha", "cat", "division", "departamento", "suma", "registros"],
+        select(*groups, func.sum(record.productividad), func.count(record.id))
+        .where(record.fecha.in_(dates))
+        .group_by(*groups),
+    ))
+
+    # Days each signal bit is set; records without a bitmask count for none
+    signal_counts = [func.sum(case((record.senales.op("&")(1 << bit) != 0, 1), else_=0))
+                     for bit in range(len(models.SIGNAL_FIELDS))]
+    emails = sorted(set(emails)) if emails is not None else None
+    for month in sorted({day.replace(day=1) for day in dates}):
+        stale = delete(monthly).where(monthly.mes == month)
+        rows = select(
+            literal(month, Date), record.email, func.max(record.username), record.cat,
+            record.division, record.departamento, func.sum(record.productividad), func.count(record.id),
+            func.count(record.senales), *signal_counts,
+        ).where(record.fecha.between(month, month_end(month)))
+        if emails is not None:
+            stale = stale.where(monthly.email.in_(emails))
+            rows = rows.where(record.email.in_(emails))
+        db.execute(stale)
+        db.execute(insert(monthly).from_select(
+            ["mes", "email", "username", "cat", "division", "departamento", "suma", "dias",
+             "dias_senales", *models.SIGNAL_FIELDS.values()],
+            rows.group_by(record.email, record.cat, record.division, record.departamento),
+        ))
+
+
+def rebuild_rollups(db: Session) -> None:
+    """Recompute both rollups from scratch and commit."""
+    db.execute(delete(models.DailyRollup))
+    db.execute(delete(models.MonthlyRollup))
+    refresh_rollups(db, db.scalars(select(models.ProductivityRecord.fecha).distinct()))
+    db.commit()
+
+
+def ensure_rollups(db: Session) -> None:
+    """Build the rollups of a database whose records predate them."""
+    has_records = db.scalar(select(models.ProductivityRecord.id).limit(1)) is not None
+    has_rollups = db.scalar(select(models.DailyRollup.id).limit(1)) is not None
+    if has_records and not has_rollups:
+        rebuild_rollups(db)
+
+
+if __name__ == "__main__":
+    # python -m app.rollups: rebuild the rollup tables of DATABASE_URL
+    from .database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        rebuild_rollups(session)
+        daily_rows = session.scalar(select(func.count(models.DailyRollup.id)))
+        monthly_rows = session.scalar(select(func.count(models.MonthlyRollup.id)))
+    finally:
+        session.close()
+    print(f"Rollups rebuilt: {daily_rows} daily rows, {monthly_rows} monthly rows")
@@ -11,10 +11,116 @@ class ProductivityBase(BaseModel):
     fecha: date
 
 class ProductivityCreate(ProductivityBase):
-    pass
+    # Bitmask of the active signals of the day, bit i for the i-th signal of models.SIGNAL_FIELDS
+    senales: int | None = Field(default=None, ge=0)
 
 class Productivity(ProductivityBase):
     id: int
 
     class Config:
         orm_mode = True
+
+
+class BulkResult(BaseModel):
+    registros: int
+
+
+class CacheStats(BaseModel):
+    hits: int
+    misses: int
+    entradas: int
+    max_entradas: int
+    ttl: float
+    version: int
+
+
+class DailyAverage(BaseModel):
+    fecha: date
+    promedio: float
+    empleados: int
+
+    class Config:
+        orm_mode = True
+
+
+class GroupAverage(BaseModel):
+    grupo: str | None = None
+    promedio: float
+    registros: int
+
+    class Config:
+        orm_mode = True
+
+
+class DistributionBucket(BaseModel):
+    rango: str
+    minimo: float
+    maximo: float
+    empleados: int
+
+
+class WhatIfRequest(BaseModel):
+    mes: str = Field(pattern=r"^\d{4}-\d{2}$")
+    # Coefficients to change, by profile name or COEFFICIENTS entry, then by signal
+    coeficientes: dict[str, dict[str, float]] = {}
+    detalle: bool = False
+
+
+class WhatIfDay(BaseModel):
+    fecha: date
+    empleados: int
+    promedio_base: float
+    promedio: float
+
+
+class WhatIfProfile(BaseModel):
+    perfil: str
+    empleados: int
+    promedio_base: float
+    promedio: float
+
+
+class WhatIfEmployee(BaseModel):
+    email: str
+    cat: str
+    perfil: str
+    promedio_base: float
+    promedio: float
+
+
+class WhatIfResult(BaseModel):
+    mes: str
+    empleados: int
+    promedio_base: float
+    promedio: float
+    diferencia: float
+    diario: list[WhatIfDay]
+    perfiles: list[WhatIfProfile]
+    distribucion_base: list[DistributionBucket]
+    distribucion: list[DistributionBucket]
+    detalle: list[WhatIfEmployee] | None = None
+
+
+class EmployeeAverage(BaseModel):
+    email: str
+    username: str
+    cat: str
+    division: str | None = None
+    departamento: str | None = None
+    promedio: float
+
+    class Config:
+        orm_mode = True
+
+
+class SignalRate(BaseModel):
+    senal: str
+    tasa: float | None = None
+
+
+class SignalRates(BaseModel):
+    mes: str
+    email: str | None = None
+    empleados: int
+    dias: int
+    senales: list[SignalRate]
@@ -0,0 +1,164 @@
+"""What-if scoring of a month with candidate coefficients.
+
+The pipeline keeps the binary signals of every employee and day of a month
+in SIGNALS_DIR/signals_YYYY-MM.npz (scripts/scoring_engine.save_signal_matrix).
+With only ten binary signals, every cell is one of 1024 signal patterns, so a
+candidate is scored by computing the score of each (profile, pattern) pair
+and looking it up for every cell, without going through the raw inputs again.
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from .crud import DISTRIBUTION_BUCKETS, distribution_buckets
+
+SIGNALS_DIR = Path(os.getenv("SIGNALS_DIR", "signals"))
+
+_matrices: Dict[tuple, dict] = {}
+
+
+def matrix_path(month: str, directory: Optional[Path] = None) -> Path:
+    return Path(directory or SIGNALS_DIR) / f"signals_{month}.npz"
+
+
+def load_matrix(month: str, directory: Optional[Path] = None) -> dict:
+    """The stored signal matrix of month ('YYYY-MM'), read once per version of the file.
+
+    Raises FileNotFoundError when the pipeline has not stored that month.
+    """
+    path = matrix_path(month, directory)
+    key = (str(path), os.stat(path).st_mtime_ns)
+    if key not in _matrices:
+        with np.load(path) as data:
+            matrix = {name: data[name] for name in data.files}
+        signals = matrix.pop("signals")
+        # Signal pattern of every cell, bit s set when signal s is active
+        matrix["patterns"] = (signals.astype(np.uint16) << np.arange(signals.shape[2], dtype=np.uint16)).sum(
+            axis=2, dtype=np.uint16)
+        for stale in [cached for cached in _matrices if cached[0] == key[0]]:
+            del _matrices[stale]
+        _matrices[key] = matrix
+    return _matrices[key]
+
+
+def candidate_weights(matrix: dict, candidate: Dict[str, Dict[str, float]]) -> np.ndarray:
+    """(profiles, signals) coefficients of a candidate over the stored baseline.
+
+    candidate maps profile names, or the COEFFICIENTS entries the profiles
+    use, to the coefficients of some signals; everything else keeps the
+    coefficients the month was scored with.
+    """
+    weights = matrix["coefficients"].copy()
+    profiles = list(matrix["profile_names"])
+    sources = list(matrix["profile_sources"])
+    signals = list(matrix["signal_names"])
+    for name, values in candidate.items():
+        rows = [index for index, profile in enumerate(profiles) if profile == name or sources[index] == name]
+        if not rows:
+            raise ValueError(f"Unknown profile or coefficients: {name}")
+        for signal, value in values.items():
+            if signal not in signals:
+                raise ValueError(f"Unknown signal: {signal}")
+            weights[rows, signals.index(signal)] = value
+    return weights
+
+
+def pattern_scores(weights: np.ndarray) -> np.ndarray:
+    """(profiles, patterns) scores, accumulated in signal order and clipped at 1 like the pipeline."""
+    signals = weights.shape[1]
+    bits = (np.arange(2 ** signals)[:, np.newaxis] >> np.arange(signals)) & 1
+    scores = np.zeros((weights.shape[0], 2 ** signals))
+    for position in range(signals):
+        scores += bits[:, position] * weights[:, position, np.newaxis]
+    return np.minimum(scores, 1)
+
+
+def _bucket_counts(averages: np.ndarray) -> dict:
+    uppers = [upper for _, upper in DISTRIBUTION_BUCKETS[:-1]]
+    buckets = np.searchsorted(uppers, averages, side="right")
+    return dict(enumerate(np.bincount(buckets, minlength=len(DISTRIBUTION_BUCKETS)).tolist()))
+
+
+def _mean(values: np.ndarray) -> float:
+    return float(values.mean()) if len(values) else 0.0
+
+
+def simulate(matrix: dict, candidate: Dict[str, Dict[str, float]], detail: bool = False) -> dict:
+    """Daily, per profile and per employee scores of the month with the baseline and the candidate."""
+    profile_index = matrix["profile_index"].astype(np.intp)
+    patterns = matrix["patterns"]
+    present = matrix["present"]
+    baseline = pattern_scores(matrix["coefficients"])[profile_index[:, np.newaxis], patterns]
+    scores = pattern_scores(candidate_weights(matrix, candidate))[profile_index[:, np.newaxis], patterns]
+
+    # Cells of absent employees do not count towards any average
+    baseline[~present] = 0
+    scores[~present] = 0
+
+    days = present.sum(axis=0)
+    daily_base = baseline.sum(axis=0) / np.maximum(days, 1)
+    daily_scores = scores.sum(axis=0) / np.maximum(days, 1)
+    daily = [
+        {"fecha": date, "empleados": int(count), "promedio_base": float(base), "promedio": float(value)}
+        for date, count, base, value in zip(matrix["dates"].tolist(), days, daily_base, daily_scores)
+    ]
+
+    # Monthly average of every employee over the days present, as the API computes it
+    counts = present.sum(axis=1)
+    active = counts > 0
+    monthly_base = baseline.sum(axis=1)[active] / counts[active]
+    monthly = scores.sum(axis=1)[active] / counts[active]
+    active_profiles = profile_index[active]
+
+    profiles = [
+        {"perfil": name, "empleados": int((active_profiles == index).sum()),
+         "promedio_base": _mean(monthly_base[active_profiles == index]),
+         "promedio": _mean(monthly[active_profiles == index])}
+        for index, name in enumerate(matrix["profile_names"].tolist())
+    ]
+
+    result = {
+        "empleados": int(active.sum()),
+        "promedio_base": _mean(monthly_base),
+        "promedio": _mean(monthly),
+        "diferencia": _mean(monthly) - _mean(monthly_base),
+        "diario": daily,
+        "perfiles": profiles,
+        "distribucion_base": distribution_buckets(_bucket_counts(monthly_base)),
+        "distribucion": distribution_buckets(_bucket_counts(monthly)),
+    }
+    if detail:
+        result["detalle"] = [
+            {"email": email, "cat": cat, "perfil": matrix["profile_names"][profile], "promedio_base": base, "promedio": value}
+            for email, cat, profile, base, value in zip(
+                matrix["emails"][active].tolist(), matrix["cats"][active].tolist(),
+                active_profiles.tolist(), monthly_base.tolist(), monthly.tolist())
+        ]
+    return result
+
+
+if __name__ == "__main__":
+    # python -m app.whatif --mes 2025-03 --coeficientes candidate.json
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Score a stored month with candidate coefficients")
+    parser.add_argument("--mes", required=True, help="Month of the signal matrix, YYYY-MM")
+    parser.add_argument("--coeficientes", type=Path, required=True,
+                        help="JSON with the coefficients of each profile or COEFFICIENTS entry to change")
+    parser.add_argument("--signals-dir", type=Path, default=SIGNALS_DIR)
+    parser.add_argument("--detalle", action="store_true", help="Include the average of every employee")
+    parser.add_argument("--output", type=Path, help="Write the result to this file instead of printing it")
+    args = parser.parse_args()
+
+    with open(args.coeficientes, "r", encoding="utf-8") as f:
+        candidate = json.load(f)
+    result = simulate(load_matrix(args.mes, args.signals_dir), candidate, args.detalle)
+    text = json.dumps({"mes": args.mes, **result}, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    else:
+        print(text)
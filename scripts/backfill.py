@@ -0,0 +1,236 @@
+"""Recalculate a range of months in one run.
+
+    python scripts/backfill.py --start 2025-01 --end 2025-12 --month-workers 3
+
+Every source is downloaded once. The files of REQUIRED_FILES are shared by
+all the months except the monthly ones (--monthly-files, the Google
+productivity export by default), looked up as <name>_YYYY-MM<extension>, such
+as Productividad_Google_2025-03.xlsx. The chat, meeting, VPN and Autodesk
+logs are parsed once for the whole range and split by month into the stage
+cache, where the calculate_productivity of each month finds them. The months
+then run in worker processes, each one writing its report, signal matrix and
+log, and the run ends with a combined backfill_summary.json.
+"""
+
+import argparse
+import copy
+import sys
+import tempfile
+import traceback
+from calendar import monthrange
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_processor import VPN_THRESHOLD_MB, DataProcessor, autodesk_activity, read_autodesk_usage
+from event_aggregator import aggregate_chats, aggregate_meetings, aggregate_vpn, read_chats, read_meetings, read_vpn
+from file_validator import FileValidator
+from instrumentation import Instrumentation
+from intermediate_store import IntermediateStore
+from logger_util import close_logger, setup_logger
+from main import LOG_PATH, build_parser, download_inputs, load_parameters, process_month
+from parallel import map_chunks
+from stage_cache import StageCache
+
+SUMMARY_FILE = 'backfill_summary.json'
+# Log of each month, next to the log of the backfill
+MONTH_LOG_DIR = 'backfill_logs'
+
+Month = Tuple[int, int]
+
+
+def month_range(start: str, end: str) -> List[Month]:
+    """(year, month) of every month from start to end ('YYYY-MM'), both included."""
+    first, last = pd.Period(start, freq='M'), pd.Period(end, freq='M')
+    if last < first:
+        raise ValueError(f"The range ends ({end}) before it starts ({start})")
+    return [(period.year, period.month) for period in pd.period_range(first, last, freq='M')]
+
+
+def month_name(year: int, month: int) -> str:
+    return f"{year}-{month:02d}"
+
+
+def month_days(year: int, month: int) -> List[str]:
+    return [f"{year}-{month:02d}-{day:02d}" for day in range(1, monthrange(year, month)[1] + 1)]
+
+
+def monthly_file_name(name: str, year: int, month: int) -> str:
+    path = Path(name)
+    return f"{path.stem}_{month_name(year, month)}{path.suffix}"
+
+
+def month_parameters(params: dict, year: int, month: int, monthly_files: List[str]) -> dict:
+    """params with the YEAR, MONTH and monthly file names of one month."""
+    month_params = copy.deepcopy(params)
+    month_params["YEAR"], month_params["MONTH"] = year, month
+    for key in monthly_files:
+        file_info = month_params["REQUIRED_FILES"][key]
+        file_info["name"] = monthly_file_name(file_info["name"], year, month)
+    return month_params
+
+
+def month_slice(frame: pd.DataFrame, days: List[str]) -> pd.DataFrame:
+    """The days of one month of an activity table, only with the rows active in them."""
+    columns = [column for column in frame.columns[1:] if column in set(days)]
+    df = frame[['Email'] + columns]
+    active = df[columns].to_numpy().any(axis=1) if columns else np.zeros(len(df), dtype=bool)
+    return df[active].reset_index(drop=True)
+
+
+def share_event_logs(input_dir: Path, params: dict, months: List[Month], monthly_files: List[str],
+                     cache: StageCache, logger) -> Dict[str, int]:
+    """Parse each shared log once for all the months and store every month in the stage cache.
+
+    The entries are the ones the process_* stages of DataProcessor look up,
+    so every month reuses them instead of reading the log again. Returns the
+    rows parsed by stage; logs whose months are all cached already are skipped.
+    """
+    required_files = params["REQUIRED_FILES"]
+    all_days = [day for year, month in months for day in month_days(year, month)]
+
+    def read_autodesk(path):
+        df_autodesk = read_autodesk_usage(path)
+        return {(year, month): autodesk_activity(df_autodesk, year, month) for year, month in months}
+
+    def split(frame):
+        return {(year, month): month_slice(frame, month_days(year, month)) for year, month in months}
+
+    sources = {
+        'autodesk': (DataProcessor.process_autodesk_by_day, read_autodesk),
+        'meetings': (DataProcessor.process_meetings, lambda path: split(aggregate_meetings(read_meetings(path), all_days))),
+        'chats': (DataProcessor.process_chats, lambda path: split(aggregate_chats(read_chats(path), all_days))),
+        'vpn': (DataProcessor.process_vpn,
+                lambda path: split(aggregate_vpn(read_vpn(path), all_days, threshold_mb=VPN_THRESHOLD_MB))),
+    }
+    parsed = {}
+    for key, (process, parse) in sources.items():
+        if key in monthly_files:
+            continue
+        path = str(Path(input_dir) / required_files[key]["name"])
+        keys = {(year, month): {'year': year, 'month': month} for year, month in months}
+        if all(cache.has(process.__name__, [path], key_params) for key_params in keys.values()):
+            continue
+
+        frames = parse(path)
+        for year_month, key_params in keys.items():
+            cache.get_or_compute(process.__name__, [path], key_params, lambda: frames[year_month])
+        parsed[process.__name__] = sum(len(frame) for frame in frames.values())
+        if logger:
+            logger.info(f"{process.__name__} shared by {len(months)} months")
+    return parsed
+
+
+def run_months(months: List[Month], args: argparse.Namespace, params: dict, input_dir: Path,
+               monthly_files: List[str]) -> List[Tuple[str, dict]]:
+    """Worker entry point: process a group of months one after the other.
+
+    Returns (YYYY-MM, run summary) for each month; a failed month is
+    recorded with its error and does not stop the others.
+    """
+    results = []
+    for year, month in months:
+        name = month_name(year, month)
+        log_path = Path(LOG_PATH).parent / MONTH_LOG_DIR / f"{name}.log"
+        logger = setup_logger(str(log_path), name=f"productivity_{name}")
+        instrumentation = Instrumentation(logger, trace_memory=args.trace_memory)
+        cache = StageCache(args.cache_dir, args.cache_max_mb * 1024 ** 2, logger=logger)
+        store = IntermediateStore(args.dump_dir / name, args.dump_format, logger) if args.dump_dir else None
+        month_params = month_parameters(params, year, month, monthly_files)
+        status = {'status': 'ok'}
+        try:
+            productivity_filename = month_params["REQUIRED_FILES"]["productivity"]["name"]
+            process_month(args, month_params, year, month, input_dir, productivity_filename,
+                          store, instrumentation, logger, cache)
+        except Exception as error:
+            logger.error(traceback.format_exc())
+            status = {'status': 'error', 'error': f"{type(error).__name__}: {error}"}
+        finally:
+            close_logger(logger)
+        results.append((name, {**status, 'log': str(log_path), **instrumentation.summary()}))
+    return results
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = build_parser("Recalculate the productivity of a range of months")
+    parser.add_argument("--start", required=True, help="First month of the range, YYYY-MM")
+    parser.add_argument("--end", required=True, help="Last month of the range, YYYY-MM")
+    parser.add_argument("--month-workers", type=int, default=1,
+                        help="Months processed at the same time, each in its own process")
+    parser.add_argument("--monthly-files", nargs="*", default=["productivity"],
+                        help="Keys of REQUIRED_FILES with one file per month, named <name>_YYYY-MM<extension>")
+    return parser.parse_args(argv)
+
+
+def backfill(args: argparse.Namespace, params: dict, instrumentation: Instrumentation, logger) -> Dict[str, dict]:
+    months = month_range(args.start, args.end)
+    required_files = params["REQUIRED_FILES"]
+    unknown = set(args.monthly_files) - set(required_files)
+    if unknown:
+        raise ValueError(f"Unknown monthly files: {sorted(unknown)}")
+    shared = [info for key, info in required_files.items() if key not in args.monthly_files]
+    monthly = {month_name(year, month): [month_parameters(params, year, month, args.monthly_files)["REQUIRED_FILES"][key]
+                                         for key in args.monthly_files]
+               for year, month in months}
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        tmp_path = Path(tmpdirname)
+        args = argparse.Namespace(**vars(args))
+        if args.no_cache:
+            # The months still share the parsed logs, through a cache that lives only for this run
+            args.cache_dir, args.no_cache = tmp_path / "stage_cache", False
+        cache = StageCache(args.cache_dir, args.cache_max_mb * 1024 ** 2, logger=logger)
+        logger.info(f"Backfill of {len(months)} months, {args.start} to {args.end}")
+
+        file_names = [info["name"] for info in shared] + [info["name"] for files in monthly.values() for info in files]
+        with instrumentation.stage('download', rows_in=len(file_names)) as stage:
+            stage.rows_out = len(download_inputs(file_names, tmp_path, logger))
+
+        with instrumentation.stage('validation', rows_in=len(file_names)):
+            if not FileValidator(shared, logger, cache).validate_files(tmp_path, validate_columns=False):
+                logger.error("Validation of the shared files failed. Exiting.")
+                return {}
+            invalid = {name for name, files in monthly.items()
+                       if not FileValidator(files, logger, cache).validate_files(tmp_path, validate_columns=False)}
+        valid_months = [(year, month) for year, month in months if month_name(year, month) not in invalid]
+        for name in sorted(invalid):
+            logger.error(f"Skipping {name}, its monthly files are missing or invalid")
+
+        with instrumentation.stage('share_event_logs') as stage:
+            parsed = share_event_logs(tmp_path, params, valid_months, args.monthly_files, cache, logger)
+            stage.rows_out = sum(parsed.values())
+
+        with instrumentation.stage('months', rows_in=len(valid_months)) as stage:
+            results = dict(map_chunks(run_months, valid_months, args.month_workers,
+                                      args, params, tmp_path, args.monthly_files))
+            stage.rows_out = sum(result['status'] == 'ok' for result in results.values())
+
+    summaries = {name: {'status': 'invalid'} for name in invalid}
+    summaries.update(results)
+    for name, result in sorted(summaries.items()):
+        if result['status'] == 'ok':
+            logger.info(f"{name} processed in {result['total_wall_s']:.1f} s")
+        else:
+            logger.error(f"{name} failed: {result.get('error', 'invalid inputs')}")
+    return dict(sorted(summaries.items()))
+
+
+def main(argv=None) -> bool:
+    args = parse_args(argv)
+    params = load_parameters()
+    logger = setup_logger(LOG_PATH)
+    instrumentation = Instrumentation(logger, trace_memory=args.trace_memory)
+    summary_path = Path(LOG_PATH).parent / SUMMARY_FILE
+    months = {}
+    try:
+        months = backfill(args, params, instrumentation, logger)
+        return bool(months) and all(result['status'] == 'ok' for result in months.values())
+    finally:
+        instrumentation.write_summary(summary_path, months=months)
+        close_logger(logger)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
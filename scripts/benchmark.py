@@ -0,0 +1,139 @@
+"""Time and memory profile of each stage of the batch pipeline.
+
+Runs the stages of main.py on a folder of input files (synthetic ones from
+synthetic_data.py by default) and writes a JSON with the wall and CPU time,
+the peak of Python allocations, the process peak RSS and the row counts of
+each, as recorded by instrumentation.Instrumentation.
+
+    python scripts/benchmark.py --employees 5000 --output bench.json
+    python scripts/benchmark.py --data-dir inputs/ --baseline bench.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from data_processor import DataProcessor
+from instrumentation import Instrumentation, frame_rows
+from productivity_data_cleaner import GoogleProductivityDataCleaner
+from report_generator import ReportGenerator
+from synthetic_data import generate_inputs
+
+STAGES = ['clean_data', 'load_employees', 'calculate_productivity', 'process_autodesk_by_day', 'process_meetings',
+          'process_chats', 'process_vpn', 'estimate_productivity_matrix', 'score_period', 'get_results',
+          'save_report']
+
+
+def run_stages(data_dir: Path, params: dict, output_dir: Path, workers: int = 1, engine: Optional[str] = None,
+               trace_memory: bool = True) -> List[dict]:
+    """Run every stage of the pipeline on the inputs of data_dir and measure it."""
+    required_files = params['REQUIRED_FILES']
+    year, month = params['YEAR'], params['MONTH']
+    work_path = str(data_dir) + '/'
+    instrumentation = Instrumentation(trace_memory=trace_memory)
+
+    cleaner = GoogleProductivityDataCleaner(work_path, required_files['productivity']['name'], year, month,
+                                            params['EMAILS_TO_DELETE'], engine=engine, workers=workers)
+    with instrumentation.stage('clean_data') as stage:
+        cleaned_data = cleaner.clean_data()
+        stage.rows_out = frame_rows(cleaned_data)
+    with instrumentation.stage('load_employees') as stage:
+        processor = DataProcessor(work_path, required_files, year, month, params['COEFFICIENTS'],
+                                  instrumentation=instrumentation, profiles=params.get('PROFILES'))
+        stage.rows_out = len(processor.df_employees)
+    with instrumentation.stage('calculate_productivity', rows_in=frame_rows(cleaned_data)) as stage:
+        productivity_by_day = processor.calculate_productivity(cleaned_data)
+        stage.rows_out = frame_rows(productivity_by_day)
+    with instrumentation.stage('get_results') as stage:
+        results = processor.get_results(productivity_by_day)
+        stage.rows_out = len(results)
+    with instrumentation.stage('save_report', rows_in=len(results)):
+        ReportGenerator().save_report(results, str(Path(output_dir) / 'reporte_productividad.xlsx'))
+
+    return [stage.to_dict() for stage in instrumentation.stages]
+
+
+def compare(stages: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+    """Stages whose wall time grew more than tolerance (a fraction) over the baseline.
+
+    Baselines written before the instrumentation module name their stages
+    under 'stage' instead of 'name'.
+    """
+    previous = {stage.get('name', stage.get('stage')): stage['wall_s'] for stage in baseline}
+    return [stage['name'] for stage in stages
+            if stage['name'] in previous and stage['wall_s'] > previous[stage['name']] * (1 + tolerance)]
+
+
+def run_benchmark(params: dict, data_dir: Optional[Path] = None, employees: int = 1000, days: Optional[int] = None,
+                  workers: int = 1, engine: Optional[str] = None, trace_memory: bool = True, seed: int = 0) -> Dict:
+    """Benchmark on data_dir, or on synthetic inputs of the given size when it is None."""
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        tmp_path = Path(tmpdirname)
+        inputs = None
+        if data_dir is None:
+            data_dir = tmp_path / 'inputs'
+            inputs = generate_inputs(data_dir, params['REQUIRED_FILES'], params['YEAR'], params['MONTH'],
+                                     employees, days, seed=seed)
+        stages = run_stages(Path(data_dir), params, tmp_path, workers, engine, trace_memory)
+
+    return {
+        'parameters': {'employees': employees if inputs else None, 'days': days, 'workers': workers,
+                       'engine': engine, 'trace_memory': trace_memory, 'seed': seed},
+        'environment': {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+                        'platform': platform.platform()},
+        'inputs': inputs,
+        'stages': stages,
+        'total_wall_s': round(sum(stage['wall_s'] for stage in stages if stage['parent'] is None), 4),
+    }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the stages of the productivity pipeline")
+    parser.add_argument("--data-dir", type=Path, default=None,
+                        help="Folder with the input files (synthetic inputs are generated when not given)")
+    parser.add_argument("--employees", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=None, help="Day sheets of the synthetic workbook")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--excel-engine", default=None)
+    parser.add_argument("--no-trace-memory", action="store_true",
+                        help="Skip tracemalloc, which slows the stages down")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=Path("benchmark.json"))
+    parser.add_argument("--baseline", type=Path, default=None,
+                        help="Previous benchmark JSON; exits with an error when a stage got slower")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Slowdown over the baseline allowed for each stage, as a fraction")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    with open(Path(__file__).parent / "initial_parameters.json", "r", encoding="utf-8") as f:
+        params = json.load(f)
+    result = run_benchmark(params, args.data_dir, args.employees, args.days, args.workers, args.excel_engine,
+                           not args.no_trace_memory, args.seed)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=4)
+
+    for stage in result['stages']:
+        print(f"{stage['name']:<30} {stage['wall_s']:>9.3f} s  {stage['peak_alloc_mb'] or '-':>8} MB")
+    print(f"{'total':<30} {result['total_wall_s']:>9.3f} s")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(result['stages'], json.load(f)['stages'], args.tolerance)
+        if regressions:
+            print(f"Slower than the baseline: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
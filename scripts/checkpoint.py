@@ -0,0 +1,149 @@
+"""Checkpoint of the days already processed, for incremental daily runs."""
+
+import hashlib
+import json
+import xml.etree.ElementTree as ET
+import zipfile
+from pathlib import Path
+from typing import Dict, List
+import logging
+
+import numpy as np
+import pandas as pd
+
+from data_processor import sheet_date
+from file_hash import frame_md5, json_md5
+from intermediate_store import IntermediateStore
+
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def sheet_fingerprints(xlsx_path: Path) -> Dict[str, str]:
+    """Fingerprint every sheet of a workbook without parsing its cells.
+
+    Uses the CRC and size the xlsx archive stores for each sheet part, so
+    sheets that did not change keep the same fingerprint between exports.
+    """
+    with zipfile.ZipFile(xlsx_path) as archive:
+        workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+        relations = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+        targets = {rel.get("Id"): rel.get("Target") for rel in relations.iter(f"{_PKG_REL_NS}Relationship")}
+
+        fingerprints = {}
+        for sheet in workbook.iter(f"{_MAIN_NS}sheet"):
+            target = targets[sheet.get(f"{_REL_NS}id")]
+            part = target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+            info = archive.getinfo(part)
+            fingerprints[sheet.get("name")] = f"{info.CRC:08x}-{info.file_size}"
+        return fingerprints
+
+
+def activity_fingerprints(activity_frames: Dict[str, pd.DataFrame], days: List[str]) -> Dict[str, str]:
+    """Fingerprint of the activity of each day ('YYYY-MM-DD') in every source table.
+
+    Only the Email column and the column of the day are hashed, so a day
+    keeps its fingerprint while the events of the other days change. A day
+    without a column counts as a day without activity.
+    """
+    fingerprints = {day: hashlib.md5() for day in days}
+    for name in sorted(activity_frames):
+        frame = activity_frames[name]
+        emails = pd.util.hash_pandas_object(frame['Email'], index=False).to_numpy().tobytes()
+        for day, md5 in fingerprints.items():
+            md5.update(name.encode("utf-8"))
+            if day in frame.columns:
+                md5.update(emails)
+                md5.update(frame[day].to_numpy(dtype=np.float64).tobytes())
+    return {day: md5.hexdigest() for day, md5 in fingerprints.items()}
+
+
+class Checkpoint:
+    """Remembers which day sheets of a month were processed and from which inputs.
+
+    Alongside a JSON state, it keeps the raw day sheets and their productivity
+    so the next run only reads the sheets that are new or changed and only
+    scores the days whose inputs changed.
+    """
+
+    STATE_FILE = "checkpoint.json"
+
+    def __init__(self, directory: Path, year: int, month: int, logger: logging.Logger = None) -> None:
+        self.directory = Path(directory) / f"{year}-{month:02d}"
+        self.logger = logger
+        self.store = IntermediateStore(self.directory, 'parquet', logger)
+        self.state = self._load_state()
+
+    def _load_state(self) -> dict:
+        state_path = self.directory / self.STATE_FILE
+        if not state_path.exists():
+            return {"sheets": {}, "days": {}}
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        # Checkpoints of older versions have no day keys, all their days are scored again
+        state.setdefault("days", {})
+        return state
+
+    def stale_sheets(self, sheets: Dict[str, str]) -> List[str]:
+        """Sheets that are new or whose fingerprint changed since the last run."""
+        return [name for name, fingerprint in sheets.items() if self.state["sheets"].get(name) != fingerprint]
+
+    def stale_days(self, days: Dict[str, str]) -> List[str]:
+        """Days that are new or whose inputs (key) changed since they were scored."""
+        return [name for name, key in days.items() if self.state["days"].get(name) != key]
+
+    def load(self, stage: str, sheet_names: List[str]) -> Dict[str, pd.DataFrame]:
+        return self.store.load(stage, sheet_names) if sheet_names else {}
+
+    def save(self, sheets: Dict[str, str], days: Dict[str, str],
+             raw_sheets: Dict[str, pd.DataFrame], productivity_by_day: Dict[str, pd.DataFrame]) -> None:
+        """Store the new sheets and scores, then the state that describes them."""
+        self.store.dump('raw_sheets', raw_sheets, replace=False)
+        self.store.dump('productivity_by_day', productivity_by_day, replace=False)
+
+        state = {"sheets": sheets, "days": days}
+        tmp_path = self.directory / f"{self.STATE_FILE}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=4)
+        tmp_path.replace(self.directory / self.STATE_FILE)
+        self.state = state
+
+
+def update_productivity(checkpoint: Checkpoint, cleaner, data_processor, context: dict,
+                        logger: logging.Logger = None) -> Dict[str, pd.DataFrame]:
+    """Productivity by day of the month, scoring only the new or changed days.
+
+    A day is read from the workbook only when its sheet is new or changed.
+    It is scored again only when its key changes: the key hashes its cleaned
+    sheet (which also reflects the reference employee list), its column of
+    every activity table, the coefficient matrix and the parameters in
+    context. The other days come from the checkpoint.
+    """
+    sheets = sheet_fingerprints(cleaner.input_name)
+    df_reference = cleaner.read_reference()
+
+    stale = checkpoint.stale_sheets(sheets)
+    raw_sheets = checkpoint.load('raw_sheets', [name for name in sheets if name not in stale])
+    raw_sheets.update(cleaner.read_raw_sheets(stale))
+    cleaned = cleaner.clean_sheets({name: raw_sheets[name] for name in sheets}, df_reference)
+
+    activity_frames = data_processor.load_activity_frames()
+    df_coefficients_matrix = data_processor.estimate_productivity_matrix()
+    shared = json_md5([json_md5(context), frame_md5(df_coefficients_matrix)])
+    activity = activity_fingerprints(activity_frames, [sheet_date(name) for name in sheets])
+    days = {name: json_md5([shared, frame_md5(cleaned[name]), activity[sheet_date(name)]]) for name in sheets}
+
+    days_to_score = checkpoint.stale_days(days)
+    if logger:
+        logger.info(f"Incremental run: {len(stale)} new or changed sheets, {len(days_to_score)} days to score")
+
+    scored = {}
+    if days_to_score:
+        scored = data_processor.calculate_productivity({name: cleaned[name] for name in days_to_score},
+                                                       activity_frames, df_coefficients_matrix)
+    previous = checkpoint.load('productivity_by_day', [name for name in sheets if name not in scored])
+    productivity_by_day = {name: scored[name] if name in scored else previous[name] for name in sheets}
+
+    checkpoint.save(sheets, days, {name: raw_sheets[name] for name in stale}, scored)
+    return productivity_by_day
@@ -1,16 +1,72 @@
+import numpy as np
 import pandas as pd
 import datetime
 import re
 from calendar import monthrange
+from scoring_engine import SIGNAL_COLUMNS, save_signal_matrix, score_signals, signal_bitmask
+from instrumentation import Instrumentation, frame_rows
+from profile_engine import DEFAULT_PROFILES, coefficient_matrix
+from workbook_reader import WorkbookReader
+from stage_cache import StageCache
+from event_aggregator import aggregate_chats, aggregate_meetings, aggregate_vpn, read_chats, read_meetings, read_vpn
+
+# Days with more outgoing VPN traffic than this count as connected
+VPN_THRESHOLD_MB = 5
+
+def sheet_date(sheet_name: str) -> str:
+    """'YYYY-MM-DD' of a day sheet named with the date, with or without zero padding."""
+    date_parts = sheet_name.split('-')
+    date = datetime.datetime(int(date_parts[0]), int(date_parts[1]), int(date_parts[2]))
+    return date.strftime("%Y-%m-%d")
+
+
+def read_autodesk_usage(path: str) -> pd.DataFrame:
+    """email and day_used of every row of the 'Uso' sheet of the Autodesk export."""
+    with WorkbookReader(path) as reader:
+        return reader.read_sheet('Uso', usecols=[4, 9])
+
+
+def autodesk_activity(df_autodesk: pd.DataFrame, year: int, month: int) -> pd.DataFrame:
+    """Autodesk use of each user on the days of a month, from the email and day_used columns of the 'Uso' sheet.
+
+    The uint8 table is allocated once with every day of the month. Days
+    without any use in the sheet get 1 for the users active on at least 30%
+    of the other days (not counting the first of them).
+    """
+    emails = pd.Series([str(email).lower() for email in df_autodesk['email']], index=df_autodesk.index)
+    # Uses of every (Email, day), the same table as pivot_table(aggfunc=len) without its overhead
+    used_by_day = pd.DataFrame({'Email': emails, 'day_used': df_autodesk['day_used']})
+    uses = used_by_day.groupby(['Email', 'day_used']).size().unstack(fill_value=0)
+    uses.columns = [str_date.strftime('%Y-%m-%d') for str_date in uses.columns]
+
+    month_days = [f"{year}-{month:02d}-{day:02d}" for day in range(1, monthrange(year, month)[1] + 1)]
+    used_days = [day for day in uses.columns if day in set(month_days)]
+    used = uses[used_days].to_numpy() > 0
+
+    table = np.zeros((len(uses), len(month_days)), dtype=np.uint8)
+    positions = {day: index for index, day in enumerate(month_days)}
+    table[:, [positions[day] for day in used_days]] = used
+    missing = [positions[day] for day in month_days if day not in set(used_days)]
+    if missing:
+        usual = used[:, 1:].mean(axis=1) >= 0.3 if len(used_days) > 1 else np.zeros(len(uses), dtype=bool)
+        table[:, missing] = usual[:, np.newaxis]
+
+    df_autodesk_table = pd.DataFrame(table, columns=month_days)
+    df_autodesk_table.insert(0, 'Email', uses.index.to_numpy())
+    return df_autodesk_table
+
 
 class DataProcessor:
 
-    def __init__(self, path: str, required_files: dict, year: int, month: int, coefficients: dict, logger=None) -> None:
+    def __init__(self, path: str, required_files: dict, year: int, month: int, coefficients: dict, logger=None, store=None, instrumentation: Instrumentation = None, profiles: list = None, cache: StageCache = None) -> None:
         # inputs
         self.year = year
         self.month = month
         self.logger = logger
-        self.google_productivity_path = path + "data_cleaned.xlsx"
+        # Optional Instrumentation that measures each stage of calculate_productivity
+        self.instrumentation = instrumentation or Instrumentation(enabled=False)
+        # Optional StageCache that reuses the parsed inputs while their files do not change
+        self.cache = cache or StageCache(None)
         self.autodesk_path = path + required_files.get("autodesk")['name']
         self.meetings_path = path + required_files.get("meetings")['name']
         self.chats_source_path = path + required_files.get("chats")['name']
@@ -20,300 +76,187 @@ class DataProcessor:
         # last day of the month
         self.last_day_of_month = monthrange(year, month)[1]
         self.last_day_of_month = f"{year}-{month:02d}-{self.last_day_of_month:02d}" 
+        # Days of the month, the columns of the activity tables
+        self.month_days = [f"{year}-{month:02d}-{day:02d}" for day in range(1, monthrange(year, month)[1] + 1)]
         
         # outputs
-        self.productivity_by_day_filename = path + "productivity_by_day.xlsx"
+        self.productivity_by_day = None
+        self.signal_matrix = None
+        # Optional IntermediateStore to dump the productivity by day for debugging
+        self.store = store
 
-        # Coefficients for each activity
-        self.productivity_columns = list(coefficients['productivity_coefficients_modelers'].keys())
-        self.productivity_coefficients_modelers = pd.Series(coefficients['productivity_coefficients_modelers'])
-        self.productivity_coefficients_cat12345 = pd.Series(coefficients['productivity_coefficients_cat12345'])
-        self.productivity_coefficients_others = pd.Series(coefficients['productivity_coefficients_others'])
+        # Coefficients for each activity, assigned to the employees through the profiles
+        self.coefficients = coefficients
+        self.profiles = profiles or DEFAULT_PROFILES
+        self.productivity_columns = list(SIGNAL_COLUMNS)
 
-        #create a sort and clean employee's list with Email and Cat[dd] . Consider only ingetec.com.co emails and unique values 
-        self.df_employees = pd.read_excel(self.personal_info_path)
-        self.df_employees['Email'] = self.df_employees['Email'].str.lower() 
-        self.df_employees.dropna(subset=['Email', 'Cat'], inplace=True)
-        self.df_employees.drop_duplicates(subset=['Email'], inplace=True, keep='first')
-        self.df_employees = self.df_employees[self.df_employees['Email'].str.contains('@ingetec.com.co')]
-        self.df_employees.sort_values(by=['Email'], inplace=True)
-        self.df_employees = self.df_employees[[True if email.split('@')[1] == 'ingetec.com.co' else False for email in self.df_employees['Email']]]
-        self.df_employees['Cat'] = self.df_employees['Cat'].apply(lambda cat: str(cat)[0:2] if bool(re.search(r'\d', str(cat))) else str(cat)[0:2])
-        self.df_employees.reset_index(drop=True, inplace=True)
+        self.df_employees = self.cache.get_or_compute('employees', [self.personal_info_path], {}, self.load_employees)
         if self.logger:
             self.logger.info("Employee data loaded")
         
-    def calculate_productivity(self) -> str:
+    def load_employees(self) -> pd.DataFrame:
+        #create a sort and clean employee's list with Email and Cat[dd] . Consider only ingetec.com.co emails and unique values 
+        df_employees = pd.read_excel(self.personal_info_path)
+        df_employees['Email'] = df_employees['Email'].str.lower() 
+        df_employees.dropna(subset=['Email', 'Cat'], inplace=True)
+        df_employees.drop_duplicates(subset=['Email'], inplace=True, keep='first')
+        df_employees = df_employees[df_employees['Email'].str.contains('@ingetec.com.co')]
+        df_employees.sort_values(by=['Email'], inplace=True)
+        df_employees = df_employees[[True if email.split('@')[1] == 'ingetec.com.co' else False for email in df_employees['Email']]]
+        df_employees['Cat'] = df_employees['Cat'].apply(lambda cat: str(cat)[0:2] if bool(re.search(r'\d', str(cat))) else str(cat)[0:2])
+        df_employees.reset_index(drop=True, inplace=True)
+        return df_employees
+
+    def load_activity_frames(self) -> dict:
+        """Activity table of each source (Autodesk, Meetings, Chat, VPN), from the stage cache when its file did not change."""
+        activity_sources = {
+            'Autodesk': (self.process_autodesk_by_day, self.autodesk_path), # When I have generated data exactly of 30 days
+            # 'Autodesk': (self.process_autodesk_average, self.autodesk_path), # When I just have a monthly average
+            'Meetings': (self.process_meetings, self.meetings_path),
+            'Chat': (self.process_chats, self.chats_source_path),
+            'VPN': (self.process_vpn, self.vpn_path),  # Process VPN data
+        }
+        activity_frames = {}
+        for activity, (process, source_path) in activity_sources.items():
+            with self.instrumentation.stage(process.__name__) as stage:
+                activity_frames[activity] = self.cache.get_or_compute(
+                    process.__name__, [source_path], {'year': self.year, 'month': self.month}, process)
+                stage.rows_out = len(activity_frames[activity])
+        return activity_frames
+
+    def calculate_productivity(self, cleaned_data: dict = None, activity_frames: dict = None, df_coefficients_matrix: pd.DataFrame = None) -> dict:
+        """Score every day sheet of the cleaned Google productivity data.
+
+        cleaned_data maps each sheet name to its cleaned DataFrame, as returned
+        by GoogleProductivityDataCleaner.clean_data. When it is not given, the
+        sheets are read back from the intermediate store. activity_frames and
+        df_coefficients_matrix are loaded when they are not given.
+        """
         if self.logger:
             self.logger.info("Calculating productivity")
+        if cleaned_data is None:
+            if not self.store:
+                raise ValueError("No cleaned data given and no intermediate store to load it from")
+            cleaned_data = self.store.load('data_cleaned')
+
+        if activity_frames is None:
+            activity_frames = self.load_activity_frames()
+        if df_coefficients_matrix is None:
+            with self.instrumentation.stage('estimate_productivity_matrix') as stage:
+                df_coefficients_matrix = self.estimate_productivity_matrix()
+                stage.rows_out = len(df_coefficients_matrix)
+
+        # Key every day sheet by its formatted date
+        day_frames = {}
+        for sheet_name, df_productivity_day in cleaned_data.items():
+            if self.logger:
+                self.logger.info(f"Processing sheet {sheet_name}")
+            day_frames[sheet_date(sheet_name)] = df_productivity_day
+
+        # Score all the days of the month in a single batch
+        with self.instrumentation.stage('score_period', rows_in=frame_rows(day_frames)) as stage:
+            scored_days, tensor, present = score_signals(day_frames, activity_frames, df_coefficients_matrix)
+            stage.rows_out = frame_rows(scored_days)
+        self.productivity_by_day = dict(zip(cleaned_data, scored_days.values()))
+        # Binary signals behind the scores, for the what-if analysis of other coefficients
+        self.signal_matrix = (tensor, present, df_coefficients_matrix, list(day_frames))
 
-        df_autodesk_complete = self.process_autodesk_by_day() # When I have generated data exactly of 30 days
-        # df_autodesk_complete = self.process_autodesk_average() # When I just have a monthly average
-        df_meetings_complete = self.process_meetings()
-        df_chats_complete = self.process_chats()
-        df_vpn_complete = self.process_vpn()  # Process VPN data
-        df_coefficients_matrix = self.estimate_productivity_matrix()
-        excel_file = pd.ExcelFile(self.google_productivity_path)
-
-        # Create a Pandas Excel writer using XlsxWriter as the engine.
-        with pd.ExcelWriter(self.productivity_by_day_filename, engine='xlsxwriter') as writer:
-            # Loop through each sheet name
-            for sheet_name in excel_file.sheet_names:
-                # Read in the sheet as a DataFrame
-                df_productivity_day = pd.read_excel(self.google_productivity_path, sheet_name=sheet_name)
-
-                # create a date object
-                date_parts = sheet_name.split('-')
-                if self.logger:
-                    self.logger.info(f"Processing sheet {sheet_name}")
-                date = datetime.datetime(int(date_parts[0]), int(date_parts[1]), int(date_parts[2]))
-
-                # format the date object
-                formatted_date = date.strftime("%Y-%m-%d")
-
-                #Analyzing files behavior
-                new_column = df_productivity_day['Added files'] + df_productivity_day['Other added files']
-                df_productivity_day.insert(9, 'Add files', [1 if x > 0 else 0 for x in new_column])
-                df_productivity_day.drop(['Added files', 'Other added files'], axis=1, inplace=True)
-                df_productivity_day['Drive last use'] = [1 if str(datestamp).split('T')[0] == formatted_date else 0 for datestamp in df_productivity_day['Drive last use']]
-                df_productivity_day['Edited files'] = [1 if x > 0 else 0 for x in df_productivity_day['Edited files']]
-                df_productivity_day['Viewed files'] = [1 if x > 0 else 0 for x in df_productivity_day['Viewed files']]
-
-                #Analyzing email behavior
-                df_productivity_day['Email last use'] = [1 if str(datestamp).split('T')[0] == formatted_date else 0 for datestamp in df_productivity_day['Email last use']]
-                df_productivity_day['Sent emails'] = [1 if x > 0 else 0 for x in df_productivity_day['Sent emails']]
-
-                # Additional columns
-                # CHATS
-                df_chats = pd.DataFrame()
-                df_chats['Email'] = df_chats_complete['Email']
-                df_chats['Chat'] = [1 if x > 0 else 0 for x in df_chats_complete[formatted_date]]
-                df_productivity_day = pd.merge(df_productivity_day, df_chats, on='Email', how='left')
-                df_productivity_day.fillna(0, inplace=True)
-
-                # MEETINGS
-                df_meetings = pd.DataFrame()
-                df_meetings['Email'] = df_meetings_complete['Email']
-                df_meetings['Meetings'] = [1 if x > 0 else 0 for x in df_meetings_complete[formatted_date]]
-                df_productivity_day = pd.merge(df_productivity_day, df_meetings, on='Email', how='left')
-                df_productivity_day.fillna(0, inplace=True)
-
-                # AUTODESK
-                df_autodesk = pd.DataFrame()
-                df_autodesk['Email'] = df_autodesk_complete['Email']
-                df_autodesk['Autodesk'] = [1 if x > 0 else 0 for x in df_autodesk_complete[formatted_date]]
-                df_productivity_day = pd.merge(df_productivity_day, df_autodesk, on='Email', how='left')
-                df_productivity_day.fillna(0, inplace=True)
-
-                # VPN - Add this section
-                df_vpn = pd.DataFrame()
-                df_vpn['Email'] = df_vpn_complete['Email']
-                df_vpn['VPN'] = [1 if x > 0 else 0 for x in df_vpn_complete.get(formatted_date, [0] * len(df_vpn_complete))]
-                df_productivity_day = pd.merge(df_productivity_day, df_vpn, on='Email', how='left')
-                df_productivity_day.fillna(0, inplace=True)
-
-
-                # delete emails that are not in both dataframes
-                emails_to_delete_in_coefficient = list(df_coefficients_matrix[~df_coefficients_matrix['Email'].isin(df_productivity_day['Email'])]['Email'])
-                emails_to_delete_in_productivity = list(df_productivity_day[~df_productivity_day['Email'].isin(df_coefficients_matrix['Email'])]['Email'])
-                df_coefficients_matrix = df_coefficients_matrix[~df_coefficients_matrix['Email'].isin(emails_to_delete_in_coefficient)]
-                df_productivity_day = df_productivity_day[~df_productivity_day['Email'].isin(emails_to_delete_in_productivity)]
-
-                # Prepare dataframes to be multiplied
-                df_coefficients_matrix.reset_index(inplace=True, drop=True)
-                df_productivity_day.reset_index(inplace=True, drop=True)
-                productivity = df_productivity_day.iloc[:, 2:12] * df_coefficients_matrix.iloc[:, 2:12]
-                productivity['Productivity'] = productivity.sum(axis=1)
-                productivity['Productivity'] = [1 if x > 1 else x for x in productivity['Productivity']]
-                productivity.insert(0, 'Email', df_productivity_day['Email'])
-                productivity.insert(1, 'Username', df_productivity_day['Username'])
-                productivity.insert(1, 'Cat', df_coefficients_matrix['Cat'])
-                productivity.to_excel(writer, sheet_name=sheet_name, index=False)
         if self.logger:
-            self.logger.info(f"Productivity by day saved to {self.productivity_by_day_filename}")
-        return self.productivity_by_day_filename
+            self.logger.info(f"Productivity calculated for {len(self.productivity_by_day)} days")
+        if self.store:
+            self.store.dump('productivity_by_day', self.productivity_by_day)
+        return self.productivity_by_day
+
+    def save_signals(self, path: str) -> str:
+        """Write the signal matrix of the last calculate_productivity to an .npz file."""
+        if self.signal_matrix is None:
+            raise ValueError("Productivity has not been calculated yet")
+        tensor, present, df_coefficients_matrix, dates = self.signal_matrix
+        path = save_signal_matrix(path, tensor, present, df_coefficients_matrix, dates, self.profiles)
+        if self.logger:
+            self.logger.info(f"Signal matrix saved to {path}")
+        return path
+
+    def signal_masks(self) -> pd.DataFrame:
+        """Email, fecha and senales of every employee and day scored by the last calculate_productivity.
+
+        senales is the bitmask of the active signals, bit i for SIGNAL_COLUMNS[i],
+        stored with each record for the radar chart of the API.
+        """
+        if self.signal_matrix is None:
+            raise ValueError("Productivity has not been calculated yet")
+        tensor, present, df_coefficients_matrix, dates = self.signal_matrix
+        masks = signal_bitmask(tensor)
+        rows, days = np.nonzero(present)
+        fechas = np.array([datetime.date.fromisoformat(day) for day in dates], dtype=object)
+        return pd.DataFrame({
+            'Email': df_coefficients_matrix['Email'].to_numpy()[rows],
+            'fecha': fechas[days],
+            'senales': masks[rows, days],
+        })
 
     def process_meetings(self) -> pd.DataFrame:
-        df = pd.read_excel(self.meetings_path)
-
-        # create a dataframe with only the columns we need
-        df_meet = pd.DataFrame(data=df, columns=['Fecha', 'Actor', 'Código de reunión'])
-        df_meet['Fecha'] = [day.split('T')[0] for day in df_meet['Fecha']]
-        
-        #Eliminates all rows that do not contain "@ingetec"
-        df_meet = df_meet[df_meet['Actor'].str.contains('@ingetec') == True]
-
-        # delete duplicates
-        df_meet = df_meet.drop_duplicates(subset=['Actor', 'Código de reunión', 'Fecha'], keep='first')
-
-        # create a pivot table with 'Actor' on rows and 'Fecha' on columns
-        pivot_table = pd.pivot_table(df_meet, index='Actor', columns='Fecha', aggfunc=len, fill_value=0)
-        
-        # Drop the first level of the pivot table
-        pivot_table.columns = pivot_table.columns.droplevel(0)
-        pivot_table.columns.name = None
-        
-        # Drop columns that are not in the month
-        columns_to_keep = list(map(lambda day: f"{self.year}-{str(self.month).zfill(2)}-{str(day).zfill(2)}", range(1, monthrange(self.year, self.month)[1]+1)))
-        pivot_table.drop([col for col in pivot_table.columns if col not in columns_to_keep], axis=1, inplace=True)
-        
-        # Reset the index of the pivot table
-        pivot_table = pivot_table.rename_axis(None, axis=1)
-        pivot_table.index.name = 'Email'
-        pivot_table.reset_index(inplace=True)
-        
-        return pivot_table
+        # Distinct meetings of each company actor per day, read in chunks
+        return aggregate_meetings(read_meetings(self.meetings_path), self.month_days)
 
     def estimate_productivity_matrix(self) -> pd.DataFrame:
-        # This is the list of autodesk users that are also in the employee list
-        autodesk_user_list = list(pd.read_excel(self.autodesk_path, sheet_name='Autodesk users')['Email'].str.lower())
-        autodesk_user_list = list(set(autodesk_user_list) - (set(autodesk_user_list) - set(self.df_employees['Email'])))
-        autodesk_user_list.sort()
-        
-        # Replace NaN values with productivity_coefficients_others
-        df_productivity = pd.DataFrame(data=self.df_employees, columns=['Email', 'Cat'] + self.productivity_columns)
-        df_productivity.iloc[:, 2:] = df_productivity.iloc[:, 2:].fillna(self.productivity_coefficients_others)
-        
-        # Replace values with coefficients for rows where Email is in autodesk_user_list
-        mask_modelers = [True if email in autodesk_user_list else False for email in df_productivity['Email']]
-        df_productivity.iloc[mask_modelers, 2:] = df_productivity.iloc[mask_modelers, 2:].apply(lambda row: self.productivity_coefficients_modelers, axis=1)
+        # Emails of the Autodesk users, for the profiles that match on them
+        with WorkbookReader(self.autodesk_path) as reader:
+            autodesk_users = reader.read_sheet('Autodesk users')['Email'].dropna().astype(str).str.lower()
+        lists = {'autodesk_users': set(autodesk_users)}
 
-        # Replace values with coefficients for rows where Cat is in categories
-        categories = ['01', '02', '03', '04', '05']
-        mask_categories12345 = [True if cat in categories else False for cat in df_productivity['Cat']]
-        df_productivity.iloc[mask_categories12345, 2:] = df_productivity.iloc[mask_categories12345, 2:].apply(lambda row: self.productivity_coefficients_cat12345, axis=1)
-
-        # df_productivity.to_excel("matriz de productividad.xlsx", index=False)
-        return df_productivity
+        return coefficient_matrix(self.df_employees, self.profiles, self.coefficients, self.productivity_columns, lists)
 
     def process_chats(self) -> pd.DataFrame:
-        df = pd.read_csv(self.chats_source_path)
-
-        df['day'] = [str(fecha).split("T")[0] for fecha in df['Fecha']]
-        df['hour'] = [str(fecha).split("T")[1][0:2] for fecha in df['Fecha']]
-        df.drop(['Fecha'], axis=1, inplace=True)
-
-        pivot_table = pd.pivot_table(df, index='Actor', columns='day', aggfunc='count', fill_value=0)
-
-        pivot_table.columns = pivot_table.columns.get_level_values(1)
-        pivot_table = pivot_table.reset_index()
-        df_chats = pivot_table.iloc[:, 1:]
-        df_chats[df_chats > 1] = 1
-        df_chats.insert(0, 'Email', pivot_table.iloc[:, 0])
-        df_chats = df_chats.rename_axis(None, axis=1)
-        df_chats.reset_index(inplace=True, drop=True)
-        
-        return df_chats
+        # 1 on the days each actor sent chat messages, read in chunks
+        return aggregate_chats(read_chats(self.chats_source_path), self.month_days)
 
     def process_autodesk_by_day(self) -> pd.DataFrame:
-        df_autodesk = pd.read_excel(self.autodesk_path, sheet_name='Uso', usecols=[4,9])
-            
-        df_autodesk['email'] = [str(email).lower() for email in df_autodesk['email']]
-        df_autodesk.rename(columns={'email': 'Email'}, inplace=True)
-        df_autodesk_table = pd.pivot_table(df_autodesk, index='Email', columns='day_used', aggfunc=len, fill_value=0)
-        df_autodesk_table[df_autodesk_table > 0] = 1
-        df_autodesk_table.columns = [str_date.strftime('%Y-%m-%d') for str_date in df_autodesk_table.columns]
-
-        columns_month = set(map(lambda day: f"{self.year}-{str(self.month).zfill(2)}-{str(day).zfill(2)}", range(1, monthrange(self.year, self.month)[1] + 1)))
-        set_columns = set(df_autodesk_table.columns)
-        columns_to_delete = set_columns - columns_month
-        df_autodesk_table.drop(axis=1, columns=columns_to_delete, inplace=True)
-
-        columns_to_add = list(columns_month - set_columns)
-        columns_to_add.sort()
-
-        df_mean = [1 if mean >= 0.3 else 0 for mean in df_autodesk_table.iloc[:, 1:].mean(axis=1)]
-        for i in range(len(columns_to_add)):
-            df_autodesk_table.insert(loc=0, column=columns_to_add.pop(-1), value=df_mean)
-        
-        df_autodesk_table.reset_index(inplace=True)
-        
-        return df_autodesk_table
+        return autodesk_activity(read_autodesk_usage(self.autodesk_path), self.year, self.month)
     
     def process_autodesk_average(self) -> pd.DataFrame:
         df_autodesk = pd.read_excel(self.autodesk_path, sheet_name='Detalles del usuario')
         df_autodesk = df_autodesk[['email', 'monthly_average']]
         df_autodesk['email'] = df_autodesk['email'].str.lower()
         df_autodesk = df_autodesk.groupby(['email']).sum().reset_index()
-        
-        df_autodesk['reference'] = [1 if average>10 else 0 for average in df_autodesk['monthly_average']]
-        df_autodesk_table = pd.DataFrame()
-        df_autodesk_table['Email'] = df_autodesk['email'].apply(lambda x: str(x).lower())
-        columns_month = list(map(lambda day: f"{self.year}-{str(self.month).zfill(2)}-{str(day).zfill(2)}", range(1, monthrange(self.year, self.month)[1] + 1)))
-        
-        for day in columns_month:
-            df_autodesk_table[day] = df_autodesk['reference']
 
+        # Every day of the month gets the monthly reference, 1 above 10 on average
+        reference = (df_autodesk['monthly_average'] > 10).to_numpy(dtype=np.uint8)
+        df_autodesk_table = pd.DataFrame(np.repeat(reference[:, np.newaxis], len(self.month_days), axis=1),
+                                         columns=self.month_days)
+        df_autodesk_table.insert(0, 'Email', [str(email).lower() for email in df_autodesk['email']])
         return df_autodesk_table
 
     def process_vpn(self) -> pd.DataFrame:
-        
-        df = pd.read_csv(self.vpn_path, encoding='utf-8')
-        
-        # Rename columns to match our needs
-        df.columns = ['Usuario', 'IP', 'Trafico_Salida', 'Fecha']
-
-        # Convert Usuario to Email by adding domain
-        df['Email'] = df['Usuario'].str.lower() + '@ingetec.com.co'
-
-        # Format date to YYYY-MM-DD
-        df['day'] = pd.to_datetime(df['Fecha'], format='%d/%m/%Y').dt.strftime('%Y-%m-%d')
-
-        # Convert traffic to MB (handle GB, MB, KB)
-        def convert_to_mb(traffic_str):
-            value = float(traffic_str.split(' ')[0])
-            unit = traffic_str.split(' ')[1]
-            
-            if unit == 'GB':
-                return value * 1024  # Convert GB to MB
-            elif unit == 'MB':
-                return value  # Already in MB
-            elif unit == 'KB':
-                return value / 1024  # Convert KB to MB
-            else:
-                return 0  # Unknown unit
-
-        df['Traffic_MB'] = df['Trafico_Salida'].apply(convert_to_mb)
-
-        # Create a pivot table summing traffic by Email and day
-        pivot_table = pd.pivot_table(df, values='Traffic_MB', index='Email', 
-                                        columns='day', aggfunc='sum', fill_value=0)
-
-        # Create columns for each day in the month
-        columns_month = list(map(lambda day: f"{self.year}-{str(self.month).zfill(2)}-{str(day).zfill(2)}", 
-                                range(1, monthrange(self.year, self.month)[1] + 1)))
-
-        # Add missing days with zero traffic
-        for day in columns_month:
-            if day not in pivot_table.columns:
-                pivot_table[day] = 0
-
-        # Keep only columns for current month
-        pivot_table = pivot_table[columns_month]
-
-        # For productivity calculation, convert to binary (1 if used VPN, 0 if not)
-        # Store the original traffic data in case you need it for reporting
-        pivot_table_binary = pivot_table.copy()
-        pivot_table_binary[pivot_table_binary > 5] = 1 # greater than 5MB per day
-
-        # Reset index
-        pivot_table_binary = pivot_table_binary.reset_index()
-        
-        return pivot_table_binary
-
-    def get_results(self) -> pd.DataFrame:
-        # Load the Excel file into a pandas ExcelFile object
-        xlsx = pd.ExcelFile(self.productivity_by_day_filename)
-
-        # Create a dictionary to store the DataFrames, one for each sheet
-        dfs = {sheet_name: xlsx.parse(sheet_name) for sheet_name in xlsx.sheet_names}
-        
-        results_df = pd.DataFrame(data=dfs[self.last_day_of_month][['Email', 'Username', 'Cat']])
+        # Outgoing traffic by user and day, 1 above 5MB per day, read in chunks
+        return aggregate_vpn(read_vpn(self.vpn_path), self.month_days, threshold_mb=VPN_THRESHOLD_MB)
+
+    def get_results(self, productivity_by_day: dict = None) -> pd.DataFrame:
+        # Productivity by day, one DataFrame for each sheet
+        if productivity_by_day is not None:
+            dfs = productivity_by_day
+        elif self.productivity_by_day is not None:
+            dfs = self.productivity_by_day
+        elif self.store:
+            dfs = self.store.load('productivity_by_day')
+        else:
+            raise ValueError("Productivity has not been calculated yet")
+
+        # Employees of the last day of the month, or of the last day available in mid-month runs
+        reference_day = self.last_day_of_month if self.last_day_of_month in dfs else list(dfs)[-1]
+        reference = dfs[reference_day]
+        results_df = pd.DataFrame({column: reference[column].to_numpy(dtype=object) for column in ['Email', 'Username', 'Cat']})
         results_df = pd.merge(results_df, self.df_employees[['Email', 'División', 'Departamento']], on='Email', how='left')
 
-        for day in dfs:
-            employees_to_delete = list(set(dfs[day]['Email']) - set(results_df['Email']))
-            df_day = dfs[day][~dfs[day]['Email'].isin(employees_to_delete)].reset_index(drop=True)
-            results_df[day.split('-')[2]] = df_day['Productivity']
-
-        return results_df
+        # Align each day to the employees by email, into one matrix; days an employee is missing are left empty
+        emails = pd.Index(reference['Email'])
+        scores = np.full((len(results_df), len(dfs)), np.nan)
+        for position, df_day in enumerate(dfs.values()):
+            day_emails = pd.Index(df_day['Email'])
+            first = ~day_emails.duplicated()
+            rows = day_emails[first].get_indexer(emails)
+            found = rows >= 0
+            scores[found, position] = df_day['Productivity'].to_numpy()[first][rows[found]]
+
+        days = pd.DataFrame(scores, columns=[day.split('-')[2] for day in dfs])
+        return pd.concat([results_df, days], axis=1)
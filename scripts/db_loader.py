@@ -0,0 +1,72 @@
+"""Pipeline stage that loads the monthly results into the API database."""
+
+import sys
+from datetime import date
+from pathlib import Path
+from typing import List, Optional
+import logging
+
+import pandas as pd
+
+# The API package lives at the repository root, next to scripts/
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+ID_COLUMNS = {
+    'Email': 'email',
+    'Username': 'username',
+    'Cat': 'cat',
+    'División': 'division',
+    'Departamento': 'departamento',
+}
+
+
+def results_to_records(results: pd.DataFrame, year: int, month: int, signals: Optional[pd.DataFrame] = None) -> List[dict]:
+    """Turn the wide get_results frame (one column per day) into one record per employee and day.
+
+    signals is the DataProcessor.signal_masks table (Email, fecha, senales).
+    Records without an entry in it get senales None, which keeps the bitmask
+    already stored for them.
+    """
+    day_columns = [column for column in results.columns if column not in ID_COLUMNS]
+    df = results.melt(id_vars=list(ID_COLUMNS), value_vars=day_columns, var_name='day', value_name='productividad')
+    df = df.dropna(subset=['productividad'])
+    df = df.rename(columns=ID_COLUMNS)
+    df['fecha'] = df.pop('day').map({day: date(year, month, int(day)) for day in day_columns})
+    df['username'] = df['username'].fillna('')
+    if signals is not None:
+        df = df.merge(signals.rename(columns={'Email': 'email'}), on=['email', 'fecha'], how='left')
+        df['senales'] = df['senales'].astype('Int64')
+    else:
+        df['senales'] = None
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict('records')
+
+
+class DatabaseLoader:
+    """Upserts the productivity results into the ProductivityRecord table."""
+
+    def __init__(self, logger: logging.Logger = None, batch_size: int = None) -> None:
+        self.logger = logger
+        self.batch_size = batch_size
+
+    def load(self, results: pd.DataFrame, year: int, month: int, signals: Optional[pd.DataFrame] = None) -> int:
+        if str(REPO_ROOT) not in sys.path:
+            sys.path.insert(0, str(REPO_ROOT))
+        from app import crud
+        from app.database import Base, SessionLocal, engine
+        from app.rollups import ensure_rollups
+
+        Base.metadata.create_all(bind=engine)
+        crud.ensure_indexes(engine)
+        crud.ensure_columns(engine)
+        records = results_to_records(results, year, month, signals)
+        db = SessionLocal()
+        try:
+            ensure_rollups(db)
+            kwargs = {'batch_size': self.batch_size} if self.batch_size else {}
+            count = crud.bulk_upsert_records(db, records, **kwargs)
+        finally:
+            db.close()
+        if self.logger:
+            self.logger.info(f"Loaded {count} productivity records into the database")
+        return count
@@ -2,63 +2,219 @@
 
 import io
 import shutil
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 import logging
 
+import httplib2
+from google.auth.exceptions import TransportError
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseDownload
 
+from file_hash import file_md5
+
+# Drive answers these statuses when a request can be retried
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Errors of the connection itself, the only ones retried besides the statuses above
+TRANSPORT_ERRORS = (socket.timeout, ConnectionError, httplib2.HttpLib2Error, TransportError)
+
+FILE_FIELDS = "id,name,md5Checksum,modifiedTime,size"
+
+
+class DriveCache:
+    """Local copies of downloaded Drive files, keyed by their content.
+
+    Files are stored under their Drive md5Checksum. Files without checksum
+    (Google native documents) are keyed by their id and modifiedTime.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(metadata: dict) -> str:
+        if metadata.get("md5Checksum"):
+            return metadata["md5Checksum"]
+        return f"{metadata['id']}-{metadata.get('modifiedTime', '')}".replace(":", "")
+
+    def get(self, metadata: dict) -> Optional[Path]:
+        """Return the cached copy of a file, if any."""
+        path = self.directory / self.key(metadata)
+        return path if path.exists() else None
+
+    def put(self, metadata: dict, source: Path) -> Path:
+        """Store a downloaded file in the cache."""
+        path = self.directory / self.key(metadata)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        shutil.copyfile(source, tmp_path)
+        tmp_path.replace(path)
+        return path
+
+
 class DriveConnector:
     """Connects to a Google Drive folder and downloads required files."""
 
-    def __init__(self, logger: logging.Logger, credentials_file: Path, folder_id: str) -> None:
+    def __init__(
+        self,
+        logger: logging.Logger,
+        credentials_file: Path,
+        folder_id: str,
+        cache_dir: Optional[Path] = None,
+        max_workers: int = 4,
+        chunk_size: int = 10 * 1024 * 1024,
+        retries: int = 5,
+        backoff: float = 1.0,
+        service=None,
+    ) -> None:
         self.logger = logger
         self.credentials_file = Path(credentials_file)
         self.folder_id = folder_id
-        self.service = None
+        self.cache = DriveCache(cache_dir) if cache_dir else None
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.backoff = backoff
+        # An already built service (or a fake one in tests) is shared by all threads
+        self.service = service
+        self._credentials = None
+        self._local = threading.local()
 
     def authenticate(self) -> None:
         """Authenticate using a service account JSON credentials file."""
         scopes = ["https://www.googleapis.com/auth/drive.readonly"]
-        creds = service_account.Credentials.from_service_account_file(
+        self._credentials = service_account.Credentials.from_service_account_file(
             str(self.credentials_file), scopes=scopes
         )
-        self.service = build("drive", "v3", credentials=creds)
+        self.service = build("drive", "v3", credentials=self._credentials)
+        self._local.service = self.service
+
+    def _get_service(self):
+        """Return the Drive service of the current thread.
+
+        The http client of the Google API is not thread-safe, so every download
+        thread builds its own service from the same credentials.
+        """
+        if self._credentials is None:
+            return self.service
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = build("drive", "v3", credentials=self._credentials, cache_discovery=False)
+            self._local.service = service
+        return service
+
+    def _with_retries(self, action, description: str):
+        """Run action, retrying transient errors with exponential backoff."""
+        for attempt in range(self.retries + 1):
+            try:
+                return action()
+            except (HttpError,) + TRANSPORT_ERRORS as error:
+                if not is_retryable(error) or attempt == self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                self.logger.warning(f"{description} failed ({error}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def list_file_metadata(self, folder_id: str) -> Dict[str, dict]:
+        """Return the metadata of every file in a folder, following all result pages."""
+        query = f"'{folder_id}' in parents and trashed=false"
+        files = {}
+        page_token = None
+        while True:
+            request = self._get_service().files().list(
+                q=query,
+                fields=f"nextPageToken,files({FILE_FIELDS})",
+                pageSize=1000,
+                pageToken=page_token,
+            )
+            results = self._with_retries(request.execute, "Listing Drive folder")
+            for f in results.get("files", []):
+                files[f["name"]] = f
+            page_token = results.get("nextPageToken")
+            if not page_token:
+                return files
 
     def list_files(self, folder_id: str) -> Dict[str, str]:
         """Return a mapping of file names to their ids within a folder."""
-        query = f"'{folder_id}' in parents and trashed=false"
-        results = (
-            self.service.files()
-            .list(q=query, fields="files(id,name)")
-            .execute()
-        )
-        return {f["name"]: f["id"] for f in results.get("files", [])}
+        return {name: f["id"] for name, f in self.list_file_metadata(folder_id).items()}
+
+    def download_file(self, file_id: str, destination: Path, md5_checksum: Optional[str] = None) -> None:
+        """Download a file identified by file_id to destination, in chunks.
 
-    def download_file(self, file_id: str, destination: Path) -> None:
-        """Download a file identified by file_id to destination."""
-        request = self.service.files().get_media(fileId=file_id)
+        A failed chunk is retried from where it stopped, the only level where
+        downloads are retried. The file only appears
+        at destination once it is complete and, when md5_checksum is given,
+        once its content has been verified.
+        """
+        destination = Path(destination)
         destination.parent.mkdir(parents=True, exist_ok=True)
-        with io.FileIO(destination, "wb") as fh:
-            downloader = MediaIoBaseDownload(fh, request)
+        tmp_path = destination.with_name(destination.name + ".part")
+        request = self._get_service().files().get_media(fileId=file_id)
+        with io.FileIO(tmp_path, "wb") as fh:
+            downloader = MediaIoBaseDownload(fh, request, chunksize=self.chunk_size)
             done = False
             while not done:
-                _, done = downloader.next_chunk()
+                _, done = self._with_retries(downloader.next_chunk, f"Downloading {destination.name}")
+
+        if md5_checksum and file_md5(tmp_path) != md5_checksum:
+            tmp_path.unlink()
+            raise IOError(f"Checksum mismatch for {destination.name}")
+        tmp_path.replace(destination)
         self.logger.info(f"Downloaded {destination.name} to {destination}")
 
-    def download_files(self, required_files: List[str], destination: Path) -> None:
+    def fetch_file(self, metadata: dict, destination: Path) -> Path:
+        """Copy a file from the local cache, or download it when it changed."""
+        cached = self.cache.get(metadata) if self.cache else None
+        if cached:
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(cached, destination)
+            self.logger.info(f"Unchanged {destination.name}, copied from cache")
+            return destination
+
+        self.download_file(metadata["id"], destination, metadata.get("md5Checksum"))
+        if self.cache:
+            self.cache.put(metadata, destination)
+        return destination
+
+    def download_files(self, required_files: List[str], destination: Path) -> Dict[str, Path]:
+        """Download the required files concurrently and return their local paths."""
         destination = Path(destination)
         destination.mkdir(parents=True, exist_ok=True)
         if not self.service:
             self.authenticate()
-        files = self.list_files(self.folder_id)
+        files = self.list_file_metadata(self.folder_id)
+
+        to_fetch = []
         for file_name in required_files:
-            file_id = files.get(file_name)
-            dest = destination / file_name
-            if file_id:
-                self.download_file(file_id, dest)
+            if file_name in files:
+                to_fetch.append(file_name)
             else:
                 self.logger.error(f"Missing file in source drive: {file_name}")
 
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            futures = {
+                file_name: executor.submit(self.fetch_file, files[file_name], destination / file_name)
+                for file_name in to_fetch
+            }
+        return {file_name: future.result() for file_name, future in futures.items()}
+
+
+def is_retryable(error: Exception) -> bool:
+    """Transport errors, server errors and rate limits are worth retrying.
+
+    Other local errors (permissions, a full disk, a checksum mismatch) fail
+    the same way on every attempt.
+    """
+    if not isinstance(error, HttpError):
+        return isinstance(error, TRANSPORT_ERRORS)
+    if error.resp.status == 403:
+        # Drive reports rate limits as 403 rateLimitExceeded / userRateLimitExceeded
+        return b"ateLimitExceeded" in (error.content or b"")
+    return error.resp.status in RETRYABLE_STATUSES
@@ -0,0 +1,174 @@
+"""Chunked aggregation of the chat, meeting and VPN event logs.
+
+The logs are read a chunk at a time and every chunk is folded into a dense
+(email, day) array, so the memory used depends on the number of people and
+days of the month, not on the number of events in the export.
+"""
+
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from workbook_reader import WorkbookReader
+
+# Rows of an event log read at a time
+EVENT_CHUNK_SIZE = 200_000
+
+# Outgoing traffic units of the VPN log, in MB. Unknown units count as no traffic
+TRAFFIC_UNITS_MB = {'GB': 1024.0, 'MB': 1.0, 'KB': 1 / 1024}
+
+DOMAIN = '@ingetec.com.co'
+
+
+def day_codes(dates: pd.Series, days: List[str], date_format: Optional[str] = None) -> np.ndarray:
+    """Position in days of the day each date starts with, -1 when it is not one of them.
+
+    Only the first characters of each value are compared, so ISO timestamps
+    ('2025-03-04T10:11:00.000Z') are matched against days ('2025-03-04')
+    without being parsed. With date_format, the values that do not match
+    (such as days without zero padding) are parsed with it as a fallback.
+    """
+    width = len(days[0]) if days else 0
+    keys = pd.Index([day.encode('ascii') for day in days])
+    values = dates.fillna('').to_numpy(dtype=object)
+    codes = keys.get_indexer(np.asarray(values, dtype=f'S{width}'))
+
+    missing = (codes < 0) & (values != '')
+    if date_format and missing.any():
+        parsed = pd.to_datetime(pd.Series(values[missing]), format=date_format, errors='coerce')
+        codes[missing] = pd.Index(days).get_indexer(parsed.dt.strftime(date_format))
+    return codes
+
+
+class DayCounter:
+    """Per (email, day) totals, grown as new emails appear in the chunks."""
+
+    def __init__(self, days: List[str], dtype=np.int64) -> None:
+        self.days = list(days)
+        self.emails = pd.Index([], dtype=object)
+        self.totals = np.zeros((0, len(self.days)), dtype=dtype)
+
+    def add(self, emails: pd.Series, codes: np.ndarray, values: Optional[np.ndarray] = None) -> None:
+        """Add one event per row (or its value) to the email and day code of the row.
+
+        Rows whose day code is -1 are ignored.
+        """
+        keep = codes >= 0
+        if not keep.all():
+            emails, codes = emails[keep], codes[keep]
+            values = values[keep] if values is not None else None
+        if len(codes) == 0:
+            return
+
+        inverse, uniques = pd.factorize(emails)
+        positions = self.emails.get_indexer(uniques)
+        new = positions < 0
+        if new.any():
+            positions[new] = np.arange(len(self.emails), len(self.emails) + new.sum())
+            self.emails = self.emails.append(pd.Index(uniques[new], dtype=object))
+            self.totals = np.vstack([self.totals, np.zeros((new.sum(), len(self.days)), dtype=self.totals.dtype)])
+
+        cells = positions[inverse] * len(self.days) + codes
+        counts = np.bincount(cells, weights=values, minlength=self.totals.size)
+        self.totals += counts.reshape(self.totals.shape).astype(self.totals.dtype)
+
+    def to_frame(self, active_days_only: bool = False, values: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """Wide table with Email and one column per day, sorted by email.
+
+        active_days_only drops the days without any event, as a pivot table of
+        the events would. values, shaped as the totals, replaces them in the
+        table, such as flags derived from them in a smaller dtype.
+        """
+        values = self.totals if values is None else values
+        order = np.argsort(self.emails.to_numpy(dtype=str), kind='stable')
+        columns = [index for index in range(len(self.days))
+                   if not active_days_only or self.totals[:, index].any()]
+        df = pd.DataFrame(values[order][:, columns], columns=[self.days[index] for index in columns])
+        df.insert(0, 'Email', self.emails[order].to_numpy())
+        return df
+
+
+def _csv_chunks(path: str, usecols: list, chunk_size: int, **kwargs) -> Iterator[pd.DataFrame]:
+    with pd.read_csv(path, usecols=usecols, dtype=str, chunksize=chunk_size, **kwargs) as reader:
+        yield from reader
+
+
+def aggregate_chats(chunks: Iterable[pd.DataFrame], days: List[str]) -> pd.DataFrame:
+    """Whether each actor sent chat messages each day (1) or not (0), as uint8."""
+    counter = DayCounter(days, dtype=np.uint32)
+    for chunk in chunks:
+        counter.add(chunk['Actor'], day_codes(chunk['Fecha'], days))
+    return counter.to_frame(active_days_only=True, values=(counter.totals > 0).astype(np.uint8))
+
+
+def aggregate_meetings(chunks: Iterable[pd.DataFrame], days: List[str]) -> pd.DataFrame:
+    """Distinct meetings of each company actor per day, as uint16.
+
+    A meeting repeated for the same actor and day is counted once, also when
+    its rows fall in different chunks: the hash of every (actor, meeting,
+    day) already counted is kept, 8 bytes per participation.
+    """
+    counter = DayCounter(days, dtype=np.uint16)
+    seen = np.array([], dtype=np.uint64)
+    for chunk in chunks:
+        chunk = chunk[chunk['Actor'].str.contains('@ingetec', na=False)]
+        codes = day_codes(chunk['Fecha'], days)
+        chunk, codes = chunk[codes >= 0], codes[codes >= 0]
+
+        keys = pd.util.hash_pandas_object(
+            pd.DataFrame({'Actor': chunk['Actor'].to_numpy(), 'Reunion': chunk['Código de reunión'].to_numpy(),
+                          'Dia': codes}), index=False).to_numpy()
+        first = ~pd.Index(keys).duplicated() & ~np.isin(keys, seen)
+        seen = np.union1d(seen, keys[first])
+        counter.add(chunk['Actor'][first], codes[first])
+    return counter.to_frame(active_days_only=True)
+
+
+def traffic_mb(traffic: pd.Series) -> np.ndarray:
+    """Outgoing traffic strings such as '3.2 GB' converted to MB."""
+    raw = np.asarray(traffic.fillna('').to_numpy(dtype=object), dtype='S')
+    factors = np.zeros(len(raw))
+    for unit, factor in TRAFFIC_UNITS_MB.items():
+        factors[np.char.endswith(raw, f' {unit}'.encode())] = factor
+    numbers = np.where(factors > 0, np.char.rstrip(raw, b' GMKB'), b'0')
+    try:
+        values = numbers.astype(np.float64)
+    except ValueError:
+        values = pd.to_numeric(pd.Series(numbers.astype(str)), errors='coerce').fillna(0).to_numpy()
+    return values * factors
+
+
+def aggregate_vpn(chunks: Iterable[pd.DataFrame], days: List[str], threshold_mb: float = 5) -> pd.DataFrame:
+    """Outgoing VPN traffic of each user per day ('YYYY-MM-DD'), from a log dated 'dd/mm/YYYY'.
+
+    Days above threshold_mb become 1, the rest keep their traffic in MB, as float32.
+    """
+    log_days = [f"{day[8:10]}/{day[5:7]}/{day[0:4]}" for day in days]
+    counter = DayCounter(days, dtype=np.float64)
+    for chunk in chunks:
+        chunk = chunk.dropna(subset=['Usuario'])
+        # Build the emails once per distinct user rather than once per session
+        inverse, users = pd.factorize(chunk['Usuario'])
+        emails = pd.Series((pd.Index(users).str.lower() + DOMAIN)[inverse])
+        counter.add(emails, day_codes(chunk['Fecha'], log_days, '%d/%m/%Y'), traffic_mb(chunk['Trafico_Salida']))
+    traffic = np.where(counter.totals <= threshold_mb, counter.totals, 1).astype(np.float32)
+    return counter.to_frame(values=traffic)
+
+
+def read_chats(path: str, chunk_size: int = EVENT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    return _csv_chunks(path, ['Fecha', 'Actor'], chunk_size)
+
+
+def read_vpn(path: str, chunk_size: int = EVENT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    # The columns are identified by position, their names change between exports
+    for chunk in _csv_chunks(path, [0, 2, 3], chunk_size, encoding='utf-8'):
+        chunk.columns = ['Usuario', 'Trafico_Salida', 'Fecha']
+        yield chunk
+
+
+def read_meetings(path: str, chunk_size: int = EVENT_CHUNK_SIZE, engine: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """Meeting rows of the first sheet, a chunk at a time."""
+    with WorkbookReader(path, engine) as reader:
+        yield from reader.iter_chunks(reader.sheet_names[0], chunk_size,
+                                      columns=['Fecha', 'Actor', 'Código de reunión'])
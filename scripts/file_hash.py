@@ -0,0 +1,28 @@
+"""Content fingerprints of input files and parameters."""
+
+import hashlib
+import json
+from pathlib import Path
+
+import pandas as pd
+
+
+def file_md5(path: Path) -> str:
+    """MD5 of a file's content, read in blocks."""
+    md5 = hashlib.md5()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def json_md5(value) -> str:
+    """MD5 of a JSON serializable value, independent of the key order."""
+    return hashlib.md5(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def frame_md5(df: pd.DataFrame) -> str:
+    """MD5 of the column names and values of a DataFrame, in row order."""
+    md5 = hashlib.md5(json.dumps([str(column) for column in df.columns]).encode("utf-8"))
+    md5.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return md5.hexdigest()
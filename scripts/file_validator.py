@@ -1,11 +1,169 @@
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional
+from xml.etree.ElementTree import iterparse
+import json
 import logging
+import re
+import zipfile
 import pandas as pd
+from stage_cache import StageCache
+
+# Headers probed in earlier runs, by file hash, kept in the stage cache folder
+PROBE_FILE = 'file_probes.json'
+MAX_PROBES = 256
+
+
+def _local(tag: str) -> str:
+    # Tag without its namespace, the same in transitional and strict workbooks
+    return tag.rsplit('}', 1)[-1]
+
+
+def _attribute(element, name: str) -> Optional[str]:
+    for key, value in element.attrib.items():
+        if _local(key) == name:
+            return value
+    return None
+
+
+def _column_index(reference: str) -> int:
+    index = 0
+    for letter in re.match(r'[A-Z]+', reference).group():
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+
+def _first_row(archive: zipfile.ZipFile, member: str) -> Dict[int, tuple]:
+    """Cells of the first row of a sheet as {column: ('s', shared string index) or ('v', text)}."""
+    cells, position, kind, value = {}, -1, None, None
+    with archive.open(member) as stream:
+        for event, element in iterparse(stream, events=('start', 'end')):
+            tag = _local(element.tag)
+            if event == 'start':
+                if tag == 'c':
+                    reference = element.get('r')
+                    position = _column_index(reference) if reference else position + 1
+                    kind, value = element.get('t'), None
+                continue
+            if tag in ('v', 't') and value is None:
+                value = element.text or ''
+            elif tag == 'c':
+                if value is not None:
+                    cells[position] = ('s', int(value)) if kind == 's' else ('v', value)
+            elif tag == 'row':
+                break
+            elif tag == 'sheetData':
+                break
+    return cells
+
+
+def _shared_strings(archive: zipfile.ZipFile, last: int) -> List[str]:
+    """The shared strings up to position last, without reading the rest of the table."""
+    strings = []
+    if last < 0 or 'xl/sharedStrings.xml' not in archive.namelist():
+        return strings
+    with archive.open('xl/sharedStrings.xml') as stream:
+        texts, phonetic = [], False
+        for event, element in iterparse(stream, events=('start', 'end')):
+            tag = _local(element.tag)
+            if tag == 'rPh':
+                # Phonetic hints are not part of the text
+                phonetic = event == 'start'
+            elif event == 'start':
+                continue
+            elif tag == 't':
+                if not phonetic:
+                    texts.append(element.text or '')
+            elif tag == 'si':
+                strings.append(''.join(texts))
+                texts = []
+                element.clear()
+                if len(strings) > last:
+                    break
+    return strings
+
+
+def _xlsx_headers(file_path: Path) -> Dict[str, list]:
+    with zipfile.ZipFile(file_path) as archive:
+        targets = {}
+        with archive.open('xl/_rels/workbook.xml.rels') as stream:
+            for _, element in iterparse(stream):
+                if _local(element.tag) == 'Relationship':
+                    target = element.get('Target')
+                    targets[element.get('Id')] = (target.lstrip('/') if target.startswith('/')
+                                                  else str(PurePosixPath('xl') / target))
+        sheets = []
+        with archive.open('xl/workbook.xml') as stream:
+            for _, element in iterparse(stream):
+                if _local(element.tag) == 'sheet':
+                    sheets.append((element.get('name'), targets[_attribute(element, 'id')]))
+
+        rows = {name: _first_row(archive, member) for name, member in sheets}
+        last = max((value for row in rows.values() for kind, value in row.values() if kind == 's'), default=-1)
+        strings = _shared_strings(archive, last)
+
+    headers = {}
+    for name, row in rows.items():
+        header = [''] * (max(row) + 1 if row else 0)
+        for position, (kind, value) in row.items():
+            header[position] = strings[value] if kind == 's' else value
+        headers[name] = header
+    return headers
+
+
+def probe_headers(file_path: Path, file_format: str) -> Dict[str, list]:
+    """Header row of every sheet of a workbook, or of a CSV (under the sheet name '').
+
+    Only the first row of each sheet and the shared strings it uses are read
+    from the xlsx archive, so the cost does not grow with the number of rows.
+    """
+    if file_format == 'csv':
+        return {'': [str(column) for column in pd.read_csv(file_path, nrows=0).columns]}
+    return _xlsx_headers(file_path)
+
+
+def header_problems(headers: Dict[str, list], file_info: dict) -> List[str]:
+    """What the headers of a file lack, given its entry of REQUIRED_FILES.
+
+    columns and min_columns apply to the CSV or the first sheet. sheets maps
+    sheet names ('*' for every sheet) to their own columns and min_columns:
+
+        "sheets": {"Uso": {"columns": ["email", "day_used"]}, "*": {"min_columns": 2}}
+    """
+    requirements = dict(file_info.get("sheets", {}))
+    if file_info.get("columns") or file_info.get("min_columns") or not requirements:
+        requirements[None] = {"columns": file_info.get("columns", []), "min_columns": file_info.get("min_columns", 0)}
+
+    problems = []
+    for sheet, requirement in requirements.items():
+        if sheet is None:
+            sheet_names = list(headers)[:1]
+        elif sheet == '*':
+            sheet_names = list(headers)
+        elif sheet in headers:
+            sheet_names = [sheet]
+        else:
+            problems.append(f"missing sheet {sheet}")
+            continue
+
+        for sheet_name in sheet_names:
+            header = headers[sheet_name]
+            where = f"sheet {sheet_name}: " if sheet_name else ""
+            missing = {column.lower() for column in requirement.get("columns", [])} - {column.lower() for column in header}
+            if missing:
+                problems.append(f"{where}missing columns {', '.join(sorted(missing))}")
+            if len(header) < requirement.get("min_columns", 0):
+                problems.append(f"{where}{len(header)} columns, expected at least {requirement['min_columns']}")
+    return problems
+
 
 class FileValidator:
-    def __init__(self, files: list, logger: logging.Logger):
+    def __init__(self, files: list, logger: logging.Logger, cache: Optional[StageCache] = None):
         self.files = files
         self.logger = logger
+        # Optional StageCache: probes are reused while the content of a file does not change
+        self.cache = cache or StageCache(None)
+        self._probes = None
 
     def check_presence(self, folder: Path) -> dict:
         folder = Path(folder)
@@ -48,39 +206,87 @@ class FileValidator:
 
         return format_checks
 
+    def _probe_path(self) -> Optional[Path]:
+        return self.cache.directory / PROBE_FILE if self.cache.enabled else None
+
+    def _load_probes(self) -> dict:
+        if self._probes is None:
+            self._probes = {}
+            probe_path = self._probe_path()
+            if probe_path and probe_path.exists():
+                try:
+                    with open(probe_path, "r", encoding="utf-8") as f:
+                        self._probes = json.load(f)
+                except ValueError:
+                    self.logger.warning(f"Ignoring unreadable {probe_path}")
+        return self._probes
+
+    def _save_probes(self) -> None:
+        probe_path = self._probe_path()
+        if not probe_path:
+            return
+        probe_path.parent.mkdir(parents=True, exist_ok=True)
+        # The most recent probes are last, the oldest ones are dropped first
+        probes = dict(list(self._probes.items())[-MAX_PROBES:])
+        with open(probe_path, "w", encoding="utf-8") as f:
+            json.dump(probes, f)
+
+    def _probe(self, file_path: Path, file_format: str) -> tuple:
+        # (probe key, headers) without touching the loaded probes, so it can run in a thread
+        if not self.cache.enabled:
+            return None, probe_headers(file_path, file_format)
+        key = f"{file_format}:{self.cache.file_hash(file_path)}"
+        headers = self._load_probes().get(key)
+        return key, headers if headers is not None else probe_headers(file_path, file_format)
+
+    def _remember(self, key: Optional[str], headers: Dict[str, list]) -> None:
+        if key is not None:
+            # Move it to the end, it was just used
+            self._probes.pop(key, None)
+            self._probes[key] = headers
+
+    def probe(self, file_path: Path, file_format: str) -> Dict[str, list]:
+        """probe_headers of a file, reused from earlier runs when the stage cache is enabled."""
+        key, headers = self._probe(file_path, file_format)
+        self._remember(key, headers)
+        return headers
+
     def check_columns(self, folder: Path) -> dict:
         folder = Path(folder)
         column_checks = {}
+        present = [file_info for file_info in self.files if (folder / file_info["name"]).exists()]
+        if self.cache.enabled:
+            self._load_probes()
+
+        # Every file is probed at the same time, the probes mostly wait on zip and disk reads
+        with ThreadPoolExecutor(max_workers=max(1, len(present))) as executor:
+            futures = {file_info["name"]: executor.submit(self._probe, folder / file_info["name"], file_info["format"])
+                       for file_info in present}
 
         for file_info in self.files:
             file_name = file_info["name"]
-            file_path = folder / file_name
-            required_columns = set(column.lower() for column in file_info["columns"])
-
-            if not file_path.exists():
+            if file_name not in futures:
                 column_checks[file_name] = False
                 continue
 
             try:
-                if file_info["format"] == 'csv':
-                    df = pd.read_csv(file_path, nrows=1)
-                else:
-                    df = pd.read_excel(file_path, nrows=1)
-
-                actual_columns = set(column.lower() for column in df.columns)
-                missing_columns = required_columns - actual_columns
-
-                if missing_columns:
-                    self.logger.error(f"Missing columns in {file_name}: {', '.join(missing_columns)}")
-                    column_checks[file_name] = False
-                else:
-                    self.logger.info(f"Validated columns in {file_name}")
-                    column_checks[file_name] = True
-
+                key, headers = futures[file_name].result()
+                self._remember(key, headers)
+                problems = header_problems(headers, file_info)
             except Exception as e:
                 self.logger.error(f"Error reading {file_name}: {str(e)}")
                 column_checks[file_name] = False
+                continue
+
+            if problems:
+                self.logger.error(f"Invalid headers in {file_name}: {'; '.join(problems)}")
+                column_checks[file_name] = False
+            else:
+                self.logger.info(f"Validated columns in {file_name}")
+                column_checks[file_name] = True
 
+        if self._probes is not None:
+            self._save_probes()
         return column_checks
 
     def validate_files(self, folder: Path, validate_columns: bool = True) -> dict:
@@ -102,4 +308,4 @@ class FileValidator:
         else:
             self.logger.error("Validation failed for one or more files")
 
-        return all_passed
\ No newline at end of file
+        return all_passed
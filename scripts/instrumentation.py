@@ -0,0 +1,149 @@
+"""Structured measurements of the pipeline stages, written as a JSON run summary."""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+import logging
+
+
+def max_rss_mb() -> float:
+    """Peak resident memory of the process so far."""
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 ** 2 if sys.platform == 'darwin' else rss / 1024
+
+
+def _cpu_time() -> float:
+    # Includes the worker processes that already finished, so parallel stages are not undercounted
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class Stage:
+    """Measurement of one stage. The code inside the stage may set rows_in and rows_out."""
+
+    def __init__(self, name: str, parent: Optional[str], rows_in: Optional[int] = None) -> None:
+        self.name = name
+        self.parent = parent
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.status = 'ok'
+        self.wall_s = None
+        self.cpu_s = None
+        self.max_rss_mb = None
+        self.peak_alloc_mb = None
+        self._peak = 0
+
+    def to_dict(self) -> dict:
+        return {key: value for key, value in vars(self).items() if not key.startswith('_')}
+
+
+class Instrumentation:
+    """Records wall time, CPU time, memory and row counts of nested pipeline stages.
+
+    With trace_memory, tracemalloc also gives the peak of Python and numpy
+    allocations inside each stage, at the cost of slower stages. A disabled
+    instrumentation still hands out Stage objects but measures nothing, so
+    the classes that take one do not need to check for it.
+    """
+
+    def __init__(self, logger: logging.Logger = None, trace_memory: bool = False, enabled: bool = True) -> None:
+        self.logger = logger
+        self.trace_memory = trace_memory and enabled
+        self.enabled = enabled
+        self.stages: List[Stage] = []
+        self.profile: List[dict] = []
+        self._open: List[Stage] = []
+        self.started = datetime.now()
+
+    @contextmanager
+    def stage(self, name: str, rows_in: Optional[int] = None):
+        parent = self._open[-1] if self._open else None
+        stage = Stage(name, parent.name if parent else None, rows_in)
+        if not self.enabled:
+            yield stage
+            return
+
+        self.stages.append(stage)
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            # Keep the parent peak reached so far before restarting the count for this stage
+            if parent:
+                parent._peak = max(parent._peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self._open.append(stage)
+        wall, cpu = time.perf_counter(), _cpu_time()
+        try:
+            yield stage
+        except BaseException:
+            stage.status = 'error'
+            raise
+        finally:
+            stage.wall_s = round(time.perf_counter() - wall, 4)
+            stage.cpu_s = round(_cpu_time() - cpu, 4)
+            stage.max_rss_mb = round(max_rss_mb(), 1)
+            if self.trace_memory:
+                stage.peak_alloc_mb = round(max(stage._peak, tracemalloc.get_traced_memory()[1]) / 1024 ** 2, 1)
+            self._open.pop()
+            if self.trace_memory and not self._open:
+                tracemalloc.stop()
+            if self.logger:
+                rows = f", {stage.rows_out} rows" if stage.rows_out is not None else ""
+                self.logger.info(f"Stage {name} took {stage.wall_s:.2f} s (CPU {stage.cpu_s:.2f} s){rows}")
+
+    @contextmanager
+    def profiler(self, top: int = 30, output: Optional[Path] = None):
+        """Run the block under cProfile and keep its hottest functions by cumulative time."""
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            if output:
+                profile.dump_stats(str(output))
+            stats = pstats.Stats(profile, stream=io.StringIO())
+            for function in stats.sort_stats('cumulative').fcn_list[:top]:
+                calls, _, total, cumulative, _ = stats.stats[function]
+                self.profile.append({
+                    'function': f"{function[0]}:{function[1]}({function[2]})",
+                    'calls': calls,
+                    'total_s': round(total, 4),
+                    'cumulative_s': round(cumulative, 4),
+                })
+
+    def summary(self) -> dict:
+        return {
+            'started': self.started.isoformat(timespec='seconds'),
+            'finished': datetime.now().isoformat(timespec='seconds'),
+            'total_wall_s': round(sum(stage.wall_s or 0 for stage in self.stages if stage.parent is None), 4),
+            'max_rss_mb': round(max_rss_mb(), 1),
+            'stages': [stage.to_dict() for stage in self.stages],
+            'profile': self.profile,
+        }
+
+    def write_summary(self, path: Path, **extra) -> Path:
+        """Write the summary as JSON, with any extra top-level fields."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({**self.summary(), **extra}, f, indent=4)
+        if self.logger:
+            self.logger.info(f"Run summary written to {path}")
+        return path
+
+
+def frame_rows(frames: dict) -> int:
+    """Total rows of a dict of DataFrames, such as the cleaned or scored day sheets."""
+    return sum(len(df) for df in frames.values())
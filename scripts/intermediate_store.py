@@ -0,0 +1,96 @@
+"""Optional on-disk dump of the intermediate frames of the pipeline."""
+
+from pathlib import Path
+from typing import Dict, List, Optional
+import json
+import logging
+
+import pandas as pd
+
+FORMATS = ('parquet', 'feather')
+# Names of the sheets of a stage in the order they were dumped
+SHEETS_FILE = 'sheets.json'
+
+
+def _date_order(sheet_name: str) -> tuple:
+    # Day sheets by their date whatever their zero padding, any other name after them
+    from data_processor import sheet_date  # data_processor imports this module through stage_cache
+    try:
+        return (0, sheet_date(sheet_name))
+    except (ValueError, IndexError):
+        return (1, sheet_name)
+
+
+class IntermediateStore:
+    """Writes and reads the per-sheet frames of a pipeline stage.
+
+    Each stage is a folder inside directory with one file per sheet, written in
+    a columnar format (Parquet or Feather, both through pyarrow), and a
+    SHEETS_FILE that keeps the order of the sheets.
+    """
+
+    def __init__(self, directory: Path, file_format: str = 'parquet', logger: logging.Logger = None) -> None:
+        if file_format not in FORMATS:
+            raise ValueError(f"Unsupported intermediate format: {file_format}")
+        self.directory = Path(directory)
+        self.file_format = file_format
+        self.logger = logger
+
+    def dump(self, stage: str, frames: Dict[str, pd.DataFrame], replace: bool = True) -> Path:
+        """Write every frame of a stage and return the stage folder.
+
+        With replace=False the frames are added to the ones already stored,
+        overwriting only the sheets with the same name.
+        """
+        stage_dir = self.directory / stage
+        stage_dir.mkdir(parents=True, exist_ok=True)
+        names = [] if replace else self._sheet_names(stage_dir)
+        if replace:
+            for old_file in stage_dir.glob(f"*.{self.file_format}"):
+                old_file.unlink()
+
+        for sheet_name, df in frames.items():
+            file_path = stage_dir / f"{sheet_name}.{self.file_format}"
+            df = df.reset_index(drop=True)
+            if self.file_format == 'parquet':
+                df.to_parquet(file_path, index=False)
+            else:
+                df.to_feather(file_path)
+        names += [sheet_name for sheet_name in frames if sheet_name not in names]
+        with open(stage_dir / SHEETS_FILE, "w", encoding="utf-8") as f:
+            json.dump(names, f)
+
+        if self.logger:
+            self.logger.info(f"Intermediate {stage} written to {stage_dir}")
+        return stage_dir
+
+    def _sheet_names(self, stage_dir: Path) -> List[str]:
+        """Sheets stored in stage_dir, in the order they were dumped.
+
+        Stages dumped without SHEETS_FILE, or sheets missing from it, follow
+        in date order.
+        """
+        stored = {file_path.stem for file_path in stage_dir.glob(f"*.{self.file_format}")}
+        names = []
+        if (stage_dir / SHEETS_FILE).exists():
+            with open(stage_dir / SHEETS_FILE, "r", encoding="utf-8") as f:
+                names = [sheet_name for sheet_name in json.load(f) if sheet_name in stored]
+        return names + sorted(stored - set(names), key=_date_order)
+
+    def load(self, stage: str, sheet_names: Optional[List[str]] = None) -> Dict[str, pd.DataFrame]:
+        """Read back the frames of a stage (or only sheet_names), in the order they were dumped."""
+        stage_dir = self.directory / stage
+        if not stage_dir.is_dir():
+            raise FileNotFoundError(f"No intermediate data for {stage} in {self.directory}")
+
+        if sheet_names is None:
+            sheet_names = self._sheet_names(stage_dir)
+        file_paths = [stage_dir / f"{sheet_name}.{self.file_format}" for sheet_name in sheet_names]
+
+        frames = {}
+        for file_path in file_paths:
+            if self.file_format == 'parquet':
+                frames[file_path.stem] = pd.read_parquet(file_path)
+            else:
+                frames[file_path.stem] = pd.read_feather(file_path)
+        return frames
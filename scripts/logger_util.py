@@ -2,9 +2,9 @@ import logging
 import os
 from pathlib import Path
 
-def setup_logger(log_path: str) -> logging.Logger:
-    """Configure and return a logger that writes to log_path."""
-    logger = logging.getLogger("productivity")
+def setup_logger(log_path: str, name: str = "productivity") -> logging.Logger:
+    """Configure and return the logger name, writing to log_path."""
+    logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
 
     # Create log directory if not exists
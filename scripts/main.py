@@ -1,63 +1,167 @@
+import argparse
 import json
 import os
 import tempfile
 from pathlib import Path
+import pandas as pd
 from productivity_data_cleaner import GoogleProductivityDataCleaner
 from data_processor import DataProcessor
-from report_generator import ReportGenerator
+from report_generator import ReportGenerator, ENGINES as REPORT_ENGINES, TWIN_FORMATS
 from logger_util import setup_logger, close_logger
 from drive_connector import DriveConnector
 from file_validator import FileValidator
+from intermediate_store import IntermediateStore, FORMATS
+from workbook_reader import ENGINES
+from checkpoint import Checkpoint, update_productivity
+from db_loader import DatabaseLoader
+from instrumentation import Instrumentation, frame_rows
+from stage_cache import StageCache
+
+LOG_PATH = '.log'
+# Machine-readable summary of the run, written next to the log
+SUMMARY_FILE = 'run_summary.json'
 
 def load_parameters() -> dict:
     params_path = Path(__file__).parent / "initial_parameters.json"
     with open(params_path, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def main() -> None:
+def build_parser(description: str = "Calculate the monthly productivity report") -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--dump-dir", type=Path, default=None,
+                        help="Folder where the intermediate frames are written for debugging")
+    parser.add_argument("--dump-format", choices=FORMATS, default="parquet",
+                        help="Columnar format of the intermediate frames")
+    parser.add_argument("--excel-engine", choices=ENGINES, default=None,
+                        help="Engine used to read the productivity workbook (calamine when installed)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes that read and clean the day sheets (overrides WORKERS)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only read and score the days that are new or changed since the last run")
+    parser.add_argument("--checkpoint-dir", type=Path, default=Path("checkpoints"),
+                        help="Folder where incremental runs keep their checkpoint")
+    parser.add_argument("--report-engine", choices=REPORT_ENGINES, default="xlsxwriter",
+                        help="Engine used to write the report (xlsxwriter streams it in constant memory)")
+    parser.add_argument("--report-formats", nargs="*", choices=TWIN_FORMATS, default=[],
+                        help="Also write the results table in these formats next to the report")
+    parser.add_argument("--load-db", action="store_true",
+                        help="Upsert the results into the API database (DATABASE_URL)")
+    parser.add_argument("--signals-dir", type=Path, default=Path(os.getenv("SIGNALS_DIR", "signals")),
+                        help="Folder where the signal matrix of the month is kept for what-if analyses")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Parse every input again instead of reusing the stage cache")
+    parser.add_argument("--cache-dir", type=Path, default=Path(".stage_cache"),
+                        help="Folder where the parsed inputs of each stage are cached")
+    parser.add_argument("--cache-max-mb", type=int, default=2048,
+                        help="Size of the stage cache before the least recently used entries are removed")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Record the peak Python allocations of each stage with tracemalloc (slower)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Run under cProfile and add the hottest functions to the run summary")
+    return parser
+
+def parse_args(argv=None) -> argparse.Namespace:
+    return build_parser().parse_args(argv)
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
     params = load_parameters()
+    logger = setup_logger(LOG_PATH)
+    store = IntermediateStore(args.dump_dir, args.dump_format, logger) if args.dump_dir else None
+    instrumentation = Instrumentation(logger, trace_memory=args.trace_memory)
+    summary_path = Path(LOG_PATH).parent / SUMMARY_FILE
 
-    emails_to_delete = params["EMAILS_TO_DELETE"]
+    try:
+        if args.profile:
+            with instrumentation.profiler(output=summary_path.with_suffix('.prof')):
+                return run(args, params, store, instrumentation, logger)
+        return run(args, params, store, instrumentation, logger)
+    finally:
+        instrumentation.write_summary(summary_path)
+        close_logger(logger)
+
+def run(args: argparse.Namespace, params: dict, store, instrumentation: Instrumentation, logger) -> None:
     year = params["YEAR"]
     month = params["MONTH"]
-    year_month = f"{year}-{str(month).zfill(2)}"
-    coefficients = params["COEFFICIENTS"]
     required_files = params["REQUIRED_FILES"]
     file_names = [required_files[key]["name"] for key in required_files]
-
-    credentials_file = Path(os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "credentials.json"))
-    folder_id = os.getenv("DRIVE_FOLDER_ID", "")
-    logger = setup_logger('.log')
+    cache = StageCache(None if args.no_cache else args.cache_dir, args.cache_max_mb * 1024 ** 2, logger=logger)
 
     with tempfile.TemporaryDirectory() as tmpdirname:
         tmp_path = Path(tmpdirname)
         logger.info("Starting productivity script")
 
-        connector = DriveConnector(logger, credentials_file, folder_id)
-        connector.download_files(file_names, tmp_path)
+        with instrumentation.stage('download', rows_in=len(file_names)) as stage:
+            stage.rows_out = len(download_inputs(file_names, tmp_path, logger))
 
-        validator = FileValidator(list(required_files.values()), logger)
-        if not validator.validate_files(tmp_path, validate_columns=False):
+        with instrumentation.stage('validation', rows_in=len(required_files)):
+            validator = FileValidator(list(required_files.values()), logger, cache)
+            valid = validator.validate_files(tmp_path, validate_columns=False)
+        if not valid:
             logger.error("Validation failed. Exiting.")
-            close_logger(logger)
             return False
-        
-        # Use tmp_path with trailing separator for existing classes
-        work_path = str(tmp_path) + os.sep
-        productivity_filename = required_files.get("productivity")['name']
-        cleaner = GoogleProductivityDataCleaner(work_path, productivity_filename, year, month, emails_to_delete, logger)
-        cleaned_data = cleaner.clean_data()
-        logger.info(f"Cleaned google productivity data saved to {cleaned_data}")
-
-        data_processor = DataProcessor(work_path, required_files, year, month, coefficients, logger)
-        data_processor.calculate_productivity()
-        results = data_processor.get_results()
-
-        report_generator = ReportGenerator(logger)
-        report_generator.save_report(results,'reporte_productividad_'+year_month+'.xlsx')
 
+        process_month(args, params, year, month, tmp_path, required_files["productivity"]["name"],
+                      store, instrumentation, logger, cache)
         logger.info("Processing completed")
-        close_logger(logger)
+
+def download_inputs(file_names: list, destination: Path, logger) -> dict:
+    credentials_file = Path(os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "credentials.json"))
+    folder_id = os.getenv("DRIVE_FOLDER_ID", "")
+    # Unchanged Drive files are reused from this folder between runs (empty to disable)
+    drive_cache_dir = os.getenv("DRIVE_CACHE_DIR", ".drive_cache")
+    connector = DriveConnector(logger, credentials_file, folder_id, cache_dir=drive_cache_dir or None)
+    return connector.download_files(file_names, destination)
+
+def process_month(args: argparse.Namespace, params: dict, year: int, month: int, input_dir: Path,
+                  productivity_filename: str, store, instrumentation: Instrumentation, logger,
+                  cache: StageCache) -> pd.DataFrame:
+    """Clean, score and report one month from the validated inputs in input_dir. Returns the results table."""
+    emails_to_delete = params["EMAILS_TO_DELETE"]
+    year_month = f"{year}-{str(month).zfill(2)}"
+    coefficients = params["COEFFICIENTS"]
+    workers = args.workers if args.workers is not None else params.get("WORKERS", 1)
+    required_files = params["REQUIRED_FILES"]
+
+    # Use input_dir with trailing separator for existing classes
+    work_path = str(input_dir) + os.sep
+    cleaner = GoogleProductivityDataCleaner(work_path, productivity_filename, year, month, emails_to_delete, logger, store, args.excel_engine, workers, cache)
+    with instrumentation.stage('load_employees') as stage:
+        data_processor = DataProcessor(work_path, required_files, year, month, coefficients, logger, store, instrumentation, params.get("PROFILES"), cache)
+        stage.rows_out = len(data_processor.df_employees)
+
+    if args.incremental:
+        checkpoint = Checkpoint(args.checkpoint_dir, year, month, logger)
+        context = {"COEFFICIENTS": coefficients, "PROFILES": params.get("PROFILES"), "EMAILS_TO_DELETE": emails_to_delete}
+        with instrumentation.stage('update_productivity') as stage:
+            productivity_by_day = update_productivity(checkpoint, cleaner, data_processor, context, logger)
+            stage.rows_out = frame_rows(productivity_by_day)
+    else:
+        with instrumentation.stage('clean_data') as stage:
+            cleaned_data = cleaner.clean_data()
+            stage.rows_out = frame_rows(cleaned_data)
+        with instrumentation.stage('calculate_productivity', rows_in=frame_rows(cleaned_data)) as stage:
+            productivity_by_day = data_processor.calculate_productivity(cleaned_data)
+            stage.rows_out = frame_rows(productivity_by_day)
+    if data_processor.signal_matrix is not None and len(data_processor.signal_matrix[3]) == len(productivity_by_day):
+        with instrumentation.stage('save_signals'):
+            data_processor.save_signals(args.signals_dir / f"signals_{year_month}.npz")
+    else:
+        logger.info("Only some days were scored, the signal matrix is not updated")
+    with instrumentation.stage('get_results', rows_in=frame_rows(productivity_by_day)) as stage:
+        results = data_processor.get_results(productivity_by_day)
+        stage.rows_out = len(results)
+
+    with instrumentation.stage('save_report', rows_in=len(results)):
+        report_generator = ReportGenerator(logger, engine=args.report_engine, twins=args.report_formats)
+        report_generator.save_report(results,'reporte_productividad_'+year_month+'.xlsx')
+
+    if args.load_db:
+        with instrumentation.stage('load_db', rows_in=len(results)) as stage:
+            # Signal breakdown of the days scored in this run, for the radar chart of the API
+            signals = data_processor.signal_masks() if data_processor.signal_matrix is not None else None
+            stage.rows_out = DatabaseLoader(logger).load(results, year, month, signals)
+    return results
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,37 @@
+"""Helpers to fan per-day work out to a pool of worker processes."""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Sequence
+
+
+def split_in_chunks(items: Sequence, chunks: int) -> List[list]:
+    """Split items into at most `chunks` contiguous, evenly sized lists."""
+    items = list(items)
+    chunks = max(1, min(chunks, len(items)))
+    size, extra = divmod(len(items), chunks)
+    result = []
+    start = 0
+    for index in range(chunks):
+        end = start + size + (1 if index < extra else 0)
+        result.append(items[start:end])
+        start = end
+    return result
+
+
+def map_chunks(func: Callable, items: Sequence, workers: int = 1, *args) -> list:
+    """Run func(chunk, *args) over contiguous chunks of items.
+
+    func returns a list of results for its chunk. The lists are concatenated
+    in the order of items, so the output does not depend on the number of
+    workers. With one worker everything runs in this process.
+    """
+    if workers <= 1 or len(items) <= 1:
+        return list(func(list(items), *args))
+
+    chunks = split_in_chunks(items, workers)
+    with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+        futures = [executor.submit(func, chunk, *args) for chunk in chunks]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+    return results
@@ -1,4 +1,8 @@
+from typing import Iterator
 import pandas as pd
+from workbook_reader import WorkbookReader, default_engine
+from stage_cache import StageCache
+from parallel import map_chunks
 
 columns_name = ['Email',
                 'Username',
@@ -11,47 +15,110 @@ columns_name = ['Email',
                 'Other added files',
                 ]
 
+# Columns of the Google productivity export used by the pipeline
+usecols = [0, 12, 15] + list(range(19, 25))
+
+
+def clean_sheet(df: pd.DataFrame, df_reference: pd.DataFrame) -> pd.DataFrame:
+    #Aggregates all data columns to the day of reference
+    df = pd.merge(df_reference, df, on='Email', how='left')
+    df.dropna(subset=["Username"], inplace=True)
+    return df
+
+
+def read_sheet_chunk(sheet_names: list[str], input_name: str, engine: str) -> list:
+    """Read a group of raw sheets in a worker process, opening the workbook once."""
+    with WorkbookReader(input_name, engine) as reader:
+        return [(sheet_name, reader.read_sheet(sheet_name, usecols, columns_name)) for sheet_name in sheet_names]
+
+
+def clean_sheet_chunk(sheet_names: list[str], input_name: str, engine: str, df_reference: pd.DataFrame) -> list:
+    """Clean a group of sheets in a worker process, opening the workbook once."""
+    with WorkbookReader(input_name, engine) as reader:
+        return [(sheet_name, clean_sheet(reader.read_sheet(sheet_name, usecols, columns_name), df_reference))
+                for sheet_name in sheet_names]
+
+
 class GoogleProductivityDataCleaner:
 
-    def __init__(self, path: str, file_name: str, year: int, month: int, emails_to_delete: list[str], logger=None):
+    def __init__(self, path: str, file_name: str, year: int, month: int, emails_to_delete: list[str], logger=None, store=None, engine=None, workers=1, cache: StageCache = None):
         self.input_name = path + file_name
         self.year = year
         self.month = month
-        self.clean_data_file = path + "data_cleaned.xlsx"
         self.emails_to_delete = emails_to_delete
         self.logger = logger
+        # Optional IntermediateStore to dump the cleaned sheets for debugging
+        self.store = store
+        # Excel engine used to read the workbook, calamine when installed
+        self.engine = engine
+        # Number of worker processes the day sheets are spread across
+        self.workers = workers
+        # Optional StageCache that reuses the cleaned sheets while the workbook does not change
+        self.cache = cache or StageCache(None)
         
-    def clean_data(self) -> str:
+    def iter_clean_sheets(self) -> Iterator[tuple[str, pd.DataFrame]]:
+        """Yield (sheet_name, cleaned DataFrame) for each day sheet, in sheet order.
+
+        The workbook is opened only once and each sheet is read with only the
+        columns used by the pipeline. With several workers the sheets are
+        cleaned in parallel, each worker opening the workbook once.
+        """
+        with WorkbookReader(self.input_name, self.engine) as reader:
+            sheet_names = reader.sheet_names
+            df_reference_last_day_of_month = self._read_reference(reader)
+
+            if self.workers <= 1:
+                # Loop through each sheet, reading only the columns we need
+                for sheet_name in sheet_names:
+                    if self.logger:
+                        self.logger.info(f"Cleaning sheet {sheet_name}")
+                    df = reader.read_sheet(sheet_name, usecols, columns_name)
+                    yield sheet_name, clean_sheet(df, df_reference_last_day_of_month)
+                return
+
+        if self.logger:
+            self.logger.info(f"Cleaning {len(sheet_names)} sheets with {self.workers} workers")
+        cleaned_sheets = map_chunks(clean_sheet_chunk, sheet_names, self.workers,
+                                    self.input_name, self.engine, df_reference_last_day_of_month)
+        for sheet_name, df in cleaned_sheets:
+            if self.logger:
+                self.logger.info(f"Cleaned sheet {sheet_name}")
+            yield sheet_name, df
 
-        excel_file = pd.ExcelFile(self.input_name)
-        last_sheet = excel_file.sheet_names[-1]
+    def _read_reference(self, reader: WorkbookReader) -> pd.DataFrame:
+        last_sheet = reader.sheet_names[-1]
 
         #Reference of last day of the month because the list of could vary throughout the current month
-        df_reference_last_day_of_month = pd.read_excel(self.input_name, sheet_name=last_sheet)
+        df_reference_last_day_of_month = reader.read_sheet(last_sheet, usecols=[0])
         df_reference_last_day_of_month = df_reference_last_day_of_month.filter(['Usuario'])
         df_reference_last_day_of_month.columns = ["Email"]
 
-        # Create a Pandas Excel writer using xlsxwriter as the engine
-        with pd.ExcelWriter(self.clean_data_file, engine='xlsxwriter') as writer:
-            
-            # Loop through each sheet name
-            for sheet_name in excel_file.sheet_names:
-                # Read in the sheet as a DataFrame
-                df = pd.read_excel(self.input_name, sheet_name=sheet_name, usecols=[0, 12, 15] + list(range(19, 25)))
-                df.columns = columns_name
-                if self.logger:
-                    self.logger.info(f"Cleaning sheet {sheet_name}")
+        # Filter out rows that contain any of the strings in 'emails_to_delete'
+        return df_reference_last_day_of_month[~df_reference_last_day_of_month['Email'].isin(self.emails_to_delete)]
 
-                # Filter out rows that contain any of the strings in 'emails_to_delete'
-                df_reference_last_day_of_month = df_reference_last_day_of_month[~df_reference_last_day_of_month['Email'].isin(self.emails_to_delete)]
+    def read_reference(self) -> pd.DataFrame:
+        """Employees of the last sheet, the reference list every day is merged on."""
+        with WorkbookReader(self.input_name, self.engine) as reader:
+            return self._read_reference(reader)
 
-                #Aggregates all data columns to the day of reference
-                df = pd.merge(df_reference_last_day_of_month, df, on='Email', how='left')
+    def read_raw_sheets(self, sheet_names: list[str]) -> dict[str, pd.DataFrame]:
+        """Read only the given sheets, without cleaning them."""
+        if self.workers > 1:
+            return dict(map_chunks(read_sheet_chunk, sheet_names, self.workers, self.input_name, self.engine))
+        with WorkbookReader(self.input_name, self.engine) as reader:
+            return {sheet_name: reader.read_sheet(sheet_name, usecols, columns_name) for sheet_name in sheet_names}
 
-                df.dropna(subset=["Username"], inplace=True)
+    def clean_sheets(self, raw_sheets: dict[str, pd.DataFrame], df_reference: pd.DataFrame) -> dict[str, pd.DataFrame]:
+        """Clean sheets that were already read against a reference employee list."""
+        return {sheet_name: clean_sheet(df, df_reference) for sheet_name, df in raw_sheets.items()}
 
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
+    def clean_data(self) -> dict[str, pd.DataFrame]:
+        params = {'emails_to_delete': sorted(self.emails_to_delete), 'engine': self.engine or default_engine()}
+        cleaned_sheets = self.cache.get_or_compute('clean_data', [self.input_name], params,
+                                                   lambda: dict(self.iter_clean_sheets()))
 
         if self.logger:
-            self.logger.info(f"Clean data written to {self.clean_data_file}")
-        return self.clean_data_file
+            self.logger.info(f"Cleaned {len(cleaned_sheets)} sheets")
+        if self.store:
+            self.store.dump('data_cleaned', cleaned_sheets)
+        return cleaned_sheets
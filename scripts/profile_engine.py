@@ -0,0 +1,97 @@
+"""Coefficient profiles of the employees, configured in initial_parameters.json.
+
+PROFILES is a list of profiles in priority order; each employee gets the
+first one whose rules all match. A rule is either a column of the employee
+list (Cat, División, Departamento or Email) with the values it accepts, or
+member_of with the name of a list of emails (such as the Autodesk users).
+A profile without rules matches everyone, which makes it the default:
+
+    {"name": "modelers", "coefficients": "productivity_coefficients_modelers",
+     "rules": {"member_of": "autodesk_users"}}
+
+coefficients is the name of an entry of COEFFICIENTS or the coefficients
+themselves, one per signal. Profile names must be unique.
+"""
+
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+MATCH_COLUMNS = ('Cat', 'División', 'Departamento', 'Email')
+
+# The profiles used before they were configurable: categories 01 to 05 first,
+# then the Autodesk users, then everyone else
+DEFAULT_PROFILES = [
+    {"name": "cat12345", "coefficients": "productivity_coefficients_cat12345",
+     "rules": {"Cat": ["01", "02", "03", "04", "05"]}},
+    {"name": "modelers", "coefficients": "productivity_coefficients_modelers",
+     "rules": {"member_of": "autodesk_users"}},
+    {"name": "others", "coefficients": "productivity_coefficients_others"},
+]
+
+
+def _as_list(values) -> list:
+    return list(values) if isinstance(values, (list, tuple, set)) else [values]
+
+
+def profile_mask(employees: pd.DataFrame, rules: dict, lists: Dict[str, Iterable[str]]) -> np.ndarray:
+    """Employees that match every rule of a profile."""
+    mask = np.ones(len(employees), dtype=bool)
+    for key, values in rules.items():
+        if key == 'member_of':
+            members = set()
+            for list_name in _as_list(values):
+                if list_name not in lists:
+                    raise ValueError(f"Unknown membership list in profile rules: {list_name}")
+                members.update(lists[list_name])
+            mask &= employees['Email'].isin(members).to_numpy()
+        elif key in MATCH_COLUMNS:
+            mask &= employees[key].astype(str).isin([str(value) for value in _as_list(values)]).to_numpy()
+        else:
+            raise ValueError(f"Unknown profile rule: {key}")
+    return mask
+
+
+def assign_profiles(employees: pd.DataFrame, profiles: List[dict], lists: Dict[str, Iterable[str]]) -> np.ndarray:
+    """Position in profiles of the profile of each employee (first match wins)."""
+    assignment = np.full(len(employees), -1)
+    for position, profile in enumerate(profiles):
+        unassigned = assignment < 0
+        if not unassigned.any():
+            break
+        assignment[unassigned & profile_mask(employees, profile.get('rules', {}), lists)] = position
+    if (assignment < 0).any():
+        raise ValueError(f"{int((assignment < 0).sum())} employees match no profile, add a profile without rules")
+    return assignment
+
+
+def coefficient_table(profiles: List[dict], coefficients: Dict[str, dict], columns: List[str]) -> pd.DataFrame:
+    """Coefficients of every profile, one row per profile and one column per signal."""
+    rows = {}
+    for profile in profiles:
+        if profile['name'] in rows:
+            raise ValueError(f"Duplicate profile name: {profile['name']}")
+        values = profile['coefficients']
+        if isinstance(values, str):
+            if values not in coefficients:
+                raise ValueError(f"Profile {profile['name']} uses unknown coefficients {values}")
+            values = coefficients[values]
+        missing = set(columns) - set(values)
+        if missing:
+            raise ValueError(f"Profile {profile['name']} has no coefficient for {sorted(missing)}")
+        rows[profile['name']] = [values[column] for column in columns]
+    return pd.DataFrame.from_dict(rows, orient='index', columns=columns)
+
+
+def coefficient_matrix(employees: pd.DataFrame, profiles: List[dict], coefficients: Dict[str, dict],
+                       columns: List[str], lists: Dict[str, Iterable[str]]) -> pd.DataFrame:
+    """Email, Cat, the coefficients of each signal and the Profile of every employee, in employee order."""
+    table = coefficient_table(profiles, coefficients, columns)
+    assignment = assign_profiles(employees, profiles, lists)
+
+    df = pd.DataFrame(table.to_numpy(dtype=float)[assignment], columns=columns)
+    df.insert(0, 'Email', employees['Email'].to_numpy())
+    df.insert(1, 'Cat', employees['Cat'].to_numpy())
+    df['Profile'] = table.index.to_numpy()[assignment]
+    return df
@@ -1,16 +1,136 @@
+"""Monthly productivity report: the results table and its summary sheets."""
+
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+import logging
+
+import numpy as np
 import pandas as pd
+import xlsxwriter
+
+ENGINES = ('xlsxwriter', 'openpyxl')
+TWIN_FORMATS = ('csv', 'parquet')
+
+# Name pandas gave the results sheet, kept for the readers of older reports
+RESULTS_SHEET = 'Sheet1'
+ID_COLUMNS = ['Email', 'Username', 'Cat', 'División', 'Departamento']
+GROUP_SHEETS = {'Por Cat': 'Cat', 'Por División': 'División', 'Por Departamento': 'Departamento'}
+LOW_CONNECTIVITY_THRESHOLD = 0.3
+
+
+def summary_sheets(df: pd.DataFrame, threshold: float = LOW_CONNECTIVITY_THRESHOLD) -> Dict[str, pd.DataFrame]:
+    """Averages by group and by day and the low connectivity list of a results table.
+
+    The day columns are the ones after ID_COLUMNS; empty days of an employee
+    do not count, as in the averages of the API.
+    """
+    days = [column for column in df.columns if column not in ID_COLUMNS]
+    scores = df[days].to_numpy(dtype=float)
+    present = ~np.isnan(scores)
+    totals = np.where(present, scores, 0).sum(axis=1)
+    counts = present.sum(axis=1)
+
+    sheets = {}
+    for sheet_name, column in GROUP_SHEETS.items():
+        if column not in df.columns:
+            continue
+        groups = pd.DataFrame({column: df[column].fillna('').to_numpy(), 'Empleados': 1,
+                               'Registros': counts, 'Suma': totals}).groupby(column, sort=True).sum()
+        groups['Promedio'] = groups['Suma'] / groups['Registros'].where(groups['Registros'] > 0)
+        sheets[sheet_name] = groups.drop(columns='Suma').reset_index()
+
+    day_counts = present.sum(axis=0)
+    sheets['Promedio diario'] = pd.DataFrame({
+        'Día': days,
+        'Empleados': day_counts,
+        'Promedio': np.where(present, scores, 0).sum(axis=0) / np.where(day_counts > 0, day_counts, np.nan),
+    })
+
+    averages = totals / np.where(counts > 0, counts, np.nan)
+    low = df[[column for column in ID_COLUMNS if column in df.columns]].assign(Promedio=averages)
+    low = low[low['Promedio'] < threshold].sort_values(['Promedio', 'Email'], kind='stable')
+    sheets['Baja conectividad'] = low.reset_index(drop=True)
+    return sheets
+
+
+def write_frame(workbook: xlsxwriter.Workbook, name: Optional[str], df: pd.DataFrame, header_format=None) -> None:
+    """Add df as a sheet of workbook, written row by row.
+
+    constant_memory workbooks only keep cells written in row order, which
+    DataFrame.to_excel does not do. Missing values leave the cell empty and
+    datetime columns get a date format.
+    """
+    sheet = workbook.add_worksheet(name)
+    sheet.write_row(0, 0, list(df.columns), header_format)
+    numeric = [pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) for dtype in df.dtypes]
+    dates = [pd.api.types.is_datetime64_any_dtype(dtype) for dtype in df.dtypes]
+    datetime_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'}) if any(dates) else None
+    columns = [df[column].to_numpy(dtype=float if is_number else object).tolist()
+               for column, is_number in zip(df.columns, numeric)]
+    write_number, write_string, write = sheet.write_number, sheet.write_string, sheet.write
+    for row, values in enumerate(zip(*columns), start=1):
+        for column, value in enumerate(values):
+            if value != value or value is None:
+                continue
+            if numeric[column]:
+                write_number(row, column, value)
+            elif dates[column]:
+                sheet.write_datetime(row, column, value.to_pydatetime(), datetime_format)
+            elif isinstance(value, str):
+                # Never read as a formula, whatever the text starts with
+                write_string(row, column, value)
+            else:
+                write(row, column, value)
+
 
 class ReportGenerator:
-    def __init__(self, logger=None) -> None:
+    """Writes the results table with its summary sheets, and optionally CSV/Parquet copies.
+
+    The default xlsxwriter engine streams the rows in constant_memory mode, so
+    the workbook is never held in memory; openpyxl is kept as a fallback.
+    """
+
+    def __init__(self, logger: logging.Logger = None, engine: str = 'xlsxwriter', summaries: bool = True,
+                 twins: Iterable[str] = (), threshold: float = LOW_CONNECTIVITY_THRESHOLD) -> None:
+        if engine not in ENGINES:
+            raise ValueError(f"Unsupported report engine: {engine}")
+        unknown = set(twins) - set(TWIN_FORMATS)
+        if unknown:
+            raise ValueError(f"Unsupported report formats: {sorted(unknown)}")
         self.logger = logger
+        self.engine = engine
+        self.summaries = summaries
+        self.twins = list(twins)
+        self.threshold = threshold
 
     def save_report(self, df: pd.DataFrame, output_filename: str) -> pd.DataFrame:
-        with pd.ExcelWriter(output_filename, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False)
+        sheets = {RESULTS_SHEET: df}
+        if self.summaries:
+            sheets.update(summary_sheets(df, self.threshold))
+
+        if self.engine == 'xlsxwriter':
+            workbook = xlsxwriter.Workbook(str(output_filename), {'constant_memory': True})
+            header_format = workbook.add_format({'bold': True})
+            for name, frame in sheets.items():
+                write_frame(workbook, name, frame, header_format)
+            workbook.close()
+        else:
+            with pd.ExcelWriter(output_filename, engine='openpyxl') as writer:
+                for name, frame in sheets.items():
+                    frame.to_excel(writer, sheet_name=name, index=False)
         if self.logger:
             self.logger.info(f"Final table saved to {output_filename}")
+
+        for file_format in self.twins:
+            twin = Path(output_filename).with_suffix(f'.{file_format}')
+            if file_format == 'csv':
+                df.to_csv(twin, index=False)
+            else:
+                df.to_parquet(twin, index=False)
+            if self.logger:
+                self.logger.info(f"Final table saved to {twin}")
         return df
-    
+
     def save_to_drive(self, drive_connector, output_filename: str) -> None:
         # drive_connector.upload_file(output_filename)
-        pass
\ No newline at end of file
+        pass
@@ -0,0 +1,215 @@
+"""Vectorized scoring of the daily productivity signals.
+
+All sources are aligned into a single (employees, days, signals) array so that
+every daily score of a period (a month, a quarter...) is computed with one
+multiply-and-clip against the coefficient matrix.
+"""
+
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# Order of the signals in the tensor, the coefficient matrix and the reports
+SIGNAL_COLUMNS = [
+    'Sent emails',
+    'Email last use',
+    'Edited files',
+    'Viewed files',
+    'Drive last use',
+    'Add files',
+    'Chat',
+    'Meetings',
+    'Autodesk',
+    'VPN',
+]
+
+# Signals coming from the cleaned Google productivity sheets
+GOOGLE_SIGNALS = SIGNAL_COLUMNS[:6]
+
+# Signals coming from the activity tables (Email + one column per day)
+ACTIVITY_SIGNALS = SIGNAL_COLUMNS[6:]
+
+ActivityFrames = Dict[str, Union[pd.DataFrame, List[pd.DataFrame]]]
+
+
+def _same_day(datestamps: pd.Series, day: str) -> np.ndarray:
+    """Flag the ISO datestamps whose part before the 'T' is day."""
+    # Only the day and the character after it are kept, instead of splitting every value
+    prefixes = np.asarray(datestamps.astype(str).to_numpy(), dtype=f'U{len(day) + 1}')
+    return (prefixes == day) | (prefixes == f'{day}T')
+
+
+def google_signals(df: pd.DataFrame, day: str) -> np.ndarray:
+    """(rows, GOOGLE_SIGNALS) uint8 flags of a cleaned day sheet, in the order of its rows."""
+    signals = np.empty((len(df), len(GOOGLE_SIGNALS)), dtype=np.uint8)
+    signals[:, 0] = (df['Sent emails'] > 0).to_numpy()
+    signals[:, 1] = _same_day(df['Email last use'], day)
+    signals[:, 2] = (df['Edited files'] > 0).to_numpy()
+    signals[:, 3] = (df['Viewed files'] > 0).to_numpy()
+    signals[:, 4] = _same_day(df['Drive last use'], day)
+    signals[:, 5] = ((df['Added files'] + df['Other added files']) > 0).to_numpy()
+    return signals
+
+
+def combine_activity_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Join activity tables of consecutive months into a single wide table."""
+    tables = [frame.set_index('Email') for frame in frames]
+    combined = pd.concat(tables, axis=1).fillna(0)
+    combined = combined.loc[:, ~combined.columns.duplicated()]
+    combined.index.name = 'Email'
+    return combined.reset_index()
+
+
+def activity_matrix(frame: pd.DataFrame, employees: pd.Index, dates: List[str]) -> np.ndarray:
+    """Return an (employees, days) binary matrix from an activity table.
+
+    Employees or days missing in the table count as no activity.
+    """
+    table = frame.set_index('Email')
+    table = table.loc[:, ~table.columns.duplicated()]
+    if not table.index.is_unique:
+        table = table.groupby(level=0).max()
+    table = table.reindex(index=employees, columns=dates, fill_value=0)
+    return (table.fillna(0).to_numpy() > 0).astype(np.uint8)
+
+
+def build_signal_tensor(
+    day_frames: Dict[str, pd.DataFrame],
+    activity_frames: ActivityFrames,
+    employees: pd.Index,
+) -> Tuple[np.ndarray, np.ndarray, List[Tuple[np.ndarray, np.ndarray]]]:
+    """Align every source into a (employees, days, signals) uint8 tensor.
+
+    day_frames maps 'YYYY-MM-DD' to a cleaned Google productivity sheet and
+    activity_frames maps each of ACTIVITY_SIGNALS to its wide table (or a list
+    of monthly tables). Returns the tensor, an (employees, days) mask of the
+    employees present in each day sheet and, for each day, the positions of
+    those employees with the sheet row each one was taken from.
+    """
+    dates = list(day_frames)
+    tensor = np.zeros((len(employees), len(dates), len(SIGNAL_COLUMNS)), dtype=np.uint8)
+    present = np.zeros((len(employees), len(dates)), dtype=bool)
+
+    # Each sheet is written into the tensor on its own, the sheets are never stacked.
+    # A few vectorized comparisons per sheet, cheaper than sending the sheets to worker processes
+    positions = []
+    for day_index, (day, df) in enumerate(day_frames.items()):
+        signals = google_signals(df, day)
+        rows = employees.get_indexer(df['Email'])
+        # An employee repeated in a sheet keeps its last row
+        sheet_rows = np.flatnonzero((rows >= 0) & ~pd.Index(rows).duplicated(keep='last'))
+        tensor[rows[sheet_rows], day_index, :len(GOOGLE_SIGNALS)] = signals[sheet_rows]
+        present[rows[sheet_rows], day_index] = True
+        positions.append((rows[sheet_rows], sheet_rows))
+
+    for position, name in enumerate(ACTIVITY_SIGNALS, start=len(GOOGLE_SIGNALS)):
+        frame = activity_frames[name]
+        if isinstance(frame, (list, tuple)):
+            frame = combine_activity_frames(frame)
+        tensor[:, :, position] = activity_matrix(frame, employees, dates)
+
+    return tensor, present, positions
+
+
+def score_tensor(tensor: np.ndarray, coefficients: np.ndarray) -> np.ndarray:
+    """Weighted sum of the signals clipped at 1, for every employee and day.
+
+    coefficients is an (employees, signals) matrix aligned with the tensor.
+    The signals are accumulated one after the other, in SIGNAL_COLUMNS order.
+    """
+    scores = np.zeros(tensor.shape[:2])
+    for position in range(tensor.shape[2]):
+        scores += tensor[:, :, position] * coefficients[:, position, np.newaxis]
+    return np.minimum(scores, 1)
+
+
+def signal_bitmask(tensor: np.ndarray) -> np.ndarray:
+    """(employees, days) uint16 with bit i set where the i-th signal of SIGNAL_COLUMNS is active."""
+    masks = np.zeros(tensor.shape[:2], dtype=np.uint16)
+    for position in range(tensor.shape[2]):
+        masks |= tensor[:, :, position].astype(np.uint16) << position
+    return masks
+
+
+def score_period(
+    day_frames: Dict[str, pd.DataFrame],
+    activity_frames: ActivityFrames,
+    df_coefficients: pd.DataFrame,
+) -> Dict[str, pd.DataFrame]:
+    """Score every day of a period in one batch.
+
+    df_coefficients has one row per employee with Email, Cat and the
+    SIGNAL_COLUMNS coefficients. Returns, for each day, the employees present
+    in that day sheet with their weighted signals and the resulting Productivity.
+    """
+    return score_signals(day_frames, activity_frames, df_coefficients)[0]
+
+
+def score_signals(
+    day_frames: Dict[str, pd.DataFrame],
+    activity_frames: ActivityFrames,
+    df_coefficients: pd.DataFrame,
+) -> Tuple[Dict[str, pd.DataFrame], np.ndarray, np.ndarray]:
+    """score_period that also returns the signal tensor and the presence mask it scored.
+
+    The day frames are compact: Email and Cat are categoricals sharing the
+    categories of df_coefficients, so each row keeps only a code, and the
+    weighted signals are float32. Productivity stays float64.
+    """
+    employees = pd.Index(df_coefficients['Email'])
+    coefficients = df_coefficients[SIGNAL_COLUMNS].to_numpy(dtype=float)
+    tensor, present, positions = build_signal_tensor(day_frames, activity_frames, employees)
+    scores = score_tensor(tensor, coefficients)
+
+    emails = pd.CategoricalDtype(employees)
+    cats = pd.Categorical(df_coefficients['Cat'])
+    weights = coefficients.astype(np.float32)
+
+    results = {}
+    for day_index, (day, (employee_rows, sheet_rows)) in enumerate(zip(day_frames, positions)):
+        # In employee order, as the present employees of the day
+        order = np.argsort(employee_rows, kind='stable')
+        rows = employee_rows[order]
+        columns = {
+            'Email': pd.Categorical.from_codes(rows, dtype=emails),
+            'Cat': cats[rows],
+            'Username': day_frames[day]['Username'].to_numpy()[sheet_rows[order]],
+        }
+        weighted = tensor[rows, day_index, :] * weights[rows]
+        columns.update(zip(SIGNAL_COLUMNS, weighted.T))
+        columns['Productivity'] = scores[rows, day_index]
+        results[day] = pd.DataFrame(columns)
+    return results, tensor, present
+
+
+def save_signal_matrix(path: Path, tensor: np.ndarray, present: np.ndarray, df_coefficients: pd.DataFrame,
+                       dates: List[str], profiles: List[dict]) -> Path:
+    """Keep the binary signals of a period next to the profile coefficients they were scored with.
+
+    The .npz file holds the (employees, days, signals) tensor, the presence
+    mask, the employees with their profile and the coefficients of every
+    profile, enough to score the period again with other coefficients
+    (app.whatif) without running the pipeline.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    profile_names = [profile['name'] for profile in profiles]
+    profile_table = (df_coefficients.drop_duplicates('Profile').set_index('Profile')
+                     .reindex(profile_names)[SIGNAL_COLUMNS].fillna(0))
+    np.savez(
+        path,
+        signals=tensor,
+        present=present,
+        emails=df_coefficients['Email'].to_numpy(dtype=str),
+        cats=df_coefficients['Cat'].astype(str).to_numpy(dtype=str),
+        dates=np.array(dates, dtype=str),
+        signal_names=np.array(SIGNAL_COLUMNS, dtype=str),
+        profile_index=pd.Index(profile_names).get_indexer(df_coefficients['Profile']).astype(np.int16),
+        profile_names=np.array(profile_names, dtype=str),
+        profile_sources=np.array([profile['coefficients'] if isinstance(profile['coefficients'], str) else ''
+                                  for profile in profiles], dtype=str),
+        coefficients=profile_table.to_numpy(dtype=float),
+    )
+    return path
@@ -0,0 +1,141 @@
+"""On-disk memo of the stage outputs, keyed by the content of their inputs."""
+
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+import logging
+
+import pandas as pd
+
+from file_hash import file_md5, json_md5
+from intermediate_store import IntermediateStore
+
+# Bump when a cached stage changes what it computes, so old entries are not reused
+CACHE_VERSION = 2
+
+MANIFEST = "manifest.json"
+
+StageOutput = Union[pd.DataFrame, Dict[str, pd.DataFrame]]
+
+
+class StageCache:
+    """Stores the frames a stage returns under the hash of its inputs.
+
+    The key of an entry is the MD5 of the stage name, the content of its input
+    files and only the parameters the stage depends on, so changing a
+    coefficient reuses every parsed input. Entries are columnar files of the
+    IntermediateStore; the least recently used ones are removed when the cache
+    grows over max_bytes. A cache without directory is disabled and always
+    computes the stage.
+    """
+
+    def __init__(self, directory: Optional[Path], max_bytes: int = 1024 ** 3, file_format: str = 'parquet',
+                 logger: logging.Logger = None) -> None:
+        self.directory = Path(directory) if directory else None
+        self.max_bytes = max_bytes
+        self.file_format = file_format
+        self.logger = logger
+        self._file_hashes: Dict[tuple, str] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def file_hash(self, path: Path) -> str:
+        # The same input is hashed once per run even when several stages read it
+        stat = os.stat(path)
+        key = (str(path), stat.st_size, stat.st_mtime_ns)
+        if key not in self._file_hashes:
+            self._file_hashes[key] = file_md5(path)
+        return self._file_hashes[key]
+
+    def key(self, stage: str, files: List[Path], params: dict) -> str:
+        return json_md5({
+            "stage": stage,
+            "version": CACHE_VERSION,
+            "files": [self.file_hash(Path(path)) for path in files],
+            "params": params,
+        })
+
+    def has(self, stage: str, files: List[Path], params: dict) -> bool:
+        """Whether get_or_compute would find this stage output in the cache."""
+        return self.enabled and (self.directory / f"{stage}-{self.key(stage, files, params)}" / MANIFEST).exists()
+
+    def get_or_compute(self, stage: str, files: List[Path], params: dict, compute: Callable[[], StageOutput]) -> StageOutput:
+        """The cached output of stage for these inputs, computing and storing it on a miss."""
+        if not self.enabled:
+            return compute()
+
+        key = self.key(stage, files, params)
+        entry = self.directory / f"{stage}-{key}"
+        if (entry / MANIFEST).exists():
+            try:
+                output = self._read(entry, stage)
+            except Exception as error:
+                if self.logger:
+                    self.logger.warning(f"Unreadable cache entry for {stage}, recomputing: {error}")
+            else:
+                # The manifest time orders the entries for eviction
+                os.utime(entry / MANIFEST)
+                if self.logger:
+                    self.logger.info(f"Stage cache hit for {stage}")
+                return output
+
+        output = compute()
+        try:
+            self._write(entry, stage, output)
+        except Exception as error:
+            # Frames that cannot be stored as columnar files are used without caching
+            shutil.rmtree(entry, ignore_errors=True)
+            if self.logger:
+                self.logger.warning(f"Could not cache {stage}: {error}")
+        else:
+            self.evict()
+        return output
+
+    def _read(self, entry: Path, stage: str) -> StageOutput:
+        with open(entry / MANIFEST, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        frames = IntermediateStore(entry, self.file_format).load(stage, [str(index) for index in range(len(manifest["names"]))])
+        frames = dict(zip(manifest["names"], frames.values()))
+        return frames["frame"] if manifest["single"] else frames
+
+    def _write(self, entry: Path, stage: str, output: StageOutput) -> None:
+        single = isinstance(output, pd.DataFrame)
+        frames = {"frame": output} if single else output
+        tmp_entry = entry.with_name(f"{entry.name}.tmp")
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+        # Files are numbered, sheet names are kept in the manifest
+        IntermediateStore(tmp_entry, self.file_format).dump(stage, {str(index): df for index, df in enumerate(frames.values())})
+        with open(tmp_entry / MANIFEST, "w", encoding="utf-8") as f:
+            json.dump({"stage": stage, "single": single, "names": list(frames), "created": time.time()}, f)
+        shutil.rmtree(entry, ignore_errors=True)
+        tmp_entry.rename(entry)
+
+    def entries(self) -> List[tuple]:
+        """(last use, size in bytes, path) of every entry, oldest first."""
+        result = []
+        for entry in self.directory.glob("*"):
+            manifest = entry / MANIFEST
+            if entry.is_dir() and manifest.exists():
+                size = sum(path.stat().st_size for path in entry.rglob("*") if path.is_file())
+                result.append((manifest.stat().st_mtime, size, entry))
+        return sorted(result)
+
+    def evict(self) -> int:
+        """Remove the least recently used entries until the cache fits in max_bytes. Returns how many."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed += 1
+        if removed and self.logger:
+            self.logger.info(f"Evicted {removed} stage cache entries")
+        return removed
@@ -0,0 +1,211 @@
+"""Synthetic versions of the six input files, to measure the pipeline at scale.
+
+The files follow the layouts read by GoogleProductivityDataCleaner and
+DataProcessor: a productivity workbook with one sheet per day, the Autodesk
+workbook ('Uso' and 'Autodesk users'), Meetings.xlsx, chats and VPN csv files
+and INFORME_PERSONAL.xlsx.
+
+    python scripts/synthetic_data.py out/ --employees 10000 --chats 40
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+from report_generator import write_frame
+
+DOMAIN = "ingetec.com.co"
+# Columns of a productivity sheet, the ones the cleaner reads are filled
+PRODUCTIVITY_COLUMNS = 25
+CATEGORIES = ["01", "02", "03", "04", "05", "06", "07", "08", "AA"]
+# Rows an xlsx sheet can hold below its header
+XLSX_MAX_ROWS = 1048575
+
+
+def _iso_times(days: np.ndarray, hours: np.ndarray) -> np.ndarray:
+    return np.char.add(np.char.add(days.astype(str), "T"), np.char.add(np.char.zfill(hours.astype(str), 2), ":00:00.000Z"))
+
+
+def write_productivity(path: Path, emails: np.ndarray, usernames: np.ndarray, days: list,
+                       rng: np.random.Generator, missing_rate: float) -> None:
+    """Google productivity export: one sheet per day with the 25 export columns."""
+    header = ["Usuario"] + [f"Columna {index}" for index in range(1, PRODUCTIVITY_COLUMNS)]
+    workbook = xlsxwriter.Workbook(str(path), {"constant_memory": True})
+    for position, day in enumerate(days):
+        # Some employees are missing from each day, except the reference last day
+        present = rng.random(len(emails)) >= missing_rate if position < len(days) - 1 else np.ones(len(emails), bool)
+        count = int(present.sum())
+        sent = rng.poisson(4, count)
+        edited = rng.poisson(2, count)
+        viewed = rng.poisson(6, count)
+        added = rng.poisson(0.5, count)
+        other_added = rng.poisson(0.3, count)
+        email_used = np.where(rng.random(count) < 0.85, day, days[0])
+        drive_used = np.where(rng.random(count) < 0.6, day, days[0])
+        email_last_use = _iso_times(email_used, rng.integers(7, 19, count))
+        drive_last_use = _iso_times(drive_used, rng.integers(7, 19, count))
+
+        sheet = workbook.add_worksheet(day)
+        sheet.write_row(0, 0, header)
+        for row, (email, username) in enumerate(zip(emails[present], usernames[present])):
+            sheet.write_string(row + 1, 0, email)
+            sheet.write_string(row + 1, 12, username)
+            sheet.write_number(row + 1, 15, sent[row])
+            sheet.write_row(row + 1, 19, [email_last_use[row], int(edited[row]), int(viewed[row]),
+                                          drive_last_use[row], int(added[row]), int(other_added[row])])
+    workbook.close()
+
+
+def write_personal_info(path: Path, emails: np.ndarray, rng: np.random.Generator) -> None:
+    # Real exports mix upper case emails and add people outside the domain
+    cats = rng.choice(CATEGORIES, len(emails))
+    suffixes = rng.choice(["", "X", " - Ingeniero", " Senior"], len(emails))
+    df = pd.DataFrame({
+        "Email": [email.upper() if index % 7 == 0 else email for index, email in enumerate(emails)],
+        "Cat": np.char.add(cats.astype(str), suffixes.astype(str)),
+        "División": [f"División {index % 4}" for index in range(len(emails))],
+        "Departamento": [f"Departamento {index % 12}" for index in range(len(emails))],
+    })
+    external = pd.DataFrame({"Email": ["contratista@otro.com"], "Cat": ["05"], "División": [None], "Departamento": [None]})
+    pd.concat([df, external], ignore_index=True).to_excel(path, index=False)
+
+
+def write_autodesk(path: Path, emails: np.ndarray, dates: pd.DatetimeIndex, rng: np.random.Generator,
+                   modelers_rate: float) -> None:
+    modelers = emails[rng.random(len(emails)) < modelers_rate]
+    used = rng.random((len(modelers), len(dates))) < 0.6
+    user_index, day_index = np.nonzero(used)
+    uso = pd.DataFrame({
+        "producto": "AutoCAD",
+        "version": "2025",
+        "equipo": "PC",
+        "licencia": "named",
+        "email": np.char.upper(modelers[user_index].astype(str)),
+        "sesiones": rng.integers(1, 5, len(user_index)),
+        "minutos": rng.integers(10, 480, len(user_index)),
+        "pais": "CO",
+        "ciudad": "Bogotá",
+        "day_used": dates[day_index],
+    })
+    users = pd.DataFrame({"Email": list(modelers) + [f"licencia.libre@{DOMAIN}"]})
+    workbook = xlsxwriter.Workbook(str(path), {"constant_memory": True})
+    write_frame(workbook, "Uso", uso)
+    write_frame(workbook, "Autodesk users", users)
+    workbook.close()
+
+
+def write_meetings(path: Path, emails: np.ndarray, days: np.ndarray, rng: np.random.Generator, events: int) -> int:
+    """Meeting participations, capped at what one xlsx sheet holds. Returns the rows written."""
+    events = min(events, XLSX_MAX_ROWS)
+    actors = emails[rng.integers(0, len(emails), events)]
+    # A few external guests, which the pipeline drops
+    actors[rng.random(events) < 0.01] = "invitado@gmail.com"
+    df = pd.DataFrame({
+        "Fecha": _iso_times(days[rng.integers(0, len(days), events)], rng.integers(7, 19, events)),
+        "Actor": actors,
+        "Código de reunión": np.char.add("abc-", rng.integers(0, max(1, events // 4), events).astype(str)),
+    })
+    workbook = xlsxwriter.Workbook(str(path), {"constant_memory": True})
+    write_frame(workbook, None, df)
+    workbook.close()
+    return events
+
+
+def write_chats(path: Path, emails: np.ndarray, days: np.ndarray, rng: np.random.Generator, events: int) -> None:
+    pd.DataFrame({
+        "Fecha": _iso_times(days[rng.integers(0, len(days), events)], rng.integers(0, 24, events)),
+        "Actor": emails[rng.integers(0, len(emails), events)],
+    }).to_csv(path, index=False)
+
+
+def write_vpn(path: Path, usernames: np.ndarray, dates: pd.DatetimeIndex, rng: np.random.Generator, events: int) -> None:
+    units = rng.choice(["GB", "MB", "KB"], events, p=[0.1, 0.6, 0.3])
+    traffic = np.char.add(np.char.add(np.round(rng.random(events) * 50, 2).astype(str), " "), units.astype(str))
+    pd.DataFrame({
+        "Usuario": usernames[rng.integers(0, len(usernames), events)],
+        "IP": "10.0.0.1",
+        "Tráfico de salida": traffic,
+        "Fecha": dates[rng.integers(0, len(dates), events)].strftime("%d/%m/%Y"),
+    }).to_csv(path, index=False, encoding="utf-8")
+
+
+def generate_inputs(directory: Path, required_files: dict, year: int, month: int, employees: int = 1000,
+                    days: Optional[int] = None, chats_per_employee: float = 20, meetings_per_employee: float = 10,
+                    vpn_per_employee: float = 5, missing_rate: float = 0.02, modelers_rate: float = 0.3,
+                    seed: int = 0, months: int = 1) -> Dict[str, dict]:
+    """Write the REQUIRED_FILES inputs of a month into directory.
+
+    days limits the day sheets of the productivity workbook to the first days
+    of the month (all of them by default). With several months the event logs
+    span all of them, the events per employee are per month, and there is one
+    productivity workbook per month named as backfill.py looks for it.
+    Returns, for each file, its path and the number of rows or events written.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    names = {key: directory / info["name"] for key, info in required_files.items()}
+
+    usernames = np.array([f"empleado{index:05d}" for index in range(employees)])
+    emails = np.char.add(usernames, f"@{DOMAIN}")
+    periods = pd.period_range(pd.Period(year=year, month=month, freq="M"), periods=months, freq="M")
+    dates = pd.date_range(periods[0].start_time, periods[-1].end_time.normalize(), freq="D")
+    day_names = np.array(dates.strftime("%Y-%m-%d"))
+
+    productivity, sheets = {}, {}
+    for period in periods:
+        month_days = [day for day in day_names if day.startswith(period.strftime("%Y-%m"))]
+        key, path = "productivity", names["productivity"]
+        if months > 1:
+            # Imported here, backfill pulls in the whole pipeline
+            from backfill import monthly_file_name
+            key, path = f"productivity_{period}", directory / monthly_file_name(path.name, period.year, period.month)
+        productivity[key], sheets[key] = path, month_days[:days or len(month_days)]
+        write_productivity(path, emails, usernames, sheets[key], rng, missing_rate)
+    del names["productivity"]
+    names.update(productivity)
+
+    write_personal_info(names["personal_info"], emails, rng)
+    write_autodesk(names["autodesk"], emails, dates, rng, modelers_rate)
+    meetings = write_meetings(names["meetings"], emails, day_names, rng, int(employees * meetings_per_employee * months))
+    chats = int(employees * chats_per_employee * months)
+    write_chats(names["chats"], emails, day_names, rng, chats)
+    vpn = int(employees * vpn_per_employee * months)
+    write_vpn(names["vpn"], usernames, dates, rng, vpn)
+
+    counts = {"personal_info": employees + 1, "autodesk": employees, "meetings": meetings, "chats": chats, "vpn": vpn}
+    counts.update({key: len(day_sheets) for key, day_sheets in sheets.items()})
+    return {key: {"path": str(path), "rows": counts[key], "bytes": path.stat().st_size} for key, path in names.items()}
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Write synthetic input files for the productivity pipeline")
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--employees", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=None, help="Day sheets in the productivity workbook (whole month)")
+    parser.add_argument("--chats", type=float, default=20, help="Chat messages per employee in the month")
+    parser.add_argument("--meetings", type=float, default=10, help="Meeting participations per employee")
+    parser.add_argument("--vpn", type=float, default=5, help="VPN sessions per employee")
+    parser.add_argument("--months", type=int, default=1,
+                        help="Months from YEAR/MONTH covered by the logs, with one productivity workbook each")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    with open(Path(__file__).parent / "initial_parameters.json", "r", encoding="utf-8") as f:
+        params = json.load(f)
+    files = generate_inputs(args.directory, params["REQUIRED_FILES"], params["YEAR"], params["MONTH"],
+                            args.employees, args.days, args.chats, args.meetings, args.vpn, seed=args.seed,
+                            months=args.months)
+    print(json.dumps(files, indent=4))
+
+
+if __name__ == "__main__":
+    main()
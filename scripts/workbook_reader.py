@@ -0,0 +1,133 @@
+"""Single-parse reader for large multi-sheet Excel workbooks."""
+
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import pandas as pd
+from openpyxl import load_workbook
+
+ENGINES = ('openpyxl', 'calamine')
+
+
+def default_engine() -> str:
+    """Use calamine when python-calamine is installed, openpyxl otherwise."""
+    return 'calamine' if find_spec('python_calamine') else 'openpyxl'
+
+
+class WorkbookReader:
+    """Opens a workbook once and reads its sheets lazily.
+
+    With openpyxl the workbook is opened in read-only mode and the rows of each
+    sheet are streamed, keeping only the requested columns. With calamine the
+    workbook is parsed natively, which is much faster on large exports.
+    """
+
+    def __init__(self, file_path: str, engine: Optional[str] = None) -> None:
+        self.file_path = Path(file_path)
+        self.engine = engine or default_engine()
+        if self.engine not in ENGINES:
+            raise ValueError(f"Unsupported Excel engine: {self.engine}")
+        self._workbook = None
+
+    def __enter__(self) -> "WorkbookReader":
+        self.open()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def open(self) -> None:
+        if self._workbook is not None:
+            return
+        if self.engine == 'openpyxl':
+            self._workbook = load_workbook(self.file_path, read_only=True, data_only=True)
+        else:
+            self._workbook = pd.ExcelFile(self.file_path, engine='calamine')
+
+    def close(self) -> None:
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+
+    @property
+    def sheet_names(self) -> List[str]:
+        self.open()
+        if self.engine == 'openpyxl':
+            return list(self._workbook.sheetnames)
+        return list(self._workbook.sheet_names)
+
+    def read_sheet(self, sheet_name: str, usecols: Optional[List[int]] = None,
+                   names: Optional[List[str]] = None) -> pd.DataFrame:
+        """Read one sheet, optionally keeping only the columns at usecols.
+
+        The first row is the header; names replaces it when given.
+        """
+        self.open()
+        if self.engine == 'calamine':
+            df = self._workbook.parse(sheet_name, usecols=usecols)
+        else:
+            df = self._stream_sheet(sheet_name, usecols)
+        if names is not None:
+            df.columns = names
+        return df
+
+    def iter_sheets(self, usecols: Optional[List[int]] = None,
+                    names: Optional[List[str]] = None) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """Yield (sheet_name, DataFrame) for every sheet, one at a time."""
+        for sheet_name in self.sheet_names:
+            yield sheet_name, self.read_sheet(sheet_name, usecols, names)
+
+    def iter_chunks(self, sheet_name: str, chunk_size: int, columns: List[str]) -> Iterator[pd.DataFrame]:
+        """Yield the named columns of a sheet chunk_size rows at a time.
+
+        With openpyxl the rows are streamed, so only one chunk is held in
+        memory. calamine parses the selected columns of the whole sheet first
+        and then slices them.
+        """
+        self.open()
+        if self.engine == 'calamine':
+            df = self._workbook.parse(sheet_name, usecols=columns)[columns]
+            for start in range(0, len(df), chunk_size):
+                yield df.iloc[start:start + chunk_size]
+            return
+
+        worksheet = self._workbook[sheet_name]
+        worksheet.reset_dimensions()
+        rows = worksheet.iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        positions = [header.index(column) for column in columns]
+
+        chunk = []
+        for row in rows:
+            values = tuple(row[index] if index < len(row) else None for index in positions)
+            if any(value is not None for value in values):
+                chunk.append(values)
+            if len(chunk) == chunk_size:
+                yield pd.DataFrame(chunk, columns=columns)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns)
+
+    def _stream_sheet(self, sheet_name: str, usecols: Optional[List[int]]) -> pd.DataFrame:
+        worksheet = self._workbook[sheet_name]
+        # Dimensions stored in exported files are not always reliable
+        worksheet.reset_dimensions()
+
+        max_col = max(usecols) + 1 if usecols else None
+        rows = worksheet.iter_rows(values_only=True, max_col=max_col)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+
+        def select(row: tuple) -> tuple:
+            if not usecols:
+                return row
+            # Rows are shorter than max_col when their trailing cells are empty
+            if len(row) < max_col:
+                row = row + (None,) * (max_col - len(row))
+            return tuple(row[index] for index in usecols)
+
+        columns = list(select(header))
+        data = [values for values in map(select, rows) if any(value is not None for value in values)]
+        return pd.DataFrame(data, columns=columns)
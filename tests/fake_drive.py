@@ -0,0 +1,88 @@
+"""In-memory stand-in for the Google Drive v3 service used by DriveConnector."""
+
+import hashlib
+
+import httplib2
+
+
+class FakeRequest:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        return self.result
+
+
+class FakeHttp:
+    """Serves byte ranges of a file the way Drive answers media downloads."""
+
+    def __init__(self, drive, file_id):
+        self.drive = drive
+        self.file_id = file_id
+
+    def request(self, uri, method="GET", headers=None, **kwargs):
+        if self.drive.failures.get(self.file_id, 0) > 0:
+            self.drive.failures[self.file_id] -= 1
+            raise ConnectionError("connection reset")
+        content = self.drive.contents[self.file_id]
+        start, end = headers["range"].replace("bytes=", "").split("-")
+        chunk = content[int(start):int(end) + 1]
+        self.drive.requested_ranges.append((self.file_id, int(start)))
+        response = httplib2.Response({
+            "status": 206,
+            "content-range": f"bytes {start}-{int(start) + len(chunk) - 1}/{len(content)}",
+        })
+        return response, chunk
+
+
+class FakeMediaRequest:
+    def __init__(self, drive, file_id):
+        self.uri = f"https://fake.drive/{file_id}?alt=media"
+        self.headers = {}
+        self.http = FakeHttp(drive, file_id)
+
+
+class FakeDriveService:
+    """A folder of files kept in memory.
+
+    files maps file names to their bytes. Listing is paginated with page_size
+    results per page and failures maps file ids to a number of transport errors
+    raised before their download succeeds.
+    """
+
+    def __init__(self, files: dict, page_size: int = 2):
+        self.page_size = page_size
+        self.metadata = []
+        self.contents = {}
+        self.failures = {}
+        self.list_calls = 0
+        self.media_requests = []
+        self.requested_ranges = []
+        for index, (name, content) in enumerate(files.items()):
+            self.set_file(name, content, file_id=f"id{index}")
+
+    def set_file(self, name, content, file_id=None):
+        current = next((f for f in self.metadata if f["name"] == name), None)
+        if current is None:
+            current = {"id": file_id or f"id{len(self.metadata)}", "name": name}
+            self.metadata.append(current)
+        current["md5Checksum"] = hashlib.md5(content).hexdigest()
+        current["modifiedTime"] = f"2025-04-01T00:00:{len(self.media_requests):02d}.000Z"
+        current["size"] = str(len(content))
+        self.contents[current["id"]] = content
+
+    def files(self):
+        return self
+
+    def list(self, q=None, fields=None, pageSize=None, pageToken=None):
+        self.list_calls += 1
+        start = int(pageToken or 0)
+        end = start + self.page_size
+        result = {"files": [dict(f) for f in self.metadata[start:end]]}
+        if end < len(self.metadata):
+            result["nextPageToken"] = str(end)
+        return FakeRequest(result)
+
+    def get_media(self, fileId):
+        self.media_requests.append(fileId)
+        return FakeMediaRequest(self, fileId)
@@ -1,3 +1,5 @@
+import asyncio
+import json
 import os
 import sys
 from datetime import date
@@ -9,15 +11,16 @@ os.environ['DATABASE_URL'] = 'sqlite:///./test.db'
 os.environ['API_KEY'] = 'testtoken'
 
 from sqlalchemy.orm import Session
-from app.database import Base, engine, SessionLocal
-from app import crud, schemas
+from app.database import Base, engine, SessionLocal, get_async_sessionmaker
+from app import crud, crud_async, export, models, rollups, schemas, whatif
+from app.cache import query_cache
 import importlib, sys
 # Alias modules for relative imports used in endpoints
 sys.modules['app.api.schemas'] = importlib.import_module('app.schemas')
 sys.modules['app.api.crud'] = importlib.import_module('app.crud')
 sys.modules['app.api.database'] = importlib.import_module('app.database')
 sys.modules['app.api.v1.deps'] = importlib.import_module('app.api.deps')
-from app.api.v1 import endpoints
+from app.api.v1 import endpoints, endpoints_async
 from app.api.deps import verify_token
 from fastapi import HTTPException
 
@@ -30,6 +33,7 @@ def setup_db():
         pass
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    query_cache.clear()
     yield
     engine.dispose()
     Base.metadata.drop_all(bind=engine)
@@ -38,6 +42,9 @@ def setup_db():
     except OSError:
         pass
 
+def json_body(response):
+    return json.loads(response.body)
+
 def create_sample(db: Session, **kwargs):
     record = schemas.ProductivityCreate(
         email=kwargs.get('email', 'user@example.com'),
@@ -75,15 +82,18 @@ def test_employee_summary_found():
     create_sample(db, email='c@example.com')
     db.close()
     db2 = SessionLocal()
-    result = endpoints.employee_summary('c@example.com', db=db2)
+    result = json_body(endpoints.employee_summary('c@example.com', db=db2))
     db2.close()
     assert len(result) == 1
-    assert result[0].email == 'c@example.com'
+    assert result[0]['email'] == 'c@example.com'
 
 
 def test_employee_summary_not_found():
     with pytest.raises(HTTPException):
         endpoints.employee_summary('missing@example.com', db=SessionLocal())
+    with pytest.raises(HTTPException) as error:
+        endpoints.employee_summary('missing@example.com', accept='text/csv', db=SessionLocal())
+    assert error.value.status_code == 404
 
 def test_metrics_filters():
     db = SessionLocal()
@@ -91,11 +101,11 @@ def test_metrics_filters():
     create_sample(db, email='d@example.com', cat='cat2', fecha=date(2023,1,2))
     db.close()
     db2 = SessionLocal()
-    res1 = endpoints.metrics(email='d@example.com', db=db2)
+    res1 = json_body(endpoints.metrics(email='d@example.com', db=db2))
     assert len(res1) == 2
-    res2 = endpoints.metrics(categoria='cat1', db=db2)
+    res2 = json_body(endpoints.metrics(categoria='cat1', db=db2))
     assert len(res2) == 1
-    res3 = endpoints.metrics(fecha_inicio=date(2023,1,2), fecha_fin=date(2023,1,2), db=db2)
+    res3 = json_body(endpoints.metrics(fecha_inicio=date(2023,1,2), fecha_fin=date(2023,1,2), db=db2))
     assert len(res3) == 1
     db2.close()
 
@@ -109,3 +119,363 @@ def test_crud_functions_direct():
     metrics = crud.get_metrics(db, email=rec.email, categoria='catx')
     assert len(metrics) == 1
     db.close()
+
+def test_bulk_upsert_is_idempotent():
+    db = SessionLocal()
+    records = [
+        dict(email='e@example.com', username='e', cat='01', division=None, departamento='dep',
+             productividad=0.5, fecha=date(2023, 1, day))
+        for day in range(1, 4)
+    ]
+    assert crud.bulk_upsert_records(db, records, batch_size=2) == 3
+    records[0]['productividad'] = 0.9
+    crud.bulk_upsert_records(db, records[:1])
+    db.close()
+    db2 = SessionLocal()
+    summary = crud.get_employee_summary(db2, 'e@example.com')
+    db2.close()
+    assert len(summary) == 3
+    assert {r.fecha: r.productividad for r in summary}[date(2023, 1, 1)] == 0.9
+
+def test_bulk_ingest_endpoint():
+    records = [
+        schemas.ProductivityCreate(email=f'{name}@example.com', username=name, cat='02',
+                                   productividad=0.3, fecha=date(2023, 2, 1))
+        for name in ['f', 'g']
+    ]
+    db = SessionLocal()
+    result = endpoints.bulk_ingest(records, db=db)
+    db.close()
+    assert result.registros == 2
+    db2 = SessionLocal()
+    assert set(crud.get_employees(db2)) == {'f@example.com', 'g@example.com'}
+    db2.close()
+
+def create_month(db: Session):
+    # h averages 0.9, i 0.5 and j 0.2 over two days; j is in another category
+    for email, cat, values in [('h@example.com', 'cat1', (1.0, 0.8)),
+                               ('i@example.com', 'cat1', (0.4, 0.6)),
+                               ('j@example.com', 'cat2', (0.1, 0.3))]:
+        for day, value in enumerate(values, start=1):
+            create_sample(db, email=email, cat=cat, productividad=value, fecha=date(2023, 3, day))
+
+def test_daily_averages():
+    db = SessionLocal()
+    create_month(db)
+    result = endpoints.daily_averages(filters=endpoints.aggregate_filters(), db=db)
+    assert [r.fecha for r in result] == [date(2023, 3, 1), date(2023, 3, 2)]
+    assert result[0].promedio == pytest.approx(0.5)
+    assert result[0].empleados == 3
+    result = endpoints.daily_averages(filters=endpoints.aggregate_filters(categoria='cat1', fecha_inicio=date(2023, 3, 2)), db=db)
+    assert len(result) == 1
+    assert result[0].promedio == pytest.approx(0.7)
+    db.close()
+
+def test_distribution_buckets():
+    db = SessionLocal()
+    create_month(db)
+    result = endpoints.distribution(filters=endpoints.aggregate_filters(), db=db)
+    db.close()
+    assert [(b['rango'], b['empleados']) for b in result] == [
+        ('0.0-0.3', 1), ('0.3-0.6', 1), ('0.6-0.8', 0), ('0.8-1.0', 1)]
+
+def test_top_and_low_connectivity():
+    db = SessionLocal()
+    create_month(db)
+    top = endpoints.top_employees(limite=2, filters=endpoints.aggregate_filters(), db=db)
+    assert [r.email for r in top] == ['h@example.com', 'i@example.com']
+    assert top[0].promedio == pytest.approx(0.9)
+    low = endpoints.low_connectivity(umbral=0.6, filters=endpoints.aggregate_filters(), db=db)
+    assert [r.email for r in low] == ['j@example.com', 'i@example.com']
+    low = endpoints.low_connectivity(umbral=0.6, filters=endpoints.aggregate_filters(categoria='cat1'), db=db)
+    assert [r.email for r in low] == ['i@example.com']
+    db.close()
+
+def test_metrics_keyset_pagination():
+    db = SessionLocal()
+    for day in range(1, 6):
+        create_sample(db, email='k@example.com', fecha=date(2023, 4, day))
+        create_sample(db, email='l@example.com', fecha=date(2023, 4, day))
+    db.close()
+    db2 = SessionLocal()
+    seen, cursor = [], None
+    while True:
+        response = endpoints.metrics(limite=3, cursor=cursor, db=db2)
+        seen += [(r['email'], r['fecha']) for r in json_body(response)]
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            break
+    assert len(seen) == 10 and len(set(seen)) == 10
+    assert [fecha for _, fecha in seen] == sorted(fecha for _, fecha in seen)
+    response = endpoints.employee_summary('k@example.com', limite=4, db=db2)
+    assert [r['fecha'] for r in json_body(response)] == [f'2023-04-0{day}' for day in range(1, 5)]
+    response = endpoints.employee_summary('k@example.com', limite=4, cursor=response.headers['X-Next-Cursor'], db=db2)
+    assert [r['fecha'] for r in json_body(response)] == ['2023-04-05']
+    with pytest.raises(HTTPException):
+        endpoints.metrics(cursor='not-a-cursor', db=db2)
+    db2.close()
+
+def test_metrics_without_limite_or_cursor_are_not_paginated():
+    db = SessionLocal()
+    records = [dict(email=f'p{index}@example.com', username='p', cat='01', division=None, departamento=None,
+                    productividad=0.5, fecha=date(2023, 6, 1)) for index in range(endpoints.PAGE_SIZE + 5)]
+    crud.bulk_upsert_records(db, records)
+    response = endpoints.metrics(db=db)
+    assert len(json_body(response)) == endpoints.PAGE_SIZE + 5
+    assert 'X-Next-Cursor' not in response.headers
+    # A cursor alone reads pages of PAGE_SIZE rows
+    first = endpoints.metrics(limite=2, db=db)
+    response = endpoints.metrics(cursor=first.headers['X-Next-Cursor'], db=db)
+    assert len(json_body(response)) == endpoints.PAGE_SIZE
+    db.close()
+
+def test_export_metrics_streams_every_record():
+    db = SessionLocal()
+    for day in range(1, 8):
+        create_sample(db, email='m@example.com', cat='cat1', fecha=date(2023, 5, day))
+    create_sample(db, email='n@example.com', cat='cat2', fecha=date(2023, 5, 1))
+    assert [len(page) for page in crud.iter_metric_pages(db, page_size=3, categoria='cat1')] == [3, 3, 1]
+
+    response = endpoints.export_metrics(categoria='cat1', db=db)
+
+    async def collect():
+        return [chunk async for chunk in response.body_iterator]
+
+    lines = asyncio.run(collect())
+    db.close()
+    assert response.media_type == 'application/x-ndjson'
+    assert [json.loads(line)['fecha'] for line in b''.join(lines).splitlines()] == [f'2023-05-0{day}' for day in range(1, 8)]
+
+def test_read_cache_hits_and_invalidation():
+    db = SessionLocal()
+    create_sample(db, email='o@example.com', cat='cat1')
+    assert crud.get_metrics(db, categoria='cat1') == crud.get_metrics(db, email=None, categoria='cat1')
+    stats = endpoints.cache_stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+    version = stats['version']
+
+    create_sample(db, email='p@example.com', cat='cat1')
+    assert len(crud.get_metrics(db, categoria='cat1')) == 2
+    crud.bulk_upsert_records(db, [dict(email='q@example.com', username='q', cat='cat1', division=None,
+                                       departamento=None, productividad=0.5, fecha=date(2023, 6, 1))])
+    assert set(endpoints.list_employees(db=db)) == {'o@example.com', 'p@example.com', 'q@example.com'}
+    stats = endpoints.cache_stats()
+    db.close()
+    assert (stats['hits'], stats['misses'], stats['version']) == (1, 3, version + 2)
+
+def test_writes_of_another_session_invalidate_the_cache():
+    reader = SessionLocal()
+    create_sample(reader, email='r@example.com')
+    assert crud.get_employees(reader) == ['r@example.com']
+    assert crud.get_employees(reader) == ['r@example.com']
+
+    # Another process (the pipeline loader, another worker) writes through its own session;
+    # the version it stores is all this process sees of it
+    writer = SessionLocal()
+    writer.execute(models.ProductivityRecord.__table__.insert().values(
+        email='s@example.com', username='s', cat='01', productividad=0.5, fecha=date(2023, 7, 1)))
+    crud.bump_data_version(writer)
+    writer.commit()
+    writer.close()
+
+    assert sorted(crud.get_employees(reader)) == ['r@example.com', 's@example.com']
+    stats = endpoints.cache_stats()
+    assert (stats['hits'], stats['misses'], stats['version']) == (1, 2, 2)
+    reader.close()
+
+def test_async_crud_matches_sync():
+    db = SessionLocal()
+    create_month(db)
+    expected = (crud.get_employees(db), crud.get_metrics(db, categoria='cat1'),
+                crud.get_distribution(db), crud.get_top_employees(db, limit=2))
+    db.close()
+    query_cache.clear()
+    session_factory = get_async_sessionmaker()
+
+    async def read():
+        async with session_factory() as adb:
+            result = (await crud_async.get_employees(adb), await crud_async.get_metrics(adb, categoria='cat1'),
+                      await crud_async.get_distribution(adb), await crud_async.get_top_employees(adb, limit=2))
+            summary = json_body(await endpoints_async.employee_summary('h@example.com', limite=1, db=adb))
+            with pytest.raises(HTTPException):
+                await endpoints_async.employee_summary('missing@example.com', accept='text/csv', db=adb)
+        await session_factory.kw['bind'].dispose()
+        return result, summary
+
+    result, summary = asyncio.run(read())
+    assert sorted(result[0]) == sorted(expected[0])
+    assert [(r.email, r.fecha) for r in result[1]] == [(r.email, r.fecha) for r in expected[1]]
+    assert result[2] == expected[2]
+    assert [r.email for r in result[3]] == [r.email for r in expected[3]]
+    assert [r['fecha'] for r in summary] == ['2023-03-01']
+
+def rollup_rows(db):
+    daily = sorted((r.fecha, r.cat, r.suma, r.registros) for r in db.query(models.DailyRollup))
+    monthly = sorted((r.mes, r.email, r.cat, r.suma, r.dias) for r in db.query(models.MonthlyRollup))
+    return daily, monthly
+
+def test_rollups_follow_writes_and_rebuild():
+    db = SessionLocal()
+    create_month(db)
+    crud.bulk_upsert_records(db, [dict(email='h@example.com', username='h', cat='cat1', division='div',
+                                       departamento='dep', productividad=0.2, fecha=date(2023, 3, 2))])
+    incremental = rollup_rows(db)
+    rollups.rebuild_rollups(db)
+    assert rollup_rows(db) == incremental
+    daily, monthly = incremental
+    assert (date(2023, 3, 2), 'cat1', pytest.approx(0.8), 2) in daily
+    assert (date(2023, 3, 1), 'h@example.com', 'cat1', pytest.approx(1.2), 2) in monthly
+    db.close()
+
+def test_aggregates_from_rollups_match_raw_records():
+    db = SessionLocal()
+    create_month(db)
+    # The whole month is answered from the monthly rollup, two days from the raw records
+    whole = crud.get_top_employees(db, limit=3, fecha_inicio=date(2023, 3, 1), fecha_fin=date(2023, 3, 31))
+    partial = crud.get_top_employees(db, limit=3, fecha_inicio=date(2023, 3, 1), fecha_fin=date(2023, 3, 2))
+    assert [(r.email, r.promedio) for r in whole] == [(r.email, pytest.approx(r.promedio)) for r in partial]
+    daily = crud.get_daily_averages(db, categoria='cat1')
+    assert [(r.fecha, r.empleados) for r in daily] == [(date(2023, 3, 1), 2), (date(2023, 3, 2), 2)]
+    assert daily[0].promedio == pytest.approx(0.7)
+    groups = endpoints.group_averages(agrupacion='categoria', filters=endpoints.aggregate_filters(), db=db)
+    assert [(r.grupo, r.registros) for r in groups] == [('cat1', 4), ('cat2', 2)]
+    assert groups[1].promedio == pytest.approx(0.2)
+    db.close()
+
+def read_body(response):
+    async def collect():
+        return b''.join([chunk async for chunk in response.body_iterator])
+    return asyncio.run(collect())
+
+def test_metrics_content_negotiation():
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.parquet as pq
+    db = SessionLocal()
+    create_month(db)
+    expected = [(r['email'], date.fromisoformat(r['fecha']), r['productividad'])
+                for r in json_body(endpoints.metrics(categoria='cat1', db=db))]
+
+    response = endpoints.metrics(categoria='cat1', accept='application/vnd.apache.arrow.stream', db=db)
+    assert response.media_type == 'application/vnd.apache.arrow.stream'
+    table = pa.ipc.open_stream(read_body(response)).read_all()
+    assert list(zip(*[table[c].to_pylist() for c in ('email', 'fecha', 'productividad')])) == expected
+
+    response = endpoints.employee_summary('h@example.com', accept='application/vnd.apache.parquet', db=db)
+    table = pq.read_table(pa.BufferReader(read_body(response)))
+    assert table.column_names == crud.METRIC_COLUMNS
+    assert table['productividad'].to_pylist() == [1.0, 0.8]
+
+    response = endpoints.export_metrics(categoria='cat2', accept='text/csv;q=0.9, */*', db=db)
+    lines = read_body(response).decode().splitlines()
+    assert lines[0] == ','.join(crud.METRIC_COLUMNS)
+    email = crud.METRIC_COLUMNS.index('email')
+    assert [line.split(',')[email] for line in lines[1:]] == ['j@example.com', 'j@example.com']
+    db.close()
+
+def test_negotiate_follows_q_values():
+    assert export.negotiate('application/json, text/csv;q=0.1') is None
+    assert export.negotiate('application/json;q=0.5, text/csv') == 'text/csv'
+    assert export.negotiate('text/csv;q=0.5, application/x-ndjson;q=0.8') == 'application/x-ndjson'
+    assert export.negotiate('text/csv, application/x-ndjson') == 'text/csv'
+    assert export.negotiate('text/csv;q=0') is None
+    assert export.negotiate('text/csv;q=abc') == 'text/csv'
+    assert export.negotiate('*/*') is None
+
+def test_json_rows_follow_the_productivity_schema():
+    db = SessionLocal()
+    create_sample(db, email='r@example.com', division=None, fecha=date(2023, 7, 1))
+    body = json_body(endpoints.metrics(email='r@example.com', db=db))
+    db.close()
+    assert set(body[0]) == set(schemas.Productivity.model_fields)
+    assert schemas.Productivity(**body[0]).division is None
+
+def test_coefficient_simulation_endpoint(tmp_path, monkeypatch):
+    import numpy as np
+    monkeypatch.setattr(whatif, 'SIGNALS_DIR', tmp_path)
+    with pytest.raises(HTTPException) as error:
+        endpoints.simulate_coefficients(schemas.WhatIfRequest(mes='2025-03'))
+    assert error.value.status_code == 404
+
+    signals = np.zeros((2, 1, 2), dtype=np.uint8)
+    signals[0, 0] = 1
+    np.savez(tmp_path / 'signals_2025-03.npz', signals=signals, present=np.ones((2, 1), dtype=bool),
+             emails=np.array(['a@example.com', 'b@example.com']), cats=np.array(['01', '02']),
+             dates=np.array(['2025-03-03']), signal_names=np.array(['Chat', 'VPN']),
+             profile_index=np.array([0, 0], dtype=np.int16), profile_names=np.array(['others']),
+             profile_sources=np.array(['']), coefficients=np.array([[0.25, 0.25]]))
+    result = endpoints.simulate_coefficients(schemas.WhatIfRequest(mes='2025-03', coeficientes={'others': {'Chat': 0.75}}))
+    result = schemas.WhatIfResult(**result)
+    assert result.promedio_base == 0.25 and result.promedio == 0.5
+    assert result.diario[0].fecha == date(2025, 3, 3)
+
+    with pytest.raises(HTTPException) as error:
+        endpoints.simulate_coefficients(schemas.WhatIfRequest(mes='2025-03', coeficientes={'others': {'Slack': 1}}))
+    assert error.value.status_code == 400
+
+
+def create_signal_month(db: Session):
+    # k and l in cat1 have signal bitmasks, m in cat2 was loaded without them
+    records = [dict(email=email, username=email[0], cat=cat, division='div', departamento='dep',
+                    productividad=0.5, fecha=date(2023, 4, day), senales=mask)
+               for email, cat, masks in [('k@example.com', 'cat1', (0b11, 0b01)),
+                                         ('l@example.com', 'cat1', (0b1000000001, 0)),
+                                         ('m@example.com', 'cat2', (None, None))]
+               for day, mask in enumerate(masks, start=1)]
+    crud.bulk_upsert_records(db, records)
+
+
+def test_signal_rates_from_the_monthly_rollup():
+    db = SessionLocal()
+    create_signal_month(db)
+    employee = endpoints.signal_rates(filters=endpoints.signal_filters(mes='2023-04', email='k@example.com'), db=db)
+    rates = {rate['senal']: rate['tasa'] for rate in employee['senales']}
+    assert list(rates) == list(models.SIGNAL_FIELDS)
+    assert (employee['empleados'], employee['dias']) == (1, 2)
+    assert rates['Sent emails'] == 1.0 and rates['Email last use'] == 0.5 and rates['VPN'] == 0.0
+
+    group = crud.get_signal_rates(db, mes=date(2023, 4, 1), categoria='cat1')
+    rates = {rate['senal']: rate['tasa'] for rate in group['senales']}
+    assert (group['empleados'], group['dias']) == (2, 4)
+    assert rates['Sent emails'] == 0.75 and rates['VPN'] == 0.25
+
+    # Records without signals are left out, and so is a month without any
+    assert crud.get_signal_rates(db, mes=date(2023, 4, 1), categoria='cat2') is None
+    with pytest.raises(HTTPException) as error:
+        endpoints.signal_rates(filters=endpoints.signal_filters(mes='2023-05'), db=db)
+    assert error.value.status_code == 404
+    db.close()
+
+
+def test_records_loaded_without_signals_keep_theirs():
+    db = SessionLocal()
+    create_signal_month(db)
+    crud.bulk_upsert_records(db, [dict(email='k@example.com', username='k', cat='cat1', division='div',
+                                       departamento='dep', productividad=0.9, fecha=date(2023, 4, 1))])
+    record = db.query(models.ProductivityRecord).filter_by(email='k@example.com', fecha=date(2023, 4, 1)).one()
+    assert (record.productividad, record.senales) == (0.9, 0b11)
+    db.close()
+
+
+def test_generic_upsert_fallback_keeps_the_stored_signals(monkeypatch):
+    monkeypatch.setattr(crud, '_upsert_statement', lambda db: None)
+    db = SessionLocal()
+    create_signal_month(db)
+    crud.bulk_upsert_records(db, [dict(email='k@example.com', username='k', cat='cat1', division='div',
+                                       departamento='dep', productividad=0.9, fecha=date(2023, 4, 1)),
+                                  dict(email='k@example.com', username='k', cat='cat1', division='div',
+                                       departamento='dep', productividad=0.9, fecha=date(2023, 4, 2), senales=0b100)])
+    records = db.query(models.ProductivityRecord).filter_by(email='k@example.com').order_by(models.ProductivityRecord.fecha)
+    assert [(record.productividad, record.senales) for record in records] == [(0.9, 0b11), (0.9, 0b100)]
+    db.close()
+
+
+def test_ensure_columns_upgrades_an_older_table():
+    with engine.begin() as connection:
+        connection.exec_driver_sql('ALTER TABLE productivity DROP COLUMN senales')
+        connection.exec_driver_sql('ALTER TABLE productivity_monthly DROP COLUMN vpn')
+    crud.ensure_columns(engine)
+    db = SessionLocal()
+    create_signal_month(db)
+    assert crud.get_signal_rates(db, mes=date(2023, 4, 1), email='l@example.com')['senales'][-1]['tasa'] == 0.5
+    db.close()
+
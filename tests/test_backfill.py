@@ -0,0 +1,82 @@
+import json
+import os
+import shutil
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+import backfill
+import main
+from data_processor import DataProcessor
+from stage_cache import StageCache
+from synthetic_data import generate_inputs
+
+MONTHS = [(2025, 1), (2025, 2)]
+
+
+@pytest.fixture(scope='module')
+def inputs(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('inputs')
+    params = main.load_parameters()
+    generate_inputs(directory, params['REQUIRED_FILES'], 2025, 1, employees=12, months=2)
+    return directory, params
+
+
+def test_month_range_and_monthly_names():
+    assert backfill.month_range('2024-11', '2025-02') == [(2024, 11), (2024, 12), (2025, 1), (2025, 2)]
+    assert backfill.monthly_file_name('Productividad_Google.xlsx', 2025, 3) == 'Productividad_Google_2025-03.xlsx'
+    with pytest.raises(ValueError):
+        backfill.month_range('2025-03', '2025-01')
+
+
+def test_shared_logs_are_the_process_stages_of_each_month(inputs, tmp_path):
+    directory, params = inputs
+    cache = StageCache(tmp_path / 'cache')
+    parsed = backfill.share_event_logs(directory, params, MONTHS, ['productivity'], cache, None)
+
+    assert set(parsed) == {'process_autodesk_by_day', 'process_meetings', 'process_chats', 'process_vpn'}
+    for year, month in MONTHS:
+        processor = DataProcessor(f"{directory}/", params['REQUIRED_FILES'], year, month, params['COEFFICIENTS'])
+        for stage, path in [('process_autodesk_by_day', processor.autodesk_path),
+                            ('process_meetings', processor.meetings_path),
+                            ('process_chats', processor.chats_source_path),
+                            ('process_vpn', processor.vpn_path)]:
+            cached = cache.get_or_compute(stage, [path], {'year': year, 'month': month},
+                                          lambda: pytest.fail(f'{stage} not shared'))
+            pd.testing.assert_frame_equal(cached, getattr(processor, stage)())
+
+    # A second backfill of the same months parses nothing again
+    assert backfill.share_event_logs(directory, params, MONTHS, ['productivity'], cache, None) == {}
+
+
+def test_backfill_writes_every_month_and_the_summary(inputs, tmp_path, monkeypatch):
+    directory, _ = inputs
+
+    class FolderConnector:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def download_files(self, names, destination):
+            found = [name for name in names if (directory / name).exists()]
+            for name in found:
+                shutil.copy(directory / name, destination / name)
+            return {name: destination / name for name in found}
+
+    monkeypatch.setattr(main, 'DriveConnector', FolderConnector)
+    monkeypatch.chdir(tmp_path)
+    assert backfill.main(['--start', '2025-01', '--end', '2025-03', '--no-cache']) is False
+
+    with open(backfill.SUMMARY_FILE, 'r', encoding='utf-8') as f:
+        summary = json.load(f)
+    months = summary['months']
+    # There is no productivity export of March, the other months still run
+    assert months['2025-03'] == {'status': 'invalid'}
+    for name in ['2025-01', '2025-02']:
+        assert months[name]['status'] == 'ok'
+        report = pd.read_excel(f'reporte_productividad_{name}.xlsx')
+        assert len(report) == 12
+        assert (tmp_path / backfill.MONTH_LOG_DIR / f'{name}.log').exists()
+    assert [stage['name'] for stage in summary['stages']] == ['download', 'validation', 'share_event_logs', 'months']
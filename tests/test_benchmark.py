@@ -0,0 +1,54 @@
+import json
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+from benchmark import STAGES, compare, run_benchmark
+from synthetic_data import generate_inputs
+
+PARAMS_PATH = os.path.join(os.path.dirname(__file__), '..', 'scripts', 'initial_parameters.json')
+
+
+def load_params():
+    with open(PARAMS_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_generate_inputs_writes_every_required_file(tmp_path):
+    params = load_params()
+    files = generate_inputs(tmp_path, params['REQUIRED_FILES'], 2025, 2, employees=20, days=4)
+
+    assert set(files) == set(params['REQUIRED_FILES'])
+    sheets = pd.read_excel(tmp_path / params['REQUIRED_FILES']['productivity']['name'], sheet_name=None)
+    assert list(sheets) == ['2025-02-01', '2025-02-02', '2025-02-03', '2025-02-04']
+    # The last day is the reference list and holds every employee
+    assert len(sheets['2025-02-04']) == 20
+    assert len(pd.read_csv(tmp_path / params['REQUIRED_FILES']['chats']['name'])) == files['chats']['rows']
+    meetings = pd.read_excel(tmp_path / params['REQUIRED_FILES']['meetings']['name'])
+    assert len(meetings) == files['meetings']['rows'] and meetings.notna().all().all()
+
+
+def test_run_benchmark_measures_every_stage():
+    result = run_benchmark(load_params(), employees=15, days=3)
+
+    assert [stage['name'] for stage in result['stages']] == STAGES
+    assert all(stage['wall_s'] >= 0 and stage['peak_alloc_mb'] is not None for stage in result['stages'])
+    stages = {stage['name']: stage for stage in result['stages']}
+    assert stages['get_results']['rows_out'] == 15
+    assert stages['process_vpn']['parent'] == 'calculate_productivity'
+    json.dumps(result)
+
+
+def test_compare_flags_slower_stages():
+    baseline = [{'name': 'clean_data', 'wall_s': 1.0}, {'name': 'get_results', 'wall_s': 1.0}]
+    stages = [{'name': 'clean_data', 'wall_s': 1.2}, {'name': 'get_results', 'wall_s': 1.5}]
+    assert compare(stages, baseline, 0.25) == ['get_results']
+
+
+def test_compare_reads_baselines_of_the_first_benchmark_schema():
+    baseline = [{'stage': 'clean_data', 'wall_s': 1.0, 'rows': 10}, {'stage': 'get_results', 'wall_s': 1.0}]
+    stages = [{'name': 'clean_data', 'wall_s': 1.5, 'rows_out': 10}, {'name': 'get_results', 'wall_s': 1.0}]
+    assert compare(stages, baseline, 0.25) == ['clean_data']
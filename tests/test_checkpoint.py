@@ -0,0 +1,86 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+import main
+from checkpoint import Checkpoint, sheet_fingerprints, update_productivity
+from data_processor import DataProcessor
+from productivity_data_cleaner import GoogleProductivityDataCleaner
+from synthetic_data import generate_inputs
+
+
+def write_workbook(file_path, sheets):
+    with pd.ExcelWriter(file_path, engine='xlsxwriter') as writer:
+        for name, values in sheets.items():
+            pd.DataFrame({'Usuario': values}).to_excel(writer, sheet_name=name, index=False)
+
+
+def test_sheet_fingerprints_detect_changed_sheets(tmp_path):
+    write_workbook(tmp_path / 'v1.xlsx', {'2025-03-01': [1, 2], '2025-03-02': [3]})
+    write_workbook(tmp_path / 'v2.xlsx', {'2025-03-01': [1, 2], '2025-03-02': [4], '2025-03-03': [5]})
+    v1 = sheet_fingerprints(tmp_path / 'v1.xlsx')
+    v2 = sheet_fingerprints(tmp_path / 'v2.xlsx')
+
+    assert list(v2) == ['2025-03-01', '2025-03-02', '2025-03-03']
+    assert v1['2025-03-01'] == v2['2025-03-01']
+    assert v1['2025-03-02'] != v2['2025-03-02']
+
+
+def test_checkpoint_keeps_processed_days(tmp_path):
+    checkpoint = Checkpoint(tmp_path, 2025, 3)
+    sheets = {'2025-03-01': 'a', '2025-03-02': 'b'}
+    assert checkpoint.stale_sheets(sheets) == ['2025-03-01', '2025-03-02']
+
+    frames = {name: pd.DataFrame({'Email': ['x@y.co'], 'Productivity': [0.5]}) for name in sheets}
+    checkpoint.save(sheets, {'2025-03-01': 'key1', '2025-03-02': 'key2'}, frames, frames)
+
+    reloaded = Checkpoint(tmp_path, 2025, 3)
+    assert reloaded.stale_sheets({'2025-03-01': 'a', '2025-03-02': 'changed', '2025-03-03': 'c'}) == ['2025-03-02', '2025-03-03']
+    assert reloaded.stale_days({'2025-03-01': 'key1', '2025-03-02': 'other'}) == ['2025-03-02']
+    pd.testing.assert_frame_equal(reloaded.load('productivity_by_day', ['2025-03-02'])['2025-03-02'], frames['2025-03-02'])
+
+
+def test_only_the_day_whose_events_changed_is_scored_again(tmp_path):
+    params = main.load_parameters()
+    required = params['REQUIRED_FILES']
+    generate_inputs(tmp_path / 'inputs', required, 2025, 3, employees=10, days=4)
+    path = f"{tmp_path / 'inputs'}/"
+    context = {'COEFFICIENTS': params['COEFFICIENTS'], 'EMAILS_TO_DELETE': params['EMAILS_TO_DELETE']}
+
+    def run():
+        cleaner = GoogleProductivityDataCleaner(path, required['productivity']['name'], 2025, 3,
+                                                params['EMAILS_TO_DELETE'])
+        processor = DataProcessor(path, required, 2025, 3, params['COEFFICIENTS'])
+        scored_days = []
+        calculate = processor.calculate_productivity
+
+        def spy(cleaned_data, *args):
+            scored_days.extend(cleaned_data)
+            return calculate(cleaned_data, *args)
+
+        processor.calculate_productivity = spy
+        productivity = update_productivity(Checkpoint(tmp_path / 'checkpoints', 2025, 3), cleaner, processor, context)
+        return scored_days, productivity, processor
+
+    assert run()[0] == ['2025-03-01', '2025-03-02', '2025-03-03', '2025-03-04']
+    assert run()[0] == []
+
+    # The chats of the 2nd change: a new actor writes that day and nobody else does
+    chats_path = tmp_path / 'inputs' / required['chats']['name']
+    chats = pd.read_csv(chats_path)
+    chats = chats[~chats['Fecha'].str.startswith('2025-03-02')]
+    chats.loc[len(chats)] = ['2025-03-02T09:00:00.000Z', 'empleado00001@ingetec.com.co']
+    chats.to_csv(chats_path, index=False)
+
+    scored_days, productivity, processor = run()
+    assert scored_days == ['2025-03-02']
+    # The result is the same as scoring the whole month again
+    cleaned = GoogleProductivityDataCleaner(path, required['productivity']['name'], 2025, 3,
+                                            params['EMAILS_TO_DELETE']).clean_data()
+    expected = DataProcessor(path, required, 2025, 3, params['COEFFICIENTS']).calculate_productivity(cleaned)
+    assert list(productivity) == list(expected)
+    for name in expected:
+        pd.testing.assert_frame_equal(productivity[name].reset_index(drop=True), expected[name], check_categorical=False)
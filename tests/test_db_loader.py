@@ -0,0 +1,77 @@
+import os
+import sys
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test.db')
+
+from app import models
+from db_loader import DatabaseLoader, results_to_records
+from scoring_engine import SIGNAL_COLUMNS
+
+
+def test_results_to_records_attach_the_signal_bitmasks():
+    results = pd.DataFrame({'Email': ['a@x.co', 'b@x.co'], 'Username': ['a', None], 'Cat': ['01', '07'],
+                            'División': ['div', None], 'Departamento': ['dep', 'dep'],
+                            '01': [0.5, np.nan], '02': [0.8, 0.2]})
+    signals = pd.DataFrame({'Email': ['a@x.co', 'a@x.co'], 'fecha': [date(2025, 3, 1), date(2025, 3, 2)],
+                            'senales': np.array([3, 512], dtype=np.uint16)})
+
+    records = results_to_records(results, 2025, 3, signals)
+    by_key = {(record['email'], record['fecha']): record for record in records}
+    assert len(records) == 3
+    assert by_key[('a@x.co', date(2025, 3, 2))]['senales'] == 512
+    assert type(by_key[('a@x.co', date(2025, 3, 1))]['senales']) is int
+    # b was not scored in this run, its bitmask is left as stored
+    assert by_key[('b@x.co', date(2025, 3, 2))]['senales'] is None
+    assert by_key[('b@x.co', date(2025, 3, 2))]['division'] is None
+
+    assert all(record['senales'] is None for record in results_to_records(results, 2025, 3))
+
+
+# The productivity table as the first version of the API created it
+BASELINE_DDL = [
+    'CREATE TABLE productivity (id INTEGER NOT NULL, email VARCHAR NOT NULL, username VARCHAR NOT NULL, '
+    'cat VARCHAR NOT NULL, division VARCHAR, departamento VARCHAR, productividad FLOAT NOT NULL, '
+    'fecha DATE NOT NULL, PRIMARY KEY (id))',
+    'CREATE INDEX ix_productivity_id ON productivity (id)',
+    'CREATE INDEX ix_productivity_email ON productivity (email)',
+]
+
+
+def test_load_into_a_table_created_by_the_first_schema():
+    from app.database import Base, SessionLocal, engine
+
+    engine.dispose()
+    Base.metadata.drop_all(bind=engine)
+    try:
+        with engine.begin() as connection:
+            for statement in BASELINE_DDL:
+                connection.exec_driver_sql(statement)
+            # The same employee and day loaded twice, which nothing prevented then
+            for record_id, productivity in [(1, 0.1), (2, 0.4)]:
+                connection.exec_driver_sql(
+                    "INSERT INTO productivity VALUES (?, 'a@x.co', 'a', '01', 'div', 'dep', ?, '2025-03-01')",
+                    (record_id, productivity))
+
+        results = pd.DataFrame({'Email': ['a@x.co'], 'Username': ['a'], 'Cat': ['01'], 'División': ['div'],
+                                'Departamento': ['dep'], '01': [0.5], '02': [0.8]})
+        assert DatabaseLoader().load(results, 2025, 3) == 2
+        assert DatabaseLoader().load(results.assign(**{'02': 0.9}), 2025, 3) == 2
+
+        with SessionLocal() as db:
+            rows = db.query(models.ProductivityRecord).order_by(models.ProductivityRecord.fecha).all()
+            assert [(row.id, row.fecha, row.productividad) for row in rows] == [
+                (2, date(2025, 3, 1), 0.5), (3, date(2025, 3, 2), 0.9)]
+    finally:
+        engine.dispose()
+        Base.metadata.drop_all(bind=engine)
+
+
+def test_signal_fields_follow_the_bit_order_of_the_pipeline():
+    # Bit i of senales is SIGNAL_COLUMNS[i], the rollup columns read them in this order
+    assert list(models.SIGNAL_FIELDS) == SIGNAL_COLUMNS
@@ -0,0 +1,81 @@
+import logging
+import os
+import socket
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+from drive_connector import DriveConnector, is_retryable
+from fake_drive import FakeDriveService
+
+FILES = {
+    'Autodesk.xlsx': b'autodesk' * 100,
+    'Meetings.xlsx': b'meetings' * 50,
+    'chats_source.csv': b'Fecha,Actor\n',
+    'VPN.csv': b'',
+    'other.txt': b'not required',
+}
+
+
+def make_connector(service, tmp_path, **kwargs):
+    return DriveConnector(logging.getLogger('test'), tmp_path / 'credentials.json', 'folder',
+                          cache_dir=tmp_path / 'cache', chunk_size=64, backoff=0, service=service, **kwargs)
+
+
+def test_list_files_follows_all_pages(tmp_path):
+    service = FakeDriveService(FILES, page_size=2)
+    files = make_connector(service, tmp_path).list_files('folder')
+    assert set(files) == set(FILES)
+    assert service.list_calls == 3
+
+
+def test_download_files_in_chunks(tmp_path):
+    service = FakeDriveService(FILES)
+    required = ['Autodesk.xlsx', 'Meetings.xlsx', 'chats_source.csv', 'missing.csv']
+    paths = make_connector(service, tmp_path).download_files(required, tmp_path / 'out')
+
+    assert set(paths) == {'Autodesk.xlsx', 'Meetings.xlsx', 'chats_source.csv'}
+    for name, path in paths.items():
+        assert path.read_bytes() == FILES[name]
+    # 800 bytes in chunks of 64 bytes
+    assert len([r for r in service.requested_ranges if r[0] == 'id0']) == 13
+
+
+def test_download_retries_transport_errors(tmp_path):
+    service = FakeDriveService(FILES)
+    service.failures['id1'] = 2
+    paths = make_connector(service, tmp_path).download_files(['Meetings.xlsx'], tmp_path / 'out')
+    assert paths['Meetings.xlsx'].read_bytes() == FILES['Meetings.xlsx']
+
+
+def test_a_failing_file_is_retried_only_per_chunk(tmp_path):
+    service = FakeDriveService(FILES)
+    service.failures['id1'] = 10
+    with pytest.raises(ConnectionError):
+        make_connector(service, tmp_path, retries=2).download_files(['Meetings.xlsx'], tmp_path / 'out')
+    # The first attempt and 2 retries of the first chunk, not retries of retries
+    assert service.failures['id1'] == 7
+    assert not (tmp_path / 'out' / 'Meetings.xlsx').exists()
+
+
+def test_only_transport_errors_are_retryable():
+    assert is_retryable(socket.timeout()) and is_retryable(ConnectionResetError())
+    assert not is_retryable(PermissionError('denied'))
+    assert not is_retryable(OSError(28, 'No space left on device'))
+    assert not is_retryable(IOError('Checksum mismatch for Meetings.xlsx'))
+
+
+def test_unchanged_files_come_from_cache(tmp_path):
+    service = FakeDriveService(FILES)
+    required = ['Autodesk.xlsx', 'Meetings.xlsx']
+    make_connector(service, tmp_path).download_files(required, tmp_path / 'run1')
+    assert sorted(service.media_requests) == ['id0', 'id1']
+
+    service.set_file('Meetings.xlsx', b'updated meetings')
+    paths = make_connector(service, tmp_path).download_files(required, tmp_path / 'run2')
+
+    assert sorted(service.media_requests) == ['id0', 'id1', 'id1']
+    assert paths['Autodesk.xlsx'].read_bytes() == FILES['Autodesk.xlsx']
+    assert paths['Meetings.xlsx'].read_bytes() == b'updated meetings'
@@ -0,0 +1,65 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+from event_aggregator import (aggregate_chats, aggregate_meetings, aggregate_vpn, day_codes, read_chats,
+                              read_vpn, traffic_mb)
+
+DAYS = ['2025-03-01', '2025-03-02', '2025-03-03']
+
+
+def chunks(df, size):
+    return [df.iloc[start:start + size] for start in range(0, len(df), size)]
+
+
+def test_day_codes_match_prefixes_and_fall_back_to_the_format():
+    dates = pd.Series(['2025-03-02T10:00:00.000Z', '2025-04-01T00:00:00Z', None, '2025-03-01'])
+    assert day_codes(dates, DAYS).tolist() == [1, -1, -1, 0]
+    assert day_codes(pd.Series(['03/03/2025', '3/3/2025', 'x']), ['01/03/2025', '03/03/2025'], '%d/%m/%Y').tolist() == [1, 1, -1]
+
+
+def test_chats_are_flags_per_actor_and_active_day(tmp_path):
+    path = tmp_path / 'chats.csv'
+    pd.DataFrame({
+        'Fecha': ['2025-03-01T08:00:00Z', '2025-03-01T09:00:00Z', '2025-03-03T10:00:00Z', '2025-02-28T10:00:00Z'],
+        'Actor': ['b@ingetec.com.co', 'b@ingetec.com.co', 'a@ingetec.com.co', 'a@ingetec.com.co'],
+    }).to_csv(path, index=False)
+
+    df = aggregate_chats(read_chats(str(path), chunk_size=1), DAYS)
+    assert list(df.columns) == ['Email', '2025-03-01', '2025-03-03']
+    assert df.to_dict('list') == {'Email': ['a@ingetec.com.co', 'b@ingetec.com.co'],
+                                  '2025-03-01': [0, 1], '2025-03-03': [1, 0]}
+
+
+def test_meetings_count_distinct_meetings_across_chunks():
+    df = pd.DataFrame({
+        'Fecha': ['2025-03-01T08:00:00Z', '2025-03-01T15:00:00Z', '2025-03-01T09:00:00Z', '2025-03-02T09:00:00Z',
+                  '2025-03-01T09:00:00Z'],
+        'Actor': ['a@ingetec.com.co', 'a@ingetec.com.co', 'a@ingetec.com.co', 'a@ingetec.com.co', 'guest@gmail.com'],
+        'Código de reunión': ['m1', 'm1', 'm2', 'm1', 'm1'],
+    })
+    result = aggregate_meetings(chunks(df, 2), DAYS)
+    assert result.to_dict('list') == {'Email': ['a@ingetec.com.co'], '2025-03-01': [2], '2025-03-02': [1]}
+
+
+def test_traffic_is_converted_to_mb():
+    traffic = pd.Series(['2 GB', '3.5 MB', '512 KB', '7 TB', None])
+    np.testing.assert_allclose(traffic_mb(traffic), [2048, 3.5, 0.5, 0, 0])
+
+
+def test_vpn_sums_traffic_per_user_and_day(tmp_path):
+    path = tmp_path / 'vpn.csv'
+    pd.DataFrame({
+        'Usuario': ['Ana', 'ana', 'luis', 'luis'],
+        'IP': ['10.0.0.1'] * 4,
+        'Tráfico de salida': ['3 MB', '4 MB', '1 MB', '1 GB'],
+        'Fecha': ['01/03/2025', '01/03/2025', '02/03/2025', '15/02/2025'],
+    }).to_csv(path, index=False)
+
+    df = aggregate_vpn(read_vpn(str(path), chunk_size=3), DAYS)
+    assert df.to_dict('list') == {'Email': ['ana@ingetec.com.co', 'luis@ingetec.com.co'],
+                                  '2025-03-01': [1.0, 0.0], '2025-03-02': [0.0, 1.0], '2025-03-03': [0.0, 0.0]}
@@ -0,0 +1,104 @@
+import logging
+import os
+import sys
+import zipfile
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+import file_validator
+from file_validator import FileValidator, probe_headers
+from stage_cache import StageCache
+
+FILES = [
+    {"name": "Productividad_Google.xlsx", "format": "xlsx", "columns": [], "sheets": {"*": {"min_columns": 3}}},
+    {"name": "Autodesk.xlsx", "format": "xlsx", "columns": [],
+     "sheets": {"Uso": {"columns": ["email", "day_used"]}, "Autodesk users": {"columns": ["Email"]}}},
+    {"name": "chats_source.csv", "format": "csv", "columns": ["Fecha", "Actor"]},
+]
+
+
+def write_inputs(folder, short_day=False, autodesk_users=True):
+    with pd.ExcelWriter(folder / 'Productividad_Google.xlsx', engine='openpyxl') as writer:
+        for day in ['2025-03-01', '2025-03-02']:
+            columns = ['Usuario', 'A'] if short_day and day == '2025-03-02' else ['Usuario', 'A', 'B']
+            pd.DataFrame([[f'x{index}' for index in range(len(columns))]], columns=columns).to_excel(
+                writer, sheet_name=day, index=False)
+    with pd.ExcelWriter(folder / 'Autodesk.xlsx', engine='openpyxl') as writer:
+        pd.DataFrame({'producto': ['Revit'], 'email': ['a@x.com'], 'day_used': ['2025-03-01']}).to_excel(
+            writer, sheet_name='Uso', index=False)
+        if autodesk_users:
+            pd.DataFrame({'Email': ['a@x.com']}).to_excel(writer, sheet_name='Autodesk users', index=False)
+    pd.DataFrame({'Fecha': ['2025-03-01'], 'Actor': ['a@x.com']}).to_csv(folder / 'chats_source.csv', index=False)
+
+
+def test_probe_reads_the_header_of_every_sheet(tmp_path):
+    write_inputs(tmp_path, short_day=True)
+    assert probe_headers(tmp_path / 'Productividad_Google.xlsx', 'xlsx') == {
+        '2025-03-01': ['Usuario', 'A', 'B'], '2025-03-02': ['Usuario', 'A']}
+    assert probe_headers(tmp_path / 'Autodesk.xlsx', 'xlsx')['Uso'] == ['producto', 'email', 'day_used']
+    assert probe_headers(tmp_path / 'chats_source.csv', 'csv') == {'': ['Fecha', 'Actor']}
+
+
+def write_raw_xlsx(path, row, shared_strings):
+    # Minimal workbook with the XML given, as other writers than openpyxl produce it
+    main = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    relationships = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('xl/_rels/workbook.xml.rels',
+                         '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                         '<Relationship Id="rId1" Target="worksheets/sheet1.xml"/></Relationships>')
+        archive.writestr('xl/workbook.xml', f'<workbook {main} {relationships}><sheets>'
+                                            '<sheet name="Uso" sheetId="1" r:id="rId1"/></sheets></workbook>')
+        archive.writestr('xl/worksheets/sheet1.xml', f'<worksheet {main}><sheetData>{row}</sheetData></worksheet>')
+        archive.writestr('xl/sharedStrings.xml', f'<sst {main}>{shared_strings}</sst>')
+
+
+def test_probe_skips_phonetic_runs_and_numbers_cells_without_reference(tmp_path):
+    write_raw_xlsx(tmp_path / 'raw.xlsx',
+                   '<row><c t="s"><v>0</v></c><c t="s"><v>1</v></c><c t="inlineStr"><is><t>day_used</t></is></c></row>',
+                   '<si><t>Email</t><rPh sb="0" eb="1"><t>x</t></rPh></si>'
+                   '<si><r><t>pro</t></r><r><t>ducto</t></r></si>')
+    assert probe_headers(tmp_path / 'raw.xlsx', 'xlsx') == {'Uso': ['Email', 'producto', 'day_used']}
+
+
+def test_identical_files_are_probed_together(tmp_path):
+    write_inputs(tmp_path)
+    (tmp_path / 'copia.csv').write_bytes((tmp_path / 'chats_source.csv').read_bytes())
+    files = FILES + [{"name": "copia.csv", "format": "csv", "columns": ["Fecha", "Actor"]}]
+    for _ in range(2):
+        validator = FileValidator(files, logging.getLogger('test'), StageCache(tmp_path / 'cache'))
+        assert all(validator.check_columns(tmp_path).values())
+        assert len(validator._probes) == 3
+
+
+@pytest.mark.parametrize('inputs, valid', [
+    ({}, True),
+    ({'short_day': True}, False),
+    ({'autodesk_users': False}, False),
+])
+def test_every_relevant_sheet_is_checked(tmp_path, inputs, valid):
+    write_inputs(tmp_path, **inputs)
+    checks = FileValidator(FILES, logging.getLogger('test')).check_columns(tmp_path)
+    assert all(checks.values()) == valid
+
+
+def test_probes_are_reused_while_the_file_does_not_change(tmp_path, monkeypatch):
+    write_inputs(tmp_path)
+    cache = StageCache(tmp_path / 'cache')
+    assert FileValidator(FILES, logging.getLogger('test'), cache).validate_files(tmp_path)
+
+    probed = []
+    monkeypatch.setattr(file_validator, '_xlsx_headers', lambda path: probed.append(path) or {})
+    assert FileValidator(FILES, logging.getLogger('test'), StageCache(tmp_path / 'cache')).validate_files(tmp_path)
+    assert probed == []
+
+    # openpyxl stamps the time in every workbook, only the productivity one may change
+    unchanged = {path: path.read_bytes() for path in tmp_path.glob('*.*') if path.name != 'Productividad_Google.xlsx'}
+    write_inputs(tmp_path, short_day=True)
+    for path, content in unchanged.items():
+        path.write_bytes(content)
+    FileValidator(FILES, logging.getLogger('test'), StageCache(tmp_path / 'cache')).check_columns(tmp_path)
+    assert probed == [tmp_path / 'Productividad_Google.xlsx']
@@ -0,0 +1,54 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+from instrumentation import Instrumentation
+
+
+def test_nested_stages_keep_the_peak_of_their_children(tmp_path):
+    instrumentation = Instrumentation(trace_memory=True)
+    with instrumentation.stage('outer', rows_in=3) as outer:
+        with instrumentation.stage('inner') as inner:
+            block = np.ones(4_000_000)
+            inner.rows_out = len(block)
+            del block
+        outer.rows_out = 1
+
+    stages = {stage.name: stage for stage in instrumentation.stages}
+    assert [stage.name for stage in instrumentation.stages] == ['outer', 'inner']
+    assert stages['inner'].parent == 'outer'
+    assert stages['inner'].peak_alloc_mb >= 30
+    assert stages['outer'].peak_alloc_mb >= stages['inner'].peak_alloc_mb
+
+    summary = json.loads(instrumentation.write_summary(tmp_path / 'run_summary.json').read_text())
+    assert summary['total_wall_s'] == stages['outer'].wall_s
+    assert summary['stages'][1]['rows_out'] == 4_000_000
+
+
+def test_failed_stage_is_recorded():
+    instrumentation = Instrumentation()
+    with pytest.raises(ValueError):
+        with instrumentation.stage('broken'):
+            raise ValueError('bad input')
+    assert instrumentation.stages[0].status == 'error'
+    assert instrumentation.stages[0].wall_s is not None
+
+
+def test_disabled_instrumentation_records_nothing():
+    instrumentation = Instrumentation(enabled=False)
+    with instrumentation.stage('ignored') as stage:
+        stage.rows_out = 1
+    assert instrumentation.stages == []
+
+
+def test_profiler_lists_hot_functions():
+    instrumentation = Instrumentation()
+    with instrumentation.profiler(top=5):
+        sorted(np.random.default_rng(0).random(10000).tolist())
+    assert 0 < len(instrumentation.profile) <= 5
+    assert {'function', 'calls', 'total_s', 'cumulative_s'} <= set(instrumentation.profile[0])
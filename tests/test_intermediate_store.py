@@ -0,0 +1,98 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+import main
+from data_processor import DataProcessor
+from intermediate_store import IntermediateStore
+from productivity_data_cleaner import GoogleProductivityDataCleaner
+from synthetic_data import generate_inputs
+
+
+def sheet(values):
+    return pd.DataFrame({'Email': [f'{value}@x.co' for value in values], 'Sent emails': values})
+
+
+@pytest.mark.parametrize('file_format', ['parquet', 'feather'])
+def test_dump_and_load_round_trip(tmp_path, file_format):
+    store = IntermediateStore(tmp_path, file_format)
+    frames = {'2025-03-02': sheet([3, 4]), '2025-03-01': sheet([1, 2])}
+    store.dump('data_cleaned', frames)
+
+    loaded = store.load('data_cleaned')
+    # Sheets come back in the order they were dumped
+    assert list(loaded) == ['2025-03-02', '2025-03-01']
+    for name, df in frames.items():
+        pd.testing.assert_frame_equal(loaded[name], df)
+    assert list(store.load('data_cleaned', ['2025-03-02'])) == ['2025-03-02']
+
+
+def test_dump_without_replace_adds_to_the_stored_sheets(tmp_path):
+    store = IntermediateStore(tmp_path)
+    store.dump('data_cleaned', {'2025-03-01': sheet([1]), '2025-03-02': sheet([2])})
+    store.dump('data_cleaned', {'2025-03-02': sheet([5]), '2025-03-03': sheet([3])}, replace=False)
+    loaded = store.load('data_cleaned')
+    assert list(loaded) == ['2025-03-01', '2025-03-02', '2025-03-03']
+    assert loaded['2025-03-02']['Sent emails'].tolist() == [5]
+
+    store.dump('data_cleaned', {'2025-03-04': sheet([4])})
+    assert list(store.load('data_cleaned')) == ['2025-03-04']
+
+
+def test_sheets_without_zero_padding_keep_their_date_order(tmp_path):
+    store = IntermediateStore(tmp_path)
+    names = ['2025-3-1', '2025-3-2', '2025-3-10']
+    store.dump('data_cleaned', {name: sheet([index]) for index, name in enumerate(names)})
+    assert list(store.load('data_cleaned')) == names
+
+    # Stages dumped before the sheet list was kept are read in date order
+    (tmp_path / 'data_cleaned' / 'sheets.json').unlink()
+    assert list(store.load('data_cleaned')) == names
+
+
+def test_unknown_format_and_missing_stage(tmp_path):
+    with pytest.raises(ValueError):
+        IntermediateStore(tmp_path, 'xlsx')
+    with pytest.raises(FileNotFoundError):
+        IntermediateStore(tmp_path).load('productivity_by_day')
+
+
+def test_cleaned_sheets_are_handed_over_in_memory(tmp_path, monkeypatch):
+    params = main.load_parameters()
+    required = params['REQUIRED_FILES']
+    generate_inputs(tmp_path, required, 2025, 3, employees=8, days=3)
+    monkeypatch.chdir(tmp_path)
+    path = f'{tmp_path}/'
+
+    cleaned = GoogleProductivityDataCleaner(path, required['productivity']['name'], 2025, 3,
+                                            params['EMAILS_TO_DELETE']).clean_data()
+    processor = DataProcessor(path, required, 2025, 3, params['COEFFICIENTS'])
+    productivity_by_day = processor.calculate_productivity(cleaned)
+
+    # Nothing was written between the stages
+    assert not list(tmp_path.rglob('data_cleaned*'))
+    assert list(productivity_by_day) == list(cleaned)
+    assert len(processor.get_results(productivity_by_day)) == 8
+
+
+def test_calculate_productivity_reads_the_store_without_cleaned_data(tmp_path):
+    params = main.load_parameters()
+    required = params['REQUIRED_FILES']
+    generate_inputs(tmp_path / 'inputs', required, 2025, 3, employees=8, days=3)
+    path = f'{tmp_path / "inputs"}/'
+    store = IntermediateStore(tmp_path / 'dump')
+
+    cleaned = GoogleProductivityDataCleaner(path, required['productivity']['name'], 2025, 3,
+                                            params['EMAILS_TO_DELETE'], store=store).clean_data()
+    in_memory = DataProcessor(path, required, 2025, 3, params['COEFFICIENTS']).calculate_productivity(cleaned)
+    from_store = DataProcessor(path, required, 2025, 3, params['COEFFICIENTS'], store=store).calculate_productivity()
+
+    assert list(from_store) == list(in_memory)
+    for name in in_memory:
+        pd.testing.assert_frame_equal(from_store[name], in_memory[name])
+    with pytest.raises(ValueError):
+        DataProcessor(path, required, 2025, 3, params['COEFFICIENTS']).calculate_productivity()
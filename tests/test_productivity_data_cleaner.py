@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+import main
+from productivity_data_cleaner import GoogleProductivityDataCleaner
+from synthetic_data import generate_inputs
+
+
+def test_parallel_cleaning_matches_serial(tmp_path):
+    params = main.load_parameters()
+    name = params['REQUIRED_FILES']['productivity']['name']
+    generate_inputs(tmp_path, params['REQUIRED_FILES'], 2025, 3, employees=15, days=5)
+
+    def clean(workers):
+        return GoogleProductivityDataCleaner(f'{tmp_path}/', name, 2025, 3, params['EMAILS_TO_DELETE'],
+                                             workers=workers).clean_data()
+
+    serial, parallel = clean(1), clean(2)
+    assert list(parallel) == list(serial) == ['2025-03-01', '2025-03-02', '2025-03-03', '2025-03-04', '2025-03-05']
+    for sheet_name in serial:
+        pd.testing.assert_frame_equal(parallel[sheet_name], serial[sheet_name], check_exact=True)
@@ -0,0 +1,61 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+from profile_engine import DEFAULT_PROFILES, assign_profiles, coefficient_matrix
+
+COLUMNS = ['Chat', 'Autodesk']
+COEFFICIENTS = {
+    'productivity_coefficients_modelers': {'Chat': 0.1, 'Autodesk': 0.5},
+    'productivity_coefficients_cat12345': {'Chat': 0.2, 'Autodesk': 0.1},
+    'productivity_coefficients_others': {'Chat': 0.3, 'Autodesk': 0.0},
+}
+
+
+@pytest.fixture
+def employees():
+    return pd.DataFrame({
+        'Email': ['a@ingetec.com.co', 'b@ingetec.com.co', 'c@ingetec.com.co', 'd@ingetec.com.co'],
+        'Cat': ['01', '07', '07', 'AA'],
+        'División': ['Norte', 'Norte', 'Sur', None],
+        'Departamento': ['Civil', 'Civil', 'Hidráulica', None],
+    })
+
+
+def test_default_profiles_keep_the_previous_priorities(employees):
+    # a is both in category 01 and an Autodesk user: the category wins
+    lists = {'autodesk_users': {'a@ingetec.com.co', 'b@ingetec.com.co'}}
+    df = coefficient_matrix(employees, DEFAULT_PROFILES, COEFFICIENTS, COLUMNS, lists)
+
+    assert df['Profile'].tolist() == ['cat12345', 'modelers', 'others', 'others']
+    assert df['Autodesk'].tolist() == [0.1, 0.5, 0.0, 0.0]
+    assert list(df.columns) == ['Email', 'Cat'] + COLUMNS + ['Profile']
+
+
+def test_rules_combine_columns_and_inline_coefficients(employees):
+    profiles = [
+        {'name': 'hidraulica_sur', 'coefficients': {'Chat': 0.9, 'Autodesk': 0.9},
+         'rules': {'División': 'Sur', 'Departamento': ['Hidráulica']}},
+        {'name': 'norte_07', 'coefficients': 'productivity_coefficients_modelers',
+         'rules': {'División': ['Norte'], 'Cat': ['07']}},
+        {'name': 'others', 'coefficients': 'productivity_coefficients_others'},
+    ]
+    assert assign_profiles(employees, profiles, {}).tolist() == [2, 1, 0, 2]
+
+
+def test_invalid_profiles_are_rejected(employees):
+    with pytest.raises(ValueError, match='match no profile'):
+        assign_profiles(employees, [{'name': 'cat01', 'coefficients': {}, 'rules': {'Cat': '01'}}], {})
+    with pytest.raises(ValueError, match='Unknown profile rule'):
+        assign_profiles(employees, [{'name': 'x', 'coefficients': {}, 'rules': {'Sede': 'Bogotá'}}], {})
+    with pytest.raises(ValueError, match='unknown coefficients'):
+        coefficient_matrix(employees, [{'name': 'x', 'coefficients': 'missing'}], COEFFICIENTS, COLUMNS, {})
+    with pytest.raises(ValueError, match='Duplicate profile name'):
+        coefficient_matrix(employees, [{'name': 'x', 'coefficients': 'productivity_coefficients_modelers',
+                                        'rules': {'Cat': '01'}},
+                                       {'name': 'x', 'coefficients': 'productivity_coefficients_others'}],
+                           COEFFICIENTS, COLUMNS, {})
@@ -0,0 +1,70 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+import xlsxwriter
+
+from report_generator import RESULTS_SHEET, ReportGenerator, summary_sheets, write_frame
+
+
+def results():
+    return pd.DataFrame({
+        'Email': ['a@x.com', 'b@x.com', 'c@x.com'],
+        'Username': ['a', 'b', 'c'],
+        'Cat': ['01', '01', '08'],
+        'División': ['D1', None, 'D1'],
+        'Departamento': ['P', 'P', 'Q'],
+        '01': [1.0, 0.2, np.nan],
+        '02': [0.5, np.nan, 0.1],
+    })
+
+
+def test_summary_sheets():
+    sheets = summary_sheets(results())
+
+    by_cat = sheets['Por Cat'].set_index('Cat')
+    assert by_cat.loc['01', 'Empleados'] == 2 and by_cat.loc['01', 'Registros'] == 3
+    assert by_cat.loc['01', 'Promedio'] == pytest.approx((1.0 + 0.5 + 0.2) / 3)
+    assert list(sheets['Por División']['División']) == ['', 'D1']
+    assert sheets['Promedio diario']['Promedio'].tolist() == pytest.approx([0.6, 0.3])
+    assert sheets['Baja conectividad']['Email'].tolist() == ['c@x.com', 'b@x.com']
+
+
+@pytest.mark.parametrize('engine', ['xlsxwriter', 'openpyxl'])
+def test_save_report_writes_every_sheet_and_twin(tmp_path, engine):
+    path = tmp_path / 'reporte_productividad_2025-03.xlsx'
+    ReportGenerator(engine=engine, twins=['csv', 'parquet']).save_report(results(), path)
+
+    sheets = pd.read_excel(path, sheet_name=None, dtype={'Cat': str})
+    assert list(sheets) == [RESULTS_SHEET, 'Por Cat', 'Por División', 'Por Departamento',
+                            'Promedio diario', 'Baja conectividad']
+    pd.testing.assert_frame_equal(sheets[RESULTS_SHEET], results())
+    pd.testing.assert_frame_equal(pd.read_parquet(path.with_suffix('.parquet')), results())
+    assert path.with_suffix('.csv').read_text().splitlines()[0] == 'Email,Username,Cat,División,Departamento,01,02'
+
+
+def test_text_is_never_written_as_a_formula(tmp_path):
+    df = results().assign(Username=['a', '=b', 'c'])
+    ReportGenerator(summaries=False).save_report(df, tmp_path / 'report.xlsx')
+    assert pd.read_excel(tmp_path / 'report.xlsx')['Username'].tolist() == ['a', '=b', 'c']
+
+
+def test_write_frame_keeps_dates_and_leaves_missing_cells_empty(tmp_path):
+    df = pd.DataFrame({'day_used': pd.to_datetime(['2025-03-01 08:30', None, '2025-03-02 17:00']),
+                       'minutos': [10, np.nan, 20]})
+    workbook = xlsxwriter.Workbook(str(tmp_path / 'frame.xlsx'), {'constant_memory': True})
+    write_frame(workbook, 'Uso', df)
+    workbook.close()
+    pd.testing.assert_frame_equal(pd.read_excel(tmp_path / 'frame.xlsx', sheet_name='Uso'), df)
+
+
+def test_unknown_formats_are_rejected():
+    with pytest.raises(ValueError):
+        ReportGenerator(engine='xlwt')
+    with pytest.raises(ValueError):
+        ReportGenerator(twins=['json'])
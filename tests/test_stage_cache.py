@@ -0,0 +1,84 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+pytest.importorskip('pyarrow')
+
+from stage_cache import StageCache
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'chats.csv'
+    path.write_text('Fecha,Actor\n2025-03-01,a@x.co\n')
+    return path
+
+
+def counting(output):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return output
+    return compute, calls
+
+
+def test_hit_until_the_input_or_its_parameters_change(tmp_path, source):
+    cache = StageCache(tmp_path / 'cache')
+    compute, calls = counting(pd.DataFrame({'Email': ['a@x.co'], '2025-03-01': [1]}))
+
+    first = cache.get_or_compute('process_chats', [source], {'month': 3}, compute)
+    second = cache.get_or_compute('process_chats', [source], {'month': 3}, compute)
+    pd.testing.assert_frame_equal(first, second)
+    assert len(calls) == 1
+
+    cache.get_or_compute('process_chats', [source], {'month': 4}, compute)
+    source.write_text('Fecha,Actor\n2025-03-02,b@x.co\n')
+    cache.get_or_compute('process_chats', [source], {'month': 3}, compute)
+    assert len(calls) == 3
+
+
+def test_dicts_of_frames_keep_their_names_and_order(tmp_path, source):
+    cache = StageCache(tmp_path / 'cache')
+    sheets = {'2025-03-10': pd.DataFrame({'Email': ['a']}), '2025-03-02': pd.DataFrame({'Email': ['b']})}
+    cache.get_or_compute('clean_data', [source], {}, lambda: sheets)
+
+    cached = cache.get_or_compute('clean_data', [source], {}, lambda: pytest.fail('should be cached'))
+    assert list(cached) == ['2025-03-10', '2025-03-02']
+    assert cached['2025-03-02']['Email'].tolist() == ['b']
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, source):
+    cache = StageCache(tmp_path / 'cache')
+    frame = pd.DataFrame({'value': range(1000)})
+    for month in range(3):
+        cache.get_or_compute('stage', [source], {'month': month}, lambda: frame)
+    entries = cache.entries()
+    assert len(entries) == 3
+    # The first entry was used last
+    for age, (_, _, path) in zip([3000, 1000, 2000], entries):
+        os.utime(path / 'manifest.json', (age, age))
+
+    newest, oldest, middle = [path for _, _, path in entries]
+    sizes = {path: size for _, size, path in entries}
+
+    # Entries differ by a few bytes, so budgets are built from their own sizes
+    cache.max_bytes = sum(sizes.values()) - 1
+    assert cache.evict() == 1
+    assert [path for _, _, path in cache.entries()] == [middle, newest]
+
+    cache.max_bytes = sizes[newest]
+    assert cache.evict() == 1
+    assert [path for _, _, path in cache.entries()] == [newest]
+
+
+def test_disabled_cache_always_computes(source):
+    cache = StageCache(None)
+    compute, calls = counting(pd.DataFrame())
+    cache.get_or_compute('stage', [source], {}, compute)
+    cache.get_or_compute('stage', [source], {}, compute)
+    assert len(calls) == 2
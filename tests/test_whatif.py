@@ -0,0 +1,79 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///./test.db')
+
+from app import whatif
+from scoring_engine import SIGNAL_COLUMNS, save_signal_matrix, score_tensor
+
+PROFILES = [
+    {"name": "cat12345", "coefficients": "productivity_coefficients_cat12345"},
+    {"name": "others", "coefficients": {column: 0.1 for column in SIGNAL_COLUMNS}},
+]
+
+
+def stored_month(directory, employees=40, days=5, seed=0):
+    """Store a random signal matrix for 2025-03 and return the scores the pipeline gives it."""
+    rng = np.random.default_rng(seed)
+    tensor = (rng.random((employees, days, len(SIGNAL_COLUMNS))) < 0.5).astype(np.uint8)
+    present = rng.random((employees, days)) < 0.8
+    profile = np.where(np.arange(employees) % 3 == 0, 'cat12345', 'others')
+    coefficients = np.where((profile == 'cat12345')[:, np.newaxis], 0.2, 0.1) * np.ones(len(SIGNAL_COLUMNS))
+    df = pd.DataFrame(coefficients, columns=SIGNAL_COLUMNS)
+    df.insert(0, 'Email', [f"user{index}@example.com" for index in range(employees)])
+    df.insert(1, 'Cat', ['01' if name == 'cat12345' else '08' for name in profile])
+    df['Profile'] = profile
+    dates = [f"2025-03-{day:02d}" for day in range(1, days + 1)]
+    save_signal_matrix(directory / 'signals_2025-03.npz', tensor, present, df, dates, PROFILES)
+    return score_tensor(tensor, coefficients), present
+
+
+def monthly_averages(scores, present):
+    counts = present.sum(axis=1)
+    return np.where(present, scores, 0).sum(axis=1)[counts > 0] / counts[counts > 0]
+
+
+def test_baseline_reproduces_the_stored_scores(tmp_path):
+    scores, present = stored_month(tmp_path)
+    result = whatif.simulate(whatif.load_matrix('2025-03', tmp_path), {}, detail=True)
+
+    expected = monthly_averages(scores, present)
+    assert [row['promedio_base'] for row in result['detalle']] == pytest.approx(expected.tolist(), abs=0)
+    assert result['promedio'] == result['promedio_base'] == pytest.approx(expected.mean())
+    assert result['diferencia'] == 0
+    assert result['diario'][0]['promedio'] == pytest.approx(scores[:, 0][present[:, 0]].mean())
+    assert sum(bucket['empleados'] for bucket in result['distribucion']) == result['empleados']
+
+
+def test_candidate_changes_only_its_profiles(tmp_path):
+    stored_month(tmp_path)
+    matrix = whatif.load_matrix('2025-03', tmp_path)
+    # A COEFFICIENTS entry name selects the profiles that use it
+    candidate = {'productivity_coefficients_cat12345': {column: 0.0 for column in SIGNAL_COLUMNS}}
+    result = whatif.simulate(matrix, candidate)
+
+    profiles = {row['perfil']: row for row in result['perfiles']}
+    assert profiles['cat12345']['promedio'] == 0
+    assert profiles['cat12345']['promedio_base'] > 0
+    assert profiles['others']['promedio'] == profiles['others']['promedio_base']
+    assert result['diferencia'] < 0
+
+    raised = whatif.simulate(matrix, {'others': {'Chat': 1.0}})
+    assert raised['distribucion'][-1]['empleados'] > raised['distribucion_base'][-1]['empleados']
+
+
+def test_unknown_names_are_rejected(tmp_path):
+    stored_month(tmp_path)
+    matrix = whatif.load_matrix('2025-03', tmp_path)
+    with pytest.raises(ValueError):
+        whatif.simulate(matrix, {'managers': {'Chat': 0.5}})
+    with pytest.raises(ValueError):
+        whatif.simulate(matrix, {'others': {'Slack': 0.5}})
+    with pytest.raises(FileNotFoundError):
+        whatif.load_matrix('2025-04', tmp_path)
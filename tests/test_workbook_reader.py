@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+
+from workbook_reader import ENGINES, WorkbookReader
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    file_path = tmp_path / 'book.xlsx'
+    with pd.ExcelWriter(file_path, engine='xlsxwriter') as writer:
+        for day in ['2025-03-01', '2025-03-02']:
+            pd.DataFrame({
+                'Usuario': ['a@x.co', 'b@x.co'],
+                'Skip': [1, 2],
+                'Sent': [3, None],
+                'Last use': [f"{day}T10:00:00.000Z", None],
+            }).to_excel(writer, sheet_name=day, index=False)
+    return file_path
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_iter_sheets_reads_selected_columns(workbook, engine):
+    if engine == 'calamine':
+        pytest.importorskip('python_calamine')
+    with WorkbookReader(workbook, engine) as reader:
+        assert reader.sheet_names == ['2025-03-01', '2025-03-02']
+        sheets = dict(reader.iter_sheets(usecols=[0, 2, 3], names=['Email', 'Sent', 'Last use']))
+
+    expected = pd.read_excel(workbook, sheet_name='2025-03-02', usecols=[0, 2, 3])
+    expected.columns = ['Email', 'Sent', 'Last use']
+    pd.testing.assert_frame_equal(sheets['2025-03-02'], expected, check_dtype=False)
+    assert sheets['2025-03-01']['Last use'][0] == '2025-03-01T10:00:00.000Z'
+
+
+def test_unknown_engine_is_rejected(workbook):
+    with pytest.raises(ValueError):
+        WorkbookReader(workbook, 'xlrd')
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_iter_chunks_reads_named_columns_in_chunks(workbook, engine):
+    if engine == 'calamine':
+        pytest.importorskip('python_calamine')
+    with WorkbookReader(workbook, engine) as reader:
+        chunks = list(reader.iter_chunks('2025-03-01', 1, ['Last use', 'Usuario']))
+
+    assert [len(chunk) for chunk in chunks] == [1, 1]
+    assert list(chunks[0].columns) == ['Last use', 'Usuario']
+    assert pd.concat(chunks)['Usuario'].tolist() == ['a@x.co', 'b@x.co']